@@ -8,6 +8,9 @@ from .dependencies import (
     DispatcherOrAbove,
     DriverOrAbove,
     AnyAuthenticatedUser,
+    rate_limited,
+    StandardRateLimit,
+    HeavyRateLimit,
 )
 from .router import router as auth_router
 
@@ -15,5 +18,6 @@ __all__ = [
     "UserRole", "UserInDB", "UserResponse", "TokenResponse",
     "require_roles", "require_min_role", "get_current_user",
     "AdminOnly", "ManagerOrAbove", "DispatcherOrAbove", "DriverOrAbove",
-    "AnyAuthenticatedUser", "auth_router",
+    "AnyAuthenticatedUser", "rate_limited", "StandardRateLimit", "HeavyRateLimit",
+    "auth_router",
 ]
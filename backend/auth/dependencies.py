@@ -17,6 +17,7 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from .jwt import decode_access_token
 from .models import TokenData, UserInDB, UserRole
+from services.ratelimit import rate_limiter, retry_after_header
 
 # ---------------------------------------------------------------------------
 # Abstract Supabase layer — replace with your real client calls
@@ -121,6 +122,30 @@ def require_min_role(minimum: UserRole) -> Callable:
     return _guard
 
 
+# ---------------------------------------------------------------------------
+# Rate limiting — per-user token buckets by route cost class
+# ---------------------------------------------------------------------------
+
+def rate_limited(cost_class: str) -> Callable:
+    """
+    Dependency factory that draws one token from the caller's bucket for
+    `cost_class`. Keyed on the JWT subject, so a throttled request is
+    rejected before the user row is loaded. Quotas scale with the role's
+    rank in _ROLE_HIERARCHY.
+    """
+
+    async def _limit(token_data: TokenData = Depends(get_current_token)) -> None:
+        wait = rate_limiter.acquire(token_data.sub, cost_class, _role_rank(token_data.role))
+        if wait:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Rate limit exceeded for {cost_class} requests. Retry later.",
+                headers={"Retry-After": retry_after_header(wait)},
+            )
+
+    return _limit
+
+
 # ---------------------------------------------------------------------------
 # Convenience aliases (import these in your routers)
 # ---------------------------------------------------------------------------
@@ -130,3 +155,6 @@ ManagerOrAbove    = Depends(require_min_role(UserRole.manager))
 DispatcherOrAbove = Depends(require_min_role(UserRole.dispatcher))
 DriverOrAbove     = Depends(require_min_role(UserRole.driver))
 AnyAuthenticatedUser = Depends(get_current_user)
+
+StandardRateLimit = Depends(rate_limited("standard"))
+HeavyRateLimit    = Depends(rate_limited("heavy"))
@@ -0,0 +1 @@
+# Standalone micro-benchmarks — run from backend/: python -m benchmarks.<name>
@@ -0,0 +1,84 @@
+"""
+benchmarks/bench_dashboard.py — /dashboard/bootstrap vs the per-widget requests.
+
+Times the first-load requests the dashboard used to make (KPIs, fleet
+stats, recent trips, maintenance, drivers), issued one after another and
+all at once, against the single composite request. Needs a running API and
+a Dispatcher+ token; start the server with RATE_LIMIT_ENABLED=false so the
+benchmark is not throttled.
+
+    python -m benchmarks.bench_dashboard --token $TOKEN
+    python -m benchmarks.bench_dashboard --url http://localhost:8000 --token $TOKEN --rounds 50
+"""
+
+import argparse
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+LEGACY_SEQUENCE = [
+    "/analytics/dashboard/kpis",
+    "/analytics/fleet/stats",
+    "/trips?limit=10",
+    "/maintenance?limit=10",
+    "/drivers?limit=100",
+]
+BOOTSTRAP = ["/dashboard/bootstrap"]
+
+
+def fetch(base: str, token: str, path: str) -> int:
+    request = urllib.request.Request(base + path, headers={"Authorization": f"Bearer {token}"})
+    with urllib.request.urlopen(request) as response:
+        return len(response.read())
+
+
+def sequential(base, token, paths, _pool):
+    return sum(fetch(base, token, p) for p in paths)
+
+
+def parallel(base, token, paths, pool):
+    return sum(pool.map(lambda p: fetch(base, token, p), paths))
+
+
+def measure(run, base, token, paths, rounds, pool) -> tuple[list[float], int]:
+    run(base, token, paths, pool)  # warm caches and connections
+    timings, size = [], 0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        size = run(base, token, paths, pool)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    try:
+        fetch(args.url, args.token, BOOTSTRAP[0])
+    except urllib.error.URLError as exc:
+        sys.exit(f"Cannot reach {args.url}/dashboard/bootstrap: {exc.reason}")
+
+    with ThreadPoolExecutor(max_workers=len(LEGACY_SEQUENCE)) as pool:
+        cases = [
+            ("per-widget, sequential", sequential, LEGACY_SEQUENCE),
+            ("per-widget, parallel", parallel, LEGACY_SEQUENCE),
+            ("bootstrap", sequential, BOOTSTRAP),
+        ]
+        print(f"{args.rounds} rounds against {args.url}")
+        print(f"{'case':<26}{'requests':>9}{'KB':>8}{'p50 ms':>9}{'p95 ms':>9}")
+        for name, run, paths in cases:
+            timings, size = measure(run, args.url, args.token, paths, args.rounds, pool)
+            p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+            print(f"{name:<26}{len(paths):>9}{size / 1024:>8.1f}"
+                  f"{statistics.median(timings):>9.0f}{p95:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
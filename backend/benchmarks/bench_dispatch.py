@@ -0,0 +1,59 @@
+"""
+benchmarks/bench_dispatch.py — Auto-assign planner throughput.
+
+Plans N pending loads against a synthetic pool of idle vehicles and
+available drivers (no database) and reports timing and fill quality.
+
+    python -m benchmarks.bench_dispatch            # 5000 loads
+    python -m benchmarks.bench_dispatch 20000
+"""
+
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from services.dispatch import plan_assignments
+
+
+def synthetic_pool(n_cargo: int, seed: int = 7):
+    rng = random.Random(seed)
+    today = date.today()
+    cargo = [
+        {
+            "index": i,
+            "cargo_weight_kg": round(rng.uniform(200, 24000), 2),
+            "departure": today + timedelta(days=rng.randint(0, 14)),
+        }
+        for i in range(n_cargo)
+    ]
+    vehicles = [
+        {"id": i, "max_load_capacity_kg": rng.choice([1500, 3500, 7500, 12000, 18000, 25000])}
+        for i in range(int(n_cargo * 1.1))
+    ]
+    drivers = [
+        {"id": i, "license_expiry": today + timedelta(days=rng.randint(-30, 900))}
+        for i in range(int(n_cargo * 1.1))
+    ]
+    return cargo, vehicles, drivers, today
+
+
+def main(n_cargo: int = 5000, repeats: int = 5) -> None:
+    cargo, vehicles, drivers, today = synthetic_pool(n_cargo)
+
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        assignments, unassigned = plan_assignments(cargo, vehicles, drivers, today)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    assigned_weight = sum(cargo[a["index"]]["cargo_weight_kg"] for a in assignments)
+    unused = sum(a["unused_capacity_kg"] for a in assignments)
+    print(f"loads={n_cargo} vehicles={len(vehicles)} drivers={len(drivers)}")
+    print(f"assigned={len(assignments)} unassigned={len(unassigned)}")
+    print(f"fill={assigned_weight / (assigned_weight + unused):.1%} of assigned capacity")
+    print(f"plan time: best {min(timings):.1f} ms, median {sorted(timings)[len(timings) // 2]:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,101 @@
+"""
+benchmarks/bench_export.py — Arrow / Parquet export vs paginated JSON.
+
+Builds N synthetic trips rows shaped like the PostgREST pages the export
+reads (decimals as text) and compares payload size, encode time and client
+decode time of the JSON list response against Arrow IPC and Parquet. No
+database; requires pyarrow.
+
+    python -m benchmarks.bench_export            # 200000 rows
+    python -m benchmarks.bench_export 1000000
+"""
+
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from services.columnar import (
+    BATCH_ROWS,
+    EXPORT_TABLES,
+    arrow_schema,
+    batches_to_ipc_stream,
+    batches_to_parquet,
+    rows_to_batch,
+)
+
+CITIES = ["Mumbai", "Pune", "Ahmedabad", "Surat", "Delhi", "Jaipur", "Chennai", "Bengaluru"]
+STATUSES = ["scheduled", "in_transit", "delivered", "cancelled"]
+
+
+def synthetic_trips(n: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(1, n + 1):
+        departure = start + timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+        status = rng.choice(STATUSES)
+        rows.append({
+            "id": i,
+            "vehicle_id": rng.randint(1, 2000),
+            "driver_id": rng.randint(1, 3000),
+            "cargo_weight_kg": f"{rng.uniform(200, 24000):.2f}",
+            "origin": rng.choice(CITIES),
+            "destination": rng.choice(CITIES),
+            "distance_km": f"{rng.uniform(10, 1500):.2f}",
+            "revenue": f"{rng.uniform(1000, 250000):.2f}",
+            "status": status,
+            "scheduled_departure": departure.isoformat(),
+            "actual_arrival": (departure + timedelta(hours=rng.randint(2, 48))).isoformat()
+            if status == "delivered" else None,
+        })
+    return rows
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main(n: int) -> None:
+    table = "trips"
+    columns = list(EXPORT_TABLES[table]["columns"])
+    rows = synthetic_trips(n)
+    # What the JSON list endpoints send: numbers as JSON floats
+    json_rows = [
+        {k: (float(v) if v is not None and isinstance(EXPORT_TABLES[table]["columns"][k], tuple) else v)
+         for k, v in r.items()}
+        for r in rows
+    ]
+    schema = arrow_schema(table, columns)
+
+    def batches():
+        for i in range(0, n, BATCH_ROWS):
+            yield rows_to_batch(table, columns, rows[i:i + BATCH_ROWS])
+
+    payload_json, json_ms = timed(lambda: json.dumps({"data": json_rows, "total": n}).encode())
+    payload_ipc, ipc_ms = timed(lambda: b"".join(batches_to_ipc_stream(batches(), schema)))
+    payload_pq, pq_ms = timed(lambda: batches_to_parquet(batches(), schema))
+
+    _, json_read_ms = timed(lambda: json.loads(payload_json))
+    _, ipc_read_ms = timed(lambda: pa.ipc.open_stream(payload_ipc).read_all())
+    _, pq_read_ms = timed(lambda: pq.read_table(pa.BufferReader(payload_pq)))
+
+    print(f"{n} trips rows")
+    print(f"{'format':<10}{'size MB':>10}{'vs JSON':>10}{'encode ms':>12}{'decode ms':>12}")
+    for name, payload, enc, dec in (
+        ("json", payload_json, json_ms, json_read_ms),
+        ("arrow", payload_ipc, ipc_ms, ipc_read_ms),
+        ("parquet", payload_pq, pq_ms, pq_read_ms),
+    ):
+        ratio = len(payload) / len(payload_json)
+        print(f"{name:<10}{len(payload) / 1e6:>10.1f}{ratio:>9.0%}{enc:>12.0f}{dec:>12.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
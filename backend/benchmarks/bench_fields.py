@@ -0,0 +1,103 @@
+"""
+benchmarks/bench_fields.py — Sparse fieldsets vs full responses.
+
+For a page of synthetic vehicles and trips rows, compares what `fields=`
+saves: bytes the database sends (the select), bytes the API sends, and
+the time to validate and serialize the response. No database.
+
+    python -m benchmarks.bench_fields            # 100-row pages
+    python -m benchmarks.bench_fields 1000
+"""
+
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from models.fields import parse_fields
+from models.trips import TripDetailResponse, TripListResponse
+from models.vehicles import VehicleListResponse, VehicleResponse
+
+ROUNDS = 50
+
+
+def synthetic_vehicles(n: int, rng: random.Random) -> list[dict]:
+    return [
+        {
+            "id": i,
+            "license_plate": f"MH{rng.randint(1, 48):02d}AB{rng.randint(1000, 9999)}",
+            "make": rng.choice(["Tata", "Ashok Leyland", "Eicher", "BharatBenz"]),
+            "model": rng.choice(["Prima 4028", "Ecomet 1615", "Pro 3015", "1617R"]),
+            "year": rng.randint(2012, 2025),
+            "vehicle_type": rng.choice(["truck", "van", "trailer", "tanker"]),
+            "fuel_type": "diesel",
+            "max_load_capacity_kg": round(rng.uniform(1500, 25000), 2),
+            "current_odometer_km": round(rng.uniform(0, 400000), 2),
+            "status": rng.choice(["idle", "on_trip", "in_shop"]),
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def synthetic_trips(n: int, rng: random.Random) -> list[dict]:
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(1, n + 1):
+        departure = start + timedelta(minutes=rng.randint(0, 500000))
+        rows.append({
+            "id": i,
+            "vehicle_id": rng.randint(1, 2000),
+            "driver_id": rng.randint(1, 3000),
+            "cargo_weight_kg": round(rng.uniform(200, 24000), 2),
+            "origin": "Warehouse 12, MIDC Bhosari, Pune, Maharashtra",
+            "destination": "Distribution Centre 4, Sector 63, Noida, Uttar Pradesh",
+            "distance_km": round(rng.uniform(10, 1500), 2),
+            "revenue": round(rng.uniform(1000, 250000), 2),
+            "status": rng.choice(["scheduled", "in_transit", "delivered"]),
+            "scheduled_departure": departure.isoformat(),
+            "actual_arrival": None,
+            "vehicle_plate": "MH12AB1234",
+            "vehicle_model": "Tata Prima 4028",
+            "driver_name": "Ravi Kumar",
+        })
+    return rows
+
+
+def timed_us(fn) -> tuple[bytes, float]:
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        payload = fn()
+    return payload, (time.perf_counter() - started) / ROUNDS * 1e6
+
+
+def compare(name, rows, item_model, list_model, fields, derived=None) -> None:
+    fieldset = parse_fields(fields, item_model, derived)
+    stored = [k for k in item_model.model_fields if k not in (derived or {})]
+    db_full = len(json.dumps([{k: r[k] for k in stored} for r in rows]).encode())
+    db_sparse = len(json.dumps([{k: r[k] for k in fieldset.columns} for r in rows]).encode())
+
+    full, full_us = timed_us(lambda: list_model(
+        data=[item_model(**r) for r in rows], total=len(rows)
+    ).model_dump_json().encode())
+    sparse, sparse_us = timed_us(lambda: json.dumps(
+        {"data": [fieldset.dump(r) for r in rows], "total": len(rows)}
+    ).encode())
+
+    print(f"{name} ({len(rows)} rows, fields={fields})")
+    print(f"  db select   {db_full:>9,} B -> {db_sparse:>9,} B  ({1 - db_sparse / db_full:.0%} less)")
+    print(f"  response    {len(full):>9,} B -> {len(sparse):>9,} B  ({1 - len(sparse) / len(full):.0%} less)")
+    print(f"  serialize   {full_us:>9,.0f} us -> {sparse_us:>8,.0f} us  ({full_us / sparse_us:.1f}x faster)")
+
+
+def main(n: int) -> None:
+    rng = random.Random(7)
+    compare("vehicles", synthetic_vehicles(n, rng), VehicleResponse, VehicleListResponse,
+            "id,status,license_plate")
+    compare("trips", synthetic_trips(n, rng), TripDetailResponse, TripListResponse,
+            "id,status,vehicle_plate,scheduled_departure",
+            {"vehicle_plate": ("vehicle_id",), "vehicle_model": ("vehicle_id",), "driver_name": ("driver_id",)})
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
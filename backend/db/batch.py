@@ -0,0 +1,53 @@
+"""
+db/batch.py — Fetch-by-IDs helpers for the /{resource}/batch endpoints.
+
+One `id IN (...)` query replaces N single-row GETs; the routers then enrich
+the rows with the same cached label lookups as their list endpoints and
+return them in the order the IDs were requested.
+"""
+
+from typing import Iterable
+
+from db.supabase import get_supabase
+
+MAX_BATCH_IDS = 100
+
+
+def parse_ids(raw: str) -> list[int]:
+    """
+    "3,1,3,2" -> [3, 1, 2]: request order kept, duplicates dropped.
+    Raises ValueError on a non-integer, an empty list or more than
+    MAX_BATCH_IDS distinct IDs.
+    """
+    ids: dict[int, None] = {}
+    for part in raw.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            ids[int(part)] = None
+        except ValueError:
+            raise ValueError(f"Invalid ID: {part!r}")
+    if not ids:
+        raise ValueError("ids must contain at least one ID")
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValueError(f"At most {MAX_BATCH_IDS} IDs per batch request")
+    return list(ids)
+
+
+def fetch_by_ids(table: str, select: str, ids: list[int]) -> dict[int, dict]:
+    """{id: row} for the IDs that exist, in a single query."""
+    result = get_supabase().table(table).select(select).in_("id", ids).execute()
+    return {row["id"]: row for row in result.data}
+
+
+def in_request_order(ids: Iterable[int], rows: dict[int, dict]) -> tuple[list[dict], list[int]]:
+    """Rows ordered as requested, plus the IDs that were not found."""
+    found, missing = [], []
+    for entity_id in ids:
+        row = rows.get(entity_id)
+        if row is None:
+            missing.append(entity_id)
+        else:
+            found.append(row)
+    return found, missing
@@ -0,0 +1,24 @@
+"""
+db/paging.py — Read a whole PostgREST result, one page at a time.
+
+PostgREST returns at most PAGE_SIZE rows per request, so a read that needs
+every matching row pages through it with .range(). Query builders are not
+reusable once executed; fetch_all() takes a function that builds a fresh
+query (with a stable order) for each page.
+"""
+
+from typing import Any, Callable
+
+PAGE_SIZE = 1000  # PostgREST max rows per request
+
+
+def fetch_all(build_query: Callable[[], Any]) -> list[dict]:
+    """Every row of build_query(), fetched PAGE_SIZE rows at a time."""
+    rows: list[dict] = []
+    offset = 0
+    while True:
+        page = build_query().range(offset, offset + PAGE_SIZE - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        offset += PAGE_SIZE
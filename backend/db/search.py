@@ -0,0 +1,52 @@
+"""
+db/search.py — Parameterized text search helpers.
+
+Search terms go to the fn_search_* functions in schema.sql as RPC parameters
+(trigram-indexed, relevance ranked). When those functions are not deployed
+the routers fall back to a PostgREST ILIKE filter built with ilike_filter(),
+which quotes and escapes the term instead of interpolating it raw.
+"""
+
+from typing import Any
+
+from db.supabase import get_supabase
+
+
+def _like_escape(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _postgrest_quote(value: str) -> str:
+    # Double-quoted values may contain PostgREST reserved chars: , . : ( )
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def ilike_filter(columns: list[str], term: str) -> str:
+    """Build an or_() filter matching `term` literally as a substring of any column."""
+    pattern = _postgrest_quote(f"*{_like_escape(term.strip())}*")
+    return ",".join(f"{column}.ilike.{pattern}" for column in columns)
+
+
+def search_rpc(function: str, params: dict[str, Any]) -> tuple[list[dict], int]:
+    """
+    Call a fn_search_* function. Returns (rows, total) with the helper
+    columns (rank, total_count) stripped from the rows.
+
+    total_count rides on each row, so a page past the end carries no total;
+    in that case the first row is fetched again just to read the count.
+    """
+    result = get_supabase().rpc(function, params).execute()
+    rows = result.data or []
+    if rows:
+        total = rows[0]["total_count"]
+    elif params.get("p_offset"):
+        first = get_supabase().rpc(
+            function, {**params, "p_offset": 0, "p_limit": 1}
+        ).execute()
+        total = first.data[0]["total_count"] if first.data else 0
+    else:
+        total = 0
+    for row in rows:
+        row.pop("total_count", None)
+        row.pop("rank", None)
+    return rows, total
@@ -1,21 +1,115 @@
 """
 db/supabase.py — Supabase client singleton.
+
+The client is normally built and warmed by the app lifespan (see main.py)
+so the first real request does not pay TLS / connection setup. Env vars
+are read when the client is created, not at import time.
 """
 
+import logging
 import os
-from supabase import create_client, Client
+import time
+from typing import TYPE_CHECKING
 
 from dotenv import load_dotenv
-load_dotenv() 
+load_dotenv()
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+logger = logging.getLogger("fleetflow")
+
+_client: "Client | None" = None
 
-SUPABASE_URL = os.environ["SUPABASE_URL"]
-SUPABASE_SERVICE_KEY = os.environ["SUPABASE_SERVICE_KEY"]  # use service key (bypasses RLS)
+# Optional database objects the routes can take advantage of.
+# Filled in by check_capabilities() at startup; unknown = assume present.
+_capabilities: dict[str, bool] = {}
 
-_client: Client | None = None
+CAPABILITY_PROBES = {
+    "vw_dashboard_kpis": "vw_dashboard_kpis",
+    "vw_vehicle_cost_summary": "vw_vehicle_cost_summary",
+    "vw_driver_performance": "vw_driver_performance",
+    "vw_monthly_financial_summary": "vw_monthly_financial_summary",
+    "vehicle_daily_rollup": "vehicle_daily_rollup",
+    "driver_stats": "driver_stats",
+    "maintenance_due": "maintenance_due",
+}
 
+# A search term that matches nothing: an empty term would match every row
+# and make each probe scan and count the whole table.
+_PROBE_TERM = "zqxj capability probe zqxj"
 
-def get_supabase() -> Client:
+# Database functions probed with a cheap call: name -> RPC params
+RPC_PROBES = {
+    "fn_search_trips": {"p_query": _PROBE_TERM, "p_limit": 1},
+    "fn_search_vehicles": {"p_query": _PROBE_TERM, "p_limit": 1},
+    "fn_search_expenses": {"p_query": _PROBE_TERM, "p_limit": 1},
+    "fn_search_drivers": {"p_query": _PROBE_TERM, "p_limit": 1},
+    "fn_fuel_anomalies": {"p_vehicle_id": 0},
+    "fn_rollup_series": {"p_from": "2000-01-01", "p_to": "2000-01-01"},
+    "fn_insert_dispatch_trips": {"p_trips": []},
+}
+
+
+def get_supabase() -> "Client":
     global _client
     if _client is None:
-        _client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+        # Imported lazily — the supabase SDK pulls in httpx, postgrest,
+        # gotrue, storage and realtime, which dominates cold import time.
+        from supabase import create_client
+
+        url = os.environ.get("SUPABASE_URL")
+        key = os.environ.get("SUPABASE_SERVICE_KEY")  # use service key (bypasses RLS)
+        if not url or not key:
+            raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set")
+        _client = create_client(url, key)
     return _client
+
+
+def warm_up() -> float:
+    """
+    Build the client and run one cheap round trip so the HTTP connection
+    pool is established. Returns the elapsed time in milliseconds.
+    """
+    started = time.perf_counter()
+    get_supabase().table("users").select("id").limit(1).execute()
+    return (time.perf_counter() - started) * 1000
+
+
+def check_capabilities() -> dict[str, bool]:
+    """Probe the optional views / functions once and remember which exist."""
+    supabase = get_supabase()
+    for name, relation in CAPABILITY_PROBES.items():
+        try:
+            supabase.table(relation).select("*").limit(1).execute()
+            _capabilities[name] = True
+        except Exception:
+            _capabilities[name] = False
+    for name, params in RPC_PROBES.items():
+        try:
+            supabase.rpc(name, params).execute()
+            _capabilities[name] = True
+        except Exception:
+            _capabilities[name] = False
+    return dict(_capabilities)
+
+
+def ensure_partitions(months_ahead: int = 3) -> int | None:
+    """
+    Create the upcoming monthly partitions of expenses / fuel_logs
+    (fn_ensure_monthly_partitions). Returns the number created, or None if
+    the function is not deployed.
+    """
+    try:
+        result = get_supabase().rpc(
+            "fn_ensure_monthly_partitions", {"p_months_ahead": months_ahead}
+        ).execute()
+    except Exception as exc:
+        logger.warning("Partition maintenance skipped: %s", exc)
+        return None
+    return result.data if isinstance(result.data, int) else 0
+
+
+def has_capability(name: str) -> bool:
+    """True unless the startup probe found the object missing."""
+    return _capabilities.get(name, True)
@@ -5,8 +5,6 @@ Import these functions and drop them into auth/dependencies.py and auth/router.p
 
 from typing import Optional
 
-from postgrest.exceptions import APIError
-
 from auth.models import UserInDB
 from db.supabase import get_supabase
 
@@ -15,6 +13,8 @@ TABLE = "users"
 
 
 async def get_user_by_id(user_id: int) -> Optional[UserInDB]:
+    from postgrest.exceptions import APIError  # lazy: keeps cold import light
+
     try:
         result = (
             get_supabase()
@@ -30,6 +30,8 @@ async def get_user_by_id(user_id: int) -> Optional[UserInDB]:
 
 
 async def get_user_by_email(email: str) -> Optional[UserInDB]:
+    from postgrest.exceptions import APIError  # lazy: keeps cold import light
+
     try:
         result = (
             get_supabase()
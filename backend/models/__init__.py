@@ -7,3 +7,7 @@ from .maintenance import *
 from .expenses import *
 from .fuel_logs import *
 from .analytics import *
+from .reports import *
+from .documents import *
+from .complaints import *
+from .dashboard import *
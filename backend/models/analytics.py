@@ -3,7 +3,7 @@ models/analytics.py — Pydantic schemas for analytics/dashboard views.
 """
 
 from pydantic import BaseModel
-from typing import Optional
+from typing import Literal, Optional
 from decimal import Decimal
 from datetime import date
 
@@ -47,6 +47,12 @@ class DriverPerformance(BaseModel):
     cancelled_trips: int
     completion_rate: Decimal
     total_complaints: int
+    # Open or investigating; per severity excludes dismissed complaints
+    open_complaints: int = 0
+    complaints_low: int = 0
+    complaints_medium: int = 0
+    complaints_high: int = 0
+    complaints_critical: int = 0
 
     class Config:
         from_attributes = True
@@ -64,6 +70,35 @@ class MonthlyFinancialSummary(BaseModel):
         from_attributes = True
 
 
+class FuelAnomaly(BaseModel):
+    """A fuel fill flagged by fn_fuel_anomalies / services.fuel_economy."""
+    fuel_log_id: int
+    vehicle_id: int
+    license_plate: str
+    fuel_date: date
+    liters: Decimal
+    odometer_at_fill: Decimal
+    distance_km: Optional[Decimal] = None
+    km_per_liter: Optional[Decimal] = None
+    median_km_per_liter: Optional[Decimal] = None
+    mad: Optional[Decimal] = None
+    anomaly: Literal["odometer_rollback", "possible_theft", "outlier_high"]
+
+
+class RollupPoint(BaseModel):
+    """One bucket (day / week / month) of vehicle_daily_rollup."""
+    period: date
+    trips_delivered: int
+    distance_km: Decimal
+    revenue: Decimal
+    fuel_liters: Decimal
+    fuel_cost: Decimal
+    maintenance_cost: Decimal
+    expenses: dict[str, Decimal]  # by expense_type
+    total_cost: Decimal           # fuel + maintenance + expenses
+    net_profit: Decimal
+
+
 class AnalyticsSummary(BaseModel):
     """Combined analytics response."""
     kpis: DashboardKPIs
@@ -0,0 +1,60 @@
+"""
+models/complaints.py — Pydantic schemas for driver complaints.
+"""
+
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+from .enums import ComplaintType, SeverityLevel, ComplaintStatus
+
+
+class ComplaintBase(BaseModel):
+    driver_id: int
+    trip_id: Optional[int] = None
+    complaint_type: ComplaintType
+    description: str
+    severity: SeverityLevel = SeverityLevel.medium
+
+
+class ComplaintCreate(ComplaintBase):
+    pass
+
+
+class ComplaintUpdate(BaseModel):
+    complaint_type: Optional[ComplaintType] = None
+    description: Optional[str] = None
+    severity: Optional[SeverityLevel] = None
+
+
+class ComplaintResponse(ComplaintBase):
+    id: int
+    status: ComplaintStatus = ComplaintStatus.open
+    reported_by: Optional[int] = None
+    resolved_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ComplaintDetailResponse(BaseModel):
+    """Complaint with driver and trip info."""
+    id: int
+    driver_id: int
+    trip_id: Optional[int]
+    complaint_type: ComplaintType
+    description: str
+    severity: SeverityLevel
+    status: ComplaintStatus
+    reported_by: Optional[int]
+    resolved_at: Optional[datetime]
+    # Joined fields
+    driver_name: str
+    trip_route: Optional[str]   # "origin → destination"
+
+    class Config:
+        from_attributes = True
+
+
+class ComplaintListResponse(BaseModel):
+    data: list[ComplaintDetailResponse]
+    total: int
@@ -0,0 +1,32 @@
+"""
+models/dashboard.py — Pydantic schemas for the composite dashboard payload.
+"""
+
+from pydantic import BaseModel
+from typing import Optional
+from datetime import date
+from .enums import DutyStatus
+from .analytics import DashboardKPIs
+from .trips import TripDetailResponse
+from .maintenance import MaintenanceDetailResponse
+from .documents import DocumentDigest
+
+
+class ExpiringLicense(BaseModel):
+    driver_id: int
+    driver_name: str
+    license_number: str
+    license_expiry: date
+    days_left: int          # negative once expired
+    duty_status: DutyStatus
+
+
+class DashboardBootstrap(BaseModel):
+    """Everything the dashboard renders on first load, in one response."""
+    kpis: DashboardKPIs
+    fleet: dict
+    documents: DocumentDigest   # expiry alert counts, from memory
+    # Dispatcher+ sections; None for roles that cannot list trips / logs / drivers
+    recent_trips: Optional[list[TripDetailResponse]] = None
+    open_maintenance: Optional[list[MaintenanceDetailResponse]] = None
+    expiring_licenses: Optional[list[ExpiringLicense]] = None
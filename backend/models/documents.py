@@ -0,0 +1,72 @@
+"""
+models/documents.py — Pydantic schemas for vehicle documents.
+"""
+
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional
+from datetime import date
+from .enums import DocumentType
+
+
+class VehicleDocumentBase(BaseModel):
+    vehicle_id: int
+    document_type: DocumentType
+    document_number: str = Field(..., max_length=100)
+    issue_date: date
+    expiry_date: date
+
+    @model_validator(mode="after")
+    def check_dates(self):
+        if self.expiry_date < self.issue_date:
+            raise ValueError("expiry_date must be >= issue_date")
+        return self
+
+
+class VehicleDocumentCreate(VehicleDocumentBase):
+    pass
+
+
+class VehicleDocumentUpdate(BaseModel):
+    document_type: Optional[DocumentType] = None
+    document_number: Optional[str] = Field(None, max_length=100)
+    issue_date: Optional[date] = None
+    expiry_date: Optional[date] = None
+
+
+class VehicleDocumentResponse(VehicleDocumentBase):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+
+class VehicleDocumentDetailResponse(BaseModel):
+    """Vehicle document with vehicle info and time to expiry."""
+    id: int
+    vehicle_id: int
+    document_type: DocumentType
+    document_number: str
+    issue_date: date
+    expiry_date: date
+    days_left: int          # negative once expired
+    expired: bool
+    # Joined fields
+    vehicle_plate: str
+    vehicle_model: str
+
+    class Config:
+        from_attributes = True
+
+
+class VehicleDocumentListResponse(BaseModel):
+    data: list[VehicleDocumentDetailResponse]
+    total: int
+
+
+class DocumentDigest(BaseModel):
+    """Expiry counts for active vehicles' documents, computed once per day."""
+    as_of: date
+    expired: int
+    expiring_7d: int        # 0–7 days left
+    expiring_30d: int       # 0–30 days left (includes expiring_7d)
+    by_type: dict[str, int] # expired + expiring_30d per document type
@@ -60,6 +60,12 @@ class DriverListResponse(BaseModel):
     total: int
 
 
+class DriverBatchResponse(BaseModel):
+    """Records in requested order; `missing` lists IDs that were not found."""
+    data: list[DriverWithUserResponse]
+    missing: list[int]
+
+
 # For dropdowns (selecting driver for trip)
 class DriverOption(BaseModel):
     id: int
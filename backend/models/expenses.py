@@ -59,3 +59,9 @@ class ExpenseDetailResponse(BaseModel):
 class ExpenseListResponse(BaseModel):
     data: list[ExpenseDetailResponse]
     total: int
+
+
+class ExpenseBatchResponse(BaseModel):
+    """Records in requested order; `missing` lists IDs that were not found."""
+    data: list[ExpenseDetailResponse]
+    missing: list[int]
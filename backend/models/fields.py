@@ -0,0 +1,72 @@
+"""
+models/fields.py — Sparse fieldsets for the `fields=` query parameter.
+
+`fields=id,status,license_plate` is validated against the route's response
+model, narrows the database select to the columns those fields need, and
+serializes each row through a projected copy of the model (same types and
+JSON encoding as the full response, only fewer keys). Fields the router
+derives from other columns (e.g. vehicle_plate from vehicle_id) declare
+their source columns in `derived`.
+"""
+
+from functools import lru_cache
+from typing import Optional
+
+from pydantic import BaseModel, create_model
+
+
+@lru_cache(maxsize=256)
+def _projected_model(model: type[BaseModel], fields: tuple[str, ...]) -> type[BaseModel]:
+    return create_model(
+        f"{model.__name__}Fields",
+        **{f: (model.model_fields[f].annotation, model.model_fields[f]) for f in fields},
+    )
+
+
+class FieldSet:
+    """A validated projection of one response model."""
+
+    def __init__(self, model: type[BaseModel], fields: list[str], derived: dict[str, tuple[str, ...]]):
+        self.fields = fields
+        self._model = _projected_model(model, tuple(fields))
+
+        columns: dict[str, None] = {}
+        for f in fields:
+            for column in derived.get(f, (f,)):
+                columns[column] = None
+        self.columns = list(columns)
+
+    @property
+    def select(self) -> str:
+        return ", ".join(self.columns)
+
+    def wants(self, *fields: str) -> bool:
+        return any(f in self.fields for f in fields)
+
+    def dump(self, row: dict) -> dict:
+        """JSON-ready dict with only the requested fields (extra keys ignored)."""
+        return self._model.model_validate(row).model_dump(mode="json")
+
+
+def parse_fields(
+    raw: Optional[str],
+    model: type[BaseModel],
+    derived: Optional[dict[str, tuple[str, ...]]] = None,
+) -> Optional[FieldSet]:
+    """
+    None when no projection was requested. Raises ValueError naming any
+    field the response model does not have.
+    """
+    if not raw:
+        return None
+
+    requested = list(dict.fromkeys(f.strip() for f in raw.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in model.model_fields]
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(model.model_fields)}"
+        )
+    if not requested:
+        raise ValueError("fields must name at least one field")
+
+    return FieldSet(model, requested, derived or {})
@@ -62,3 +62,9 @@ class FuelLogDetailResponse(BaseModel):
 class FuelLogListResponse(BaseModel):
     data: list[FuelLogDetailResponse]
     total: int
+
+
+class FuelLogBatchResponse(BaseModel):
+    """Records in requested order; `missing` lists IDs that were not found."""
+    data: list[FuelLogDetailResponse]
+    missing: list[int]
@@ -71,3 +71,32 @@ class MaintenanceDetailResponse(BaseModel):
 class MaintenanceListResponse(BaseModel):
     data: list[MaintenanceDetailResponse]
     total: int
+
+
+class MaintenanceBatchResponse(BaseModel):
+    """Records in requested order; `missing` lists IDs that were not found."""
+    data: list[MaintenanceDetailResponse]
+    missing: list[int]
+
+
+class MaintenanceDueItem(BaseModel):
+    """Predicted next service for one vehicle and service type."""
+    vehicle_id: int
+    service_type: ServiceType
+    last_service_date: Optional[date]   # None: no service on record
+    last_service_km: Decimal
+    current_km: Decimal
+    km_per_day: Optional[Decimal]       # None: too few recent fills
+    due_km: Optional[Decimal]           # None: time-based interval only
+    km_remaining: Optional[Decimal]
+    due_date: Optional[date]
+    days_remaining: Optional[int]
+    overdue: bool
+    # Joined fields
+    vehicle_plate: str
+    vehicle_model: str
+
+
+class MaintenanceDueListResponse(BaseModel):
+    data: list[MaintenanceDueItem]
+    total: int
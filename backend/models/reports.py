@@ -0,0 +1,36 @@
+"""
+models/reports.py — Pydantic schemas for background report jobs.
+"""
+
+from pydantic import BaseModel
+from typing import Literal, Optional
+from datetime import date, datetime
+
+
+class ReportCreate(BaseModel):
+    """
+    financial: fleet-wide (or one vehicle's) totals per month.
+    fleet: totals per vehicle per month.
+    """
+    report_type: Literal["financial", "fleet"]
+    date_from: date
+    date_to: date
+    vehicle_id: Optional[int] = None
+
+
+class ReportJobResponse(BaseModel):
+    id: str
+    report_type: str
+    status: Literal["queued", "running", "completed", "failed"]
+    progress: float
+    chunks_done: int
+    chunks_total: int
+    date_from: date
+    date_to: date
+    vehicle_id: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    error: Optional[str] = None
+    download_url: Optional[str] = None
@@ -71,3 +71,54 @@ class TripDetailResponse(BaseModel):
 class TripListResponse(BaseModel):
     data: list[TripDetailResponse]
     total: int
+
+
+class TripBatchResponse(BaseModel):
+    """Records in requested order; `missing` lists IDs that were not found."""
+    data: list[TripDetailResponse]
+    missing: list[int]
+
+
+# ---------------------------------------------------------------------------
+# Batch auto-assign
+# ---------------------------------------------------------------------------
+
+class CargoRequest(BaseModel):
+    """A pending load awaiting a vehicle and driver."""
+    ref: Optional[str] = Field(None, max_length=100)  # client-side reference, echoed back
+    cargo_weight_kg: Decimal = Field(..., gt=0)
+    origin: str = Field(..., max_length=500)
+    destination: str = Field(..., max_length=500)
+    distance_km: Optional[Decimal] = Field(None, ge=0)
+    revenue: Decimal = Field(default=Decimal("0"), ge=0)
+    scheduled_departure: datetime
+
+
+class AutoAssignRequest(BaseModel):
+    cargo: list[CargoRequest] = Field(..., min_length=1, max_length=5000)
+    create_trips: bool = False  # False = preview the plan only
+
+
+class TripAssignment(BaseModel):
+    index: int
+    ref: Optional[str] = None
+    vehicle_id: int
+    vehicle_plate: str
+    driver_id: int
+    driver_name: str
+    cargo_weight_kg: Decimal
+    unused_capacity_kg: float
+    trip_id: Optional[int] = None
+
+
+class UnassignedCargo(BaseModel):
+    index: int
+    ref: Optional[str] = None
+    reason: str
+
+
+class AutoAssignResponse(BaseModel):
+    assignments: list[TripAssignment]
+    unassigned: list[UnassignedCargo]
+    total_unused_capacity_kg: float
+    created: bool
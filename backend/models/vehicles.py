@@ -46,3 +46,9 @@ class VehicleResponse(VehicleBase):
 class VehicleListResponse(BaseModel):
     data: list[VehicleResponse]
     total: int
+
+
+class VehicleBatchResponse(BaseModel):
+    """Records in requested order; `missing` lists IDs that were not found."""
+    data: list[VehicleResponse]
+    missing: list[int]
@@ -6,3 +6,9 @@ from .maintenance import router as maintenance_router
 from .expenses import router as expenses_router
 from .fuel_logs import router as fuel_logs_router
 from .analytics import router as analytics_router
+from .search import router as search_router
+from .reports import router as reports_router
+from .export import router as export_router
+from .dashboard import router as dashboard_router
+from .documents import router as documents_router
+from .complaints import router as complaints_router
@@ -3,40 +3,52 @@ routes/analytics.py — Analytics and Dashboard API endpoints.
 Uses PostgreSQL views for pre-computed metrics.
 """
 
-from fastapi import APIRouter, HTTPException
-from typing import Optional
-from datetime import date
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional
+from datetime import date, timedelta
 
-from db.supabase import get_supabase
+from db.paging import PAGE_SIZE, fetch_all
+from db.supabase import get_supabase, has_capability
+from models.enums import ExpenseType
 from models.analytics import (
     DashboardKPIs,
     VehicleCostSummary,
     DriverPerformance,
     MonthlyFinancialSummary,
     AnalyticsSummary,
+    FuelAnomaly,
+    RollupPoint,
 )
-from auth import AnyAuthenticatedUser, DispatcherOrAbove, UserInDB
+from auth import AnyAuthenticatedUser, DispatcherOrAbove, HeavyRateLimit, UserInDB
+from services.events import live_dashboard
+from services.kpis import kpi_state
+from services.fuel_economy import detect_anomalies
+from services.lookups import vehicle_map
+from services.singleflight import analytics_flights
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
 
-@router.get("/dashboard/kpis", response_model=DashboardKPIs)
-async def get_dashboard_kpis(
-    user: UserInDB = AnyAuthenticatedUser,
-):
+def compute_dashboard_kpis() -> DashboardKPIs:
     """
-    Get dashboard KPIs: active fleet count, maintenance alerts,
-    utilization rate, and pending cargo.
+    Dashboard KPIs from the in-process KPI state once it is loaded;
+    otherwise from the view, or from the base tables.
     """
+    if kpi_state.loaded:
+        return kpi_state.kpis()
+    
     supabase = get_supabase()
     
     # Try to use the view if it exists, otherwise compute manually
-    try:
-        result = supabase.table("vw_dashboard_kpis").select("*").execute()
-        if result.data:
-            return DashboardKPIs(**result.data[0])
-    except Exception:
-        pass
+    if has_capability("vw_dashboard_kpis"):
+        try:
+            result = supabase.table("vw_dashboard_kpis").select("*").execute()
+            if result.data:
+                return DashboardKPIs(**result.data[0])
+        except Exception:
+            pass
     
     # Manual computation fallback
     vehicles = supabase.table("vehicles").select("status", count="exact").neq("status", "retired").execute()
@@ -56,7 +68,18 @@ async def get_dashboard_kpis(
     )
 
 
-@router.get("/vehicles/cost-summary", response_model=list[VehicleCostSummary])
+@router.get("/dashboard/kpis", response_model=DashboardKPIs)
+async def get_dashboard_kpis(
+    user: UserInDB = AnyAuthenticatedUser,
+):
+    """
+    Get dashboard KPIs: active fleet count, maintenance alerts,
+    utilization rate, and pending cargo.
+    """
+    return compute_dashboard_kpis()
+
+
+@router.get("/vehicles/cost-summary", response_model=list[VehicleCostSummary], dependencies=[HeavyRateLimit])
 async def get_vehicle_cost_summary(
     user: UserInDB = DispatcherOrAbove,
     limit: int = 10,
@@ -64,16 +87,23 @@ async def get_vehicle_cost_summary(
     """
     Get vehicle cost breakdown: fuel costs, maintenance costs,
     revenue, and net profit per vehicle.
+    
+    Concurrent identical requests share one computation.
     """
+    return await analytics_flights.do(("cost-summary", limit), compute_vehicle_cost_summary, limit)
+
+
+def compute_vehicle_cost_summary(limit: int) -> list[VehicleCostSummary]:
     supabase = get_supabase()
     
     # Try to use the view if it exists
-    try:
-        result = supabase.table("vw_vehicle_cost_summary").select("*").limit(limit).execute()
-        if result.data:
-            return [VehicleCostSummary(**v) for v in result.data]
-    except Exception:
-        pass
+    if has_capability("vw_vehicle_cost_summary"):
+        try:
+            result = supabase.table("vw_vehicle_cost_summary").select("*").limit(limit).execute()
+            if result.data:
+                return [VehicleCostSummary(**v) for v in result.data]
+        except Exception:
+            pass
     
     # Manual computation fallback
     # Get all non-retired vehicles
@@ -151,61 +181,121 @@ async def get_vehicle_cost_summary(
     return summaries
 
 
-@router.get("/drivers/performance", response_model=list[DriverPerformance])
+@router.get("/drivers/performance", response_model=list[DriverPerformance], dependencies=[HeavyRateLimit])
 async def get_driver_performance(
     user: UserInDB = DispatcherOrAbove,
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=1000),
+    order_by: Literal["safety_score", "completion_rate", "total_trips", "total_complaints"] = "safety_score",
 ):
     """
     Get driver performance metrics: completion rate, safety score,
-    total trips, and complaints.
+    total trips, and complaints, best first by `order_by`.
+    
+    Counters come from driver_stats (kept current by triggers), so this is
+    an indexed read rather than a recount of every trip and complaint.
+    Concurrent identical requests share one computation.
     """
+    return await analytics_flights.do(
+        ("driver-performance", limit, order_by), compute_driver_performance, limit, order_by
+    )
+
+
+COMPLAINT_COUNTERS = (
+    "total_complaints", "open_complaints",
+    "complaints_low", "complaints_medium", "complaints_high", "complaints_critical",
+)
+
+
+def count_complaints(complaints: list[dict]) -> dict[int, dict[str, int]]:
+    """Per-driver complaint counters from raw rows, as driver_stats keeps them."""
+    counts: dict[int, dict[str, int]] = {}
+    for c in complaints:
+        row = counts.setdefault(c["driver_id"], dict.fromkeys(COMPLAINT_COUNTERS, 0))
+        row["total_complaints"] += 1
+        if c["status"] in ("open", "investigating"):
+            row["open_complaints"] += 1
+        if c["status"] != "dismissed":
+            row[f"complaints_{c['severity']}"] += 1
+    return counts
+
+
+def compute_driver_performance(limit: int, order_by: str) -> list[DriverPerformance]:
     supabase = get_supabase()
     
     # Try to use the view if it exists
-    try:
-        result = supabase.table("vw_driver_performance").select("*").limit(limit).execute()
-        if result.data:
-            return [DriverPerformance(**d) for d in result.data]
-    except Exception:
-        pass
+    if has_capability("vw_driver_performance"):
+        try:
+            result = (
+                supabase.table("vw_driver_performance").select("*")
+                .order(order_by, desc=order_by != "total_complaints")
+                .order("driver_id")
+                .limit(limit)
+                .execute()
+            )
+            if result.data:
+                return [DriverPerformance(**d) for d in result.data]
+        except Exception:
+            pass
     
     # Manual computation fallback
-    # Get drivers with user info
-    drivers = supabase.table("drivers").select(
+    use_stats = has_capability("driver_stats")
+    drivers_query = supabase.table("drivers").select(
         "id, license_number, license_expiry, safety_score, duty_status, users!inner(first_name, last_name)"
-    ).limit(limit).execute()
+    )
+    stats_rows = None
+    if use_stats and order_by != "safety_score":
+        # Pick the page from the counters, then load those drivers
+        stats_rows = (
+            supabase.table("driver_stats").select("*")
+            .order(order_by, desc=order_by != "total_complaints")
+            .order("driver_id")
+            .limit(limit)
+            .execute()
+        ).data
+        drivers = drivers_query.in_("id", [s["driver_id"] for s in stats_rows] or [0]).execute()
+    else:
+        drivers = drivers_query.order("safety_score", desc=True).order("id").limit(limit).execute()
     
     if not drivers.data:
         return []
     
     driver_ids = [d["id"] for d in drivers.data]
     
-    # Get trip stats
-    trips = supabase.table("trips").select(
-        "driver_id, status"
-    ).in_("driver_id", driver_ids).execute()
-    
     trip_stats = {}
-    for t in trips.data:
-        did = t["driver_id"]
-        if did not in trip_stats:
-            trip_stats[did] = {"total": 0, "delivered": 0, "cancelled": 0}
-        trip_stats[did]["total"] += 1
-        if t["status"] == "delivered":
-            trip_stats[did]["delivered"] += 1
-        elif t["status"] == "cancelled":
-            trip_stats[did]["cancelled"] += 1
-    
-    # Get complaints
-    complaints = supabase.table("driver_complaints").select(
-        "driver_id"
-    ).in_("driver_id", driver_ids).execute()
-    
     complaint_counts = {}
-    for c in complaints.data:
-        did = c["driver_id"]
-        complaint_counts[did] = complaint_counts.get(did, 0) + 1
+    if use_stats:
+        if stats_rows is None:
+            stats_rows = supabase.table("driver_stats").select("*").in_("driver_id", driver_ids).execute().data
+        for s in stats_rows:
+            trip_stats[s["driver_id"]] = {
+                "total": s["total_trips"],
+                "delivered": s["completed_trips"],
+                "cancelled": s["cancelled_trips"],
+            }
+            # Older driver_stats (before migration 006) lack the severity columns
+            complaint_counts[s["driver_id"]] = {k: s.get(k, 0) for k in COMPLAINT_COUNTERS}
+    else:
+        # Get trip stats
+        trips = supabase.table("trips").select(
+            "driver_id, status"
+        ).in_("driver_id", driver_ids).execute()
+        
+        for t in trips.data:
+            did = t["driver_id"]
+            if did not in trip_stats:
+                trip_stats[did] = {"total": 0, "delivered": 0, "cancelled": 0}
+            trip_stats[did]["total"] += 1
+            if t["status"] == "delivered":
+                trip_stats[did]["delivered"] += 1
+            elif t["status"] == "cancelled":
+                trip_stats[did]["cancelled"] += 1
+        
+        # Get complaints
+        complaints = supabase.table("driver_complaints").select(
+            "driver_id, severity, status"
+        ).in_("driver_id", driver_ids).execute()
+        
+        complaint_counts = count_complaints(complaints.data)
     
     # Build response
     today = date.today()
@@ -235,13 +325,121 @@ async def get_driver_performance(
             completed_trips=stats["delivered"],
             cancelled_trips=stats["cancelled"],
             completion_rate=completion_rate,
-            total_complaints=complaint_counts.get(did, 0),
+            **complaint_counts.get(did, dict.fromkeys(COMPLAINT_COUNTERS, 0)),
         ))
     
+    if order_by == "total_complaints":
+        performance.sort(key=lambda p: (p.total_complaints, p.driver_id))
+    else:
+        performance.sort(key=lambda p: (-getattr(p, order_by), p.driver_id))
     return performance
 
 
-@router.get("/financial/monthly", response_model=list[MonthlyFinancialSummary])
+ROLLUP_METRICS = (
+    "trips_delivered", "distance_km", "revenue",
+    "fuel_liters", "fuel_cost", "maintenance_cost",
+) + tuple(f"expense_{t.value}" for t in ExpenseType)
+
+
+def _bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())  # Monday, as DATE_TRUNC('week')
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def load_rollup_series(
+    date_from: date,
+    date_to: date,
+    vehicle_id: Optional[int] = None,
+    bucket: str = "day",
+) -> list[dict]:
+    """
+    Bucketed totals from vehicle_daily_rollup, oldest first. Uses
+    fn_rollup_series (aggregated in the database) when deployed.
+    """
+    supabase = get_supabase()
+    
+    if has_capability("fn_rollup_series"):
+        result = supabase.rpc("fn_rollup_series", {
+            "p_from": date_from.isoformat(),
+            "p_to": date_to.isoformat(),
+            "p_vehicle_id": vehicle_id,
+            "p_bucket": bucket,
+        }).execute()
+        return result.data
+    
+    def rollup_query():
+        query = supabase.table("vehicle_daily_rollup").select(
+            "day, " + ", ".join(ROLLUP_METRICS)
+        ).gte("day", date_from.isoformat()).lte("day", date_to.isoformat())
+        if vehicle_id:
+            query = query.eq("vehicle_id", vehicle_id)
+        return query.order("vehicle_id").order("day")
+    
+    buckets: dict[date, dict] = {}
+    for r in fetch_all(rollup_query):
+        period = _bucket_start(date.fromisoformat(r["day"]), bucket)
+        totals = buckets.setdefault(period, {m: 0 for m in ROLLUP_METRICS})
+        for m in ROLLUP_METRICS:
+            totals[m] += float(r[m] or 0)
+    return [{"period": p.isoformat(), **buckets[p]} for p in sorted(buckets)]
+
+
+def _rollup_point(row: dict) -> RollupPoint:
+    expenses = {t.value: round(float(row[f"expense_{t.value}"] or 0), 2) for t in ExpenseType}
+    fuel_cost = float(row["fuel_cost"] or 0)
+    maintenance_cost = float(row["maintenance_cost"] or 0)
+    revenue = float(row["revenue"] or 0)
+    total_cost = fuel_cost + maintenance_cost + sum(expenses.values())
+    return RollupPoint(
+        period=row["period"],
+        trips_delivered=int(row["trips_delivered"] or 0),
+        distance_km=round(float(row["distance_km"] or 0), 2),
+        revenue=round(revenue, 2),
+        fuel_liters=round(float(row["fuel_liters"] or 0), 2),
+        fuel_cost=round(fuel_cost, 2),
+        maintenance_cost=round(maintenance_cost, 2),
+        expenses=expenses,
+        total_cost=round(total_cost, 2),
+        net_profit=round(revenue - total_cost, 2),
+    )
+
+
+@router.get("/timeseries", response_model=list[RollupPoint], dependencies=[HeavyRateLimit])
+async def get_timeseries(
+    user: UserInDB = DispatcherOrAbove,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    vehicle_id: Optional[int] = None,
+    bucket: Literal["day", "week", "month"] = "day",
+):
+    """
+    Distance, revenue, fuel, maintenance and expenses (by type) per day,
+    week or month for any date range — fleet-wide or for one vehicle.
+    Defaults to the last 30 days. Reads the daily rollup table.
+    """
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must be on or before date_to")
+    if date_to - date_from > timedelta(days=366 * 5):
+        raise HTTPException(status_code=400, detail="Date range is limited to 5 years")
+    # One row per bucket; fn_rollup_series answers in a single response
+    if bucket == "day" and (date_to - date_from).days + 1 > PAGE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"bucket=day is limited to {PAGE_SIZE} days; use week or month",
+        )
+    
+    if not has_capability("vehicle_daily_rollup"):
+        raise HTTPException(status_code=503, detail="vehicle_daily_rollup is not deployed")
+    
+    return [_rollup_point(r) for r in load_rollup_series(date_from, date_to, vehicle_id, bucket)]
+
+
+@router.get("/financial/monthly", response_model=list[MonthlyFinancialSummary], dependencies=[HeavyRateLimit])
 async def get_monthly_financial_summary(
     user: UserInDB = DispatcherOrAbove,
     months: int = 6,
@@ -249,16 +447,23 @@ async def get_monthly_financial_summary(
     """
     Get monthly financial summary: revenue, fuel costs,
     maintenance costs, and net profit.
+    
+    Concurrent identical requests share one computation.
     """
+    return await analytics_flights.do(("financial-monthly", months), compute_monthly_financial_summary, months)
+
+
+def compute_monthly_financial_summary(months: int) -> list[MonthlyFinancialSummary]:
     supabase = get_supabase()
     
     # Try to use the view if it exists
-    try:
-        result = supabase.table("vw_monthly_financial_summary").select("*").limit(months).execute()
-        if result.data:
-            return [MonthlyFinancialSummary(**m) for m in result.data]
-    except Exception:
-        pass
+    if has_capability("vw_monthly_financial_summary"):
+        try:
+            result = supabase.table("vw_monthly_financial_summary").select("*").limit(months).execute()
+            if result.data:
+                return [MonthlyFinancialSummary(**m) for m in result.data]
+        except Exception:
+            pass
     
     # Manual computation: get delivered trips with actual_arrival
     from datetime import datetime, timedelta
@@ -267,11 +472,13 @@ async def get_monthly_financial_summary(
     end_date = datetime.now()
     start_date = end_date - timedelta(days=months * 31)
     
+    # Both date bounds are explicit so fuel_logs partitions outside the
+    # window are pruned and trips use idx_trips_delivered_arrival
     trips = supabase.table("trips").select(
         "vehicle_id, revenue, actual_arrival"
     ).eq("status", "delivered").not_.is_("actual_arrival", "null").gte(
         "actual_arrival", start_date.isoformat()
-    ).execute()
+    ).lte("actual_arrival", end_date.isoformat()).execute()
     
     if not trips.data:
         return []
@@ -291,7 +498,9 @@ async def get_monthly_financial_summary(
     # Get fuel and maintenance costs per month (simplified - using all logs for now)
     fuel_logs = supabase.table("fuel_logs").select(
         "total_cost, fuel_date"
-    ).gte("fuel_date", start_date.date().isoformat()).execute()
+    ).gte("fuel_date", start_date.date().isoformat()).lte(
+        "fuel_date", end_date.date().isoformat()
+    ).execute()
     
     fuel_by_month = {}
     for f in fuel_logs.data:
@@ -329,7 +538,71 @@ async def get_monthly_financial_summary(
     return summaries
 
 
-@router.get("/summary", response_model=AnalyticsSummary)
+@router.get("/fuel/anomalies", response_model=list[FuelAnomaly], dependencies=[HeavyRateLimit])
+async def get_fuel_anomalies(
+    user: UserInDB = DispatcherOrAbove,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    vehicle_id: Optional[int] = None,
+    k: float = Query(3.5, gt=0, le=20),
+    limit: int = Query(200, ge=1, le=1000),
+):
+    """
+    Fuel fills with suspicious economy: odometer rollbacks, possible fuel
+    theft (km/L far below the vehicle's median) and high outliers, using a
+    k·MAD threshold per vehicle.
+    """
+    supabase = get_supabase()
+    
+    if has_capability("fn_fuel_anomalies"):
+        result = supabase.rpc("fn_fuel_anomalies", {
+            "p_date_from": date_from.isoformat() if date_from else None,
+            "p_date_to": date_to.isoformat() if date_to else None,
+            "p_vehicle_id": vehicle_id,
+            "p_k": k,
+        }).limit(limit).execute()
+        rows = result.data
+    else:
+        # Fallback: pull the fills (paged past PostgREST's row cap) and
+        # compute in process. History before date_from is still needed for
+        # medians and the first delta.
+        def fills_query():
+            query = supabase.table("fuel_logs").select(
+                "id, vehicle_id, fuel_date, liters, odometer_at_fill"
+            )
+            if vehicle_id:
+                query = query.eq("vehicle_id", vehicle_id)
+            if date_to:
+                query = query.lte("fuel_date", date_to.isoformat())
+            return query.order("vehicle_id").order("fuel_date").order("id")
+        
+        rows = detect_anomalies(fetch_all(fills_query), k)
+        if date_from:
+            rows = [r for r in rows if str(r["fuel_date"]) >= date_from.isoformat()]
+        rows.sort(key=lambda r: (str(r["fuel_date"]), r["id"]), reverse=True)
+        rows = rows[:limit]
+    
+    vehicles = vehicle_map({r["vehicle_id"] for r in rows}) if rows else {}
+    
+    return [
+        FuelAnomaly(
+            fuel_log_id=r["id"],
+            vehicle_id=r["vehicle_id"],
+            license_plate=vehicles.get(r["vehicle_id"], {}).get("license_plate", "Unknown"),
+            fuel_date=r["fuel_date"],
+            liters=r["liters"],
+            odometer_at_fill=r["odometer_at_fill"],
+            distance_km=r.get("distance_km"),
+            km_per_liter=r.get("km_per_liter"),
+            median_km_per_liter=r.get("median_km_per_liter"),
+            mad=r.get("mad"),
+            anomaly=r["anomaly"],
+        )
+        for r in rows
+    ]
+
+
+@router.get("/summary", response_model=AnalyticsSummary, dependencies=[HeavyRateLimit])
 async def get_analytics_summary(
     user: UserInDB = DispatcherOrAbove,
 ):
@@ -350,11 +623,8 @@ async def get_analytics_summary(
     )
 
 
-@router.get("/fleet/stats")
-async def get_fleet_stats(
-    user: UserInDB = AnyAuthenticatedUser,
-):
-    """Get quick fleet statistics."""
+def compute_fleet_stats() -> dict:
+    """Count vehicles, drivers and trips by status."""
     supabase = get_supabase()
     
     vehicles = supabase.table("vehicles").select("status", count="exact").neq("status", "retired").execute()
@@ -390,3 +660,35 @@ async def get_fleet_stats(
             "by_status": trip_counts,
         },
     }
+
+
+@router.get("/fleet/stats", dependencies=[HeavyRateLimit])
+async def get_fleet_stats(
+    user: UserInDB = AnyAuthenticatedUser,
+):
+    """Get quick fleet statistics."""
+    return compute_fleet_stats()
+
+
+def compute_live_snapshot() -> dict:
+    """Snapshot pushed to /analytics/live subscribers (JSON-safe)."""
+    return jsonable_encoder({
+        "kpis": compute_dashboard_kpis(),
+        "fleet": compute_fleet_stats(),
+    })
+
+
+@router.get("/live")
+async def stream_live_dashboard(
+    user: UserInDB = AnyAuthenticatedUser,
+):
+    """
+    Server-sent events stream of dashboard KPIs and fleet stats.
+    Sends a `snapshot` event on connect, then `delta` events containing only
+    the fields changed by trip, maintenance, vehicle and driver writes.
+    """
+    return StreamingResponse(
+        live_dashboard.subscribe(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,254 @@
+"""
+routes/complaints.py — Driver complaints API endpoints.
+
+Filing, triage (investigate / resolve / dismiss / reopen) and listing.
+Per-driver counters (total, open, per severity) are moved by the
+driver_stats trigger on every insert, severity or status change, so
+/analytics/drivers/performance never re-counts complaints.
+"""
+
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+
+from db.supabase import get_supabase
+from models.complaints import (
+    ComplaintCreate,
+    ComplaintUpdate,
+    ComplaintResponse,
+    ComplaintDetailResponse,
+    ComplaintListResponse,
+)
+from models.enums import ComplaintStatus, ComplaintType, SeverityLevel
+from auth import DispatcherOrAbove, ManagerOrAbove, UserInDB
+from services.lookups import driver_map
+
+router = APIRouter(prefix="/complaints", tags=["Complaints"])
+
+ACTIVE = {ComplaintStatus.open.value, ComplaintStatus.investigating.value}
+CLOSED = {ComplaintStatus.resolved.value, ComplaintStatus.dismissed.value}
+
+
+def _trip_routes(trip_ids) -> dict[int, str]:
+    ids = list({t for t in trip_ids if t})
+    if not ids:
+        return {}
+    result = get_supabase().table("trips").select("id, origin, destination").in_("id", ids).execute()
+    return {t["id"]: f"{t['origin']} → {t['destination']}" for t in result.data}
+
+
+def _build_complaint_details(rows: list[dict]) -> list[ComplaintDetailResponse]:
+    """Helper to build ComplaintDetailResponse with joined data."""
+    drivers = driver_map(c["driver_id"] for c in rows)
+    routes = _trip_routes(c.get("trip_id") for c in rows)
+    
+    return [
+        ComplaintDetailResponse(
+            id=c["id"],
+            driver_id=c["driver_id"],
+            trip_id=c.get("trip_id"),
+            complaint_type=c["complaint_type"],
+            description=c["description"],
+            severity=c["severity"],
+            status=c["status"],
+            reported_by=c.get("reported_by"),
+            resolved_at=c.get("resolved_at"),
+            driver_name=drivers.get(c["driver_id"], {}).get("name", "Unknown"),
+            trip_route=routes.get(c.get("trip_id")),
+        )
+        for c in rows
+    ]
+
+
+@router.get("", response_model=ComplaintListResponse)
+async def list_complaints(
+    user: UserInDB = DispatcherOrAbove,
+    status: Optional[ComplaintStatus] = None,
+    severity: Optional[SeverityLevel] = None,
+    complaint_type: Optional[ComplaintType] = None,
+    driver_id: Optional[int] = None,
+    trip_id: Optional[int] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+):
+    """List complaints with filtering, newest first."""
+    supabase = get_supabase()
+    
+    query = supabase.table("driver_complaints").select("*", count="exact")
+    
+    # status and driver_id are indexed; severity / type narrow within them
+    if status:
+        query = query.eq("status", status.value)
+    if driver_id:
+        query = query.eq("driver_id", driver_id)
+    if severity:
+        query = query.eq("severity", severity.value)
+    if complaint_type:
+        query = query.eq("complaint_type", complaint_type.value)
+    if trip_id:
+        query = query.eq("trip_id", trip_id)
+    
+    result = query.order("id", desc=True).range(skip, skip + limit - 1).execute()
+    
+    if not result.data:
+        return ComplaintListResponse(data=[], total=0)
+    
+    return ComplaintListResponse(
+        data=_build_complaint_details(result.data),
+        total=result.count or len(result.data),
+    )
+
+
+@router.get("/{complaint_id}", response_model=ComplaintDetailResponse)
+async def get_complaint(
+    complaint_id: int,
+    user: UserInDB = DispatcherOrAbove,
+):
+    """Get a single complaint by ID."""
+    supabase = get_supabase()
+    
+    result = supabase.table("driver_complaints").select("*").eq("id", complaint_id).execute()
+    
+    if not result.data:
+        raise HTTPException(status_code=404, detail="Complaint not found")
+    
+    return _build_complaint_details(result.data)[0]
+
+
+@router.post("", response_model=ComplaintResponse, status_code=201)
+async def create_complaint(
+    complaint: ComplaintCreate,
+    user: UserInDB = DispatcherOrAbove,
+):
+    """File a complaint against a driver, optionally tied to one of their trips."""
+    supabase = get_supabase()
+    
+    driver = supabase.table("drivers").select("id").eq("id", complaint.driver_id).execute()
+    if not driver.data:
+        raise HTTPException(status_code=404, detail="Driver not found")
+    
+    if complaint.trip_id:
+        trip = supabase.table("trips").select("id, driver_id").eq("id", complaint.trip_id).execute()
+        if not trip.data:
+            raise HTTPException(status_code=404, detail="Trip not found")
+        if trip.data[0]["driver_id"] != complaint.driver_id:
+            raise HTTPException(status_code=400, detail="Trip was not driven by this driver")
+    
+    data = complaint.model_dump()
+    data["reported_by"] = user.id
+    
+    result = supabase.table("driver_complaints").insert(data).execute()
+    
+    if not result.data:
+        raise HTTPException(status_code=500, detail="Failed to create complaint")
+    
+    return ComplaintResponse(**result.data[0])
+
+
+@router.put("/{complaint_id}", response_model=ComplaintResponse)
+async def update_complaint(
+    complaint_id: int,
+    complaint: ComplaintUpdate,
+    user: UserInDB = ManagerOrAbove,
+):
+    """Edit a complaint's type, description or severity. Requires Manager or Admin role."""
+    supabase = get_supabase()
+    
+    existing = supabase.table("driver_complaints").select("id").eq("id", complaint_id).execute()
+    if not existing.data:
+        raise HTTPException(status_code=404, detail="Complaint not found")
+    
+    update_data = {k: v for k, v in complaint.model_dump().items() if v is not None}
+    
+    if not update_data:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    
+    result = supabase.table("driver_complaints").update(update_data).eq("id", complaint_id).execute()
+    
+    return ComplaintResponse(**result.data[0])
+
+
+def _transition(complaint_id: int, allowed: set[str], new_status: ComplaintStatus) -> ComplaintResponse:
+    """Move a complaint to new_status if its current status allows it."""
+    supabase = get_supabase()
+    
+    existing = supabase.table("driver_complaints").select("id, status").eq("id", complaint_id).execute()
+    if not existing.data:
+        raise HTTPException(status_code=404, detail="Complaint not found")
+    
+    current = existing.data[0]["status"]
+    if current not in allowed:
+        raise HTTPException(status_code=400, detail=f"Cannot move a complaint from {current} to {new_status.value}")
+    
+    update_data = {"status": new_status.value}
+    if new_status.value in CLOSED:
+        update_data["resolved_at"] = datetime.now(timezone.utc).isoformat()
+    else:
+        update_data["resolved_at"] = None
+    
+    # Conditional on the status we checked, so two concurrent transitions cannot both apply
+    result = supabase.table("driver_complaints").update(update_data).eq(
+        "id", complaint_id
+    ).in_("status", list(allowed)).execute()
+    if not result.data:
+        raise HTTPException(status_code=409, detail="Complaint status changed concurrently; reload and retry")
+    
+    return ComplaintResponse(**result.data[0])
+
+
+@router.put("/{complaint_id}/investigate")
+async def investigate_complaint(
+    complaint_id: int,
+    user: UserInDB = ManagerOrAbove,
+):
+    """Start investigating an open complaint."""
+    complaint = _transition(complaint_id, {ComplaintStatus.open.value}, ComplaintStatus.investigating)
+    return {"message": "Complaint under investigation", "complaint": complaint}
+
+
+@router.put("/{complaint_id}/resolve")
+async def resolve_complaint(
+    complaint_id: int,
+    user: UserInDB = ManagerOrAbove,
+):
+    """Resolve an open or investigating complaint (upheld and dealt with)."""
+    complaint = _transition(complaint_id, ACTIVE, ComplaintStatus.resolved)
+    return {"message": "Complaint resolved", "complaint": complaint}
+
+
+@router.put("/{complaint_id}/dismiss")
+async def dismiss_complaint(
+    complaint_id: int,
+    user: UserInDB = ManagerOrAbove,
+):
+    """Dismiss an open or investigating complaint; it stops counting per severity."""
+    complaint = _transition(complaint_id, ACTIVE, ComplaintStatus.dismissed)
+    return {"message": "Complaint dismissed", "complaint": complaint}
+
+
+@router.put("/{complaint_id}/reopen")
+async def reopen_complaint(
+    complaint_id: int,
+    user: UserInDB = ManagerOrAbove,
+):
+    """Reopen a resolved or dismissed complaint."""
+    complaint = _transition(complaint_id, CLOSED, ComplaintStatus.open)
+    return {"message": "Complaint reopened", "complaint": complaint}
+
+
+@router.delete("/{complaint_id}", status_code=204)
+async def delete_complaint(
+    complaint_id: int,
+    user: UserInDB = ManagerOrAbove,
+):
+    """Delete a complaint (e.g. filed in error). Requires Manager or Admin role."""
+    supabase = get_supabase()
+    
+    existing = supabase.table("driver_complaints").select("id").eq("id", complaint_id).execute()
+    if not existing.data:
+        raise HTTPException(status_code=404, detail="Complaint not found")
+    
+    supabase.table("driver_complaints").delete().eq("id", complaint_id).execute()
+    
+    return None
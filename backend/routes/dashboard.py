@@ -0,0 +1,99 @@
+"""
+routes/dashboard.py — Composite first-load payload for the dashboard.
+
+The dashboard used to issue one request per widget, each resolving the
+user again and looking up labels on its own. /dashboard/bootstrap resolves
+the user once, runs every section's queries concurrently in worker threads,
+then decorates trips and maintenance with a single vehicle lookup.
+"""
+
+import asyncio
+from datetime import date, timedelta
+
+from fastapi import APIRouter
+
+from db.supabase import get_supabase
+from models.dashboard import DashboardBootstrap, ExpiringLicense
+from models.enums import MaintenanceStatus
+from auth import AnyAuthenticatedUser, HeavyRateLimit, UserInDB, UserRole
+from routes.analytics import compute_dashboard_kpis, compute_fleet_stats
+from routes.documents import get_document_digest
+from routes.maintenance import _build_maintenance_detail
+from routes.trips import _build_trip_detail
+from services.lookups import vehicle_map, driver_map
+
+router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
+
+RECENT_TRIPS = 10
+OPEN_MAINTENANCE = 10
+EXPIRING_LICENSES = 20
+LICENSE_WINDOW_DAYS = 30
+
+DISPATCH_ROLES = {UserRole.dispatcher, UserRole.manager, UserRole.admin}
+
+
+def load_recent_trips() -> list[dict]:
+    return get_supabase().table("trips").select("*").order(
+        "scheduled_departure", desc=True
+    ).limit(RECENT_TRIPS).execute().data
+
+
+def load_open_maintenance() -> list[dict]:
+    return get_supabase().table("maintenance_logs").select("*").in_(
+        "status", [MaintenanceStatus.new.value, MaintenanceStatus.in_progress.value]
+    ).order("id", desc=True).limit(OPEN_MAINTENANCE).execute().data
+
+
+def load_expiring_licenses() -> list[ExpiringLicense]:
+    today = date.today()
+    result = get_supabase().table("drivers").select(
+        "id, license_number, license_expiry, duty_status, users!inner(first_name, last_name)"
+    ).lte(
+        "license_expiry", (today + timedelta(days=LICENSE_WINDOW_DAYS)).isoformat()
+    ).neq("duty_status", "suspended").order("license_expiry").limit(EXPIRING_LICENSES).execute()
+    
+    licenses = []
+    for d in result.data:
+        user_data = d.get("users", {})
+        expiry = date.fromisoformat(d["license_expiry"])
+        licenses.append(ExpiringLicense(
+            driver_id=d["id"],
+            driver_name=f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip(),
+            license_number=d["license_number"],
+            license_expiry=expiry,
+            days_left=(expiry - today).days,
+            duty_status=d["duty_status"],
+        ))
+    return licenses
+
+
+@router.get("/bootstrap", response_model=DashboardBootstrap, dependencies=[HeavyRateLimit])
+async def get_dashboard_bootstrap(
+    user: UserInDB = AnyAuthenticatedUser,
+):
+    """
+    KPIs, fleet stats by status, document expiry counts, recent trips,
+    open maintenance and licenses expiring within 30 days in one response. Trip, maintenance
+    and license sections are included for Dispatcher and above.
+    """
+    sections = [compute_dashboard_kpis, compute_fleet_stats, get_document_digest]
+    if user.role in DISPATCH_ROLES:
+        sections += [load_recent_trips, load_open_maintenance, load_expiring_licenses]
+    
+    results = await asyncio.gather(*(asyncio.to_thread(load) for load in sections))
+    payload = DashboardBootstrap(kpis=results[0], fleet=results[1], documents=results[2])
+    
+    if user.role in DISPATCH_ROLES:
+        trips, maintenance, licenses = results[3:]
+        
+        # One label lookup shared by both sections
+        vehicles = await asyncio.to_thread(
+            vehicle_map, [t["vehicle_id"] for t in trips] + [m["vehicle_id"] for m in maintenance]
+        )
+        drivers = await asyncio.to_thread(driver_map, [t["driver_id"] for t in trips])
+        
+        payload.recent_trips = [_build_trip_detail(t, vehicles, drivers) for t in trips]
+        payload.open_maintenance = [_build_maintenance_detail(m, vehicles) for m in maintenance]
+        payload.expiring_licenses = licenses
+    
+    return payload
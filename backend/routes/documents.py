@@ -0,0 +1,303 @@
+"""
+routes/documents.py — Vehicle documents (insurance, permits, fitness) API endpoints.
+
+Mounted under /vehicles/documents; included before the vehicles router so
+the paths are not taken for /vehicles/{vehicle_id}. Expiry queries are
+range scans on idx_vdocs_expiry. The dashboard's alert counts come from a
+digest of exact count queries, computed once per day (and after any
+document write) and served from memory.
+"""
+
+import re
+from datetime import date, timedelta
+
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+
+from db.supabase import get_supabase
+from models.documents import (
+    VehicleDocumentCreate,
+    VehicleDocumentUpdate,
+    VehicleDocumentResponse,
+    VehicleDocumentDetailResponse,
+    VehicleDocumentListResponse,
+    DocumentDigest,
+)
+from models.enums import DocumentType
+from auth import AnyAuthenticatedUser, DispatcherOrAbove, ManagerOrAbove, UserInDB
+from services.cache import document_digest_cache, invalidate_document_digest
+from services.lookups import vehicle_map
+
+router = APIRouter(prefix="/vehicles/documents", tags=["Vehicle Documents"])
+
+MAX_WITHIN_DAYS = 365
+DIGEST_WINDOW_DAYS = 30
+
+
+def parse_within(raw: str) -> int:
+    """'30d' / '4w' / '30' -> days. Raises ValueError."""
+    match = re.fullmatch(r"\s*(\d+)\s*([dw]?)\s*", raw.lower())
+    if not match:
+        raise ValueError("within must look like 30d, 4w or 30")
+    days = int(match.group(1)) * (7 if match.group(2) == "w" else 1)
+    if days > MAX_WITHIN_DAYS:
+        raise ValueError(f"within is limited to {MAX_WITHIN_DAYS} days")
+    return days
+
+
+def _build_document_detail(doc: dict, vehicles: dict, today: date) -> VehicleDocumentDetailResponse:
+    """Helper to build VehicleDocumentDetailResponse with joined data."""
+    vehicle = vehicles.get(doc["vehicle_id"], {})
+    expiry = date.fromisoformat(str(doc["expiry_date"]))
+    
+    return VehicleDocumentDetailResponse(
+        id=doc["id"],
+        vehicle_id=doc["vehicle_id"],
+        document_type=doc["document_type"],
+        document_number=doc["document_number"],
+        issue_date=doc["issue_date"],
+        expiry_date=expiry,
+        days_left=(expiry - today).days,
+        expired=expiry < today,
+        vehicle_plate=vehicle.get("license_plate", "Unknown"),
+        vehicle_model=f"{vehicle.get('make', '')} {vehicle.get('model', '')}".strip() or "Unknown",
+    )
+
+
+def _active_documents(columns: str = "id"):
+    """Documents of non-retired vehicles, with an exact match count."""
+    return get_supabase().table("vehicle_documents").select(
+        f"{columns}, vehicles!inner(status)", count="exact"
+    ).neq("vehicles.status", "retired")
+
+
+def _count(query) -> int:
+    return query.limit(1).execute().count or 0
+
+
+def compute_document_digest(today: date) -> DocumentDigest:
+    """
+    Expired and soon-expiring documents of non-retired vehicles. Each bucket
+    is an exact count query, so no document rows are transferred and the
+    totals are not subject to PostgREST's row cap.
+    """
+    start = today.isoformat()
+    week = (today + timedelta(days=7)).isoformat()
+    horizon = (today + timedelta(days=DIGEST_WINDOW_DAYS)).isoformat()
+    
+    by_type = {}
+    for document_type in DocumentType:
+        count = _count(
+            _active_documents().eq("document_type", document_type.value).lte("expiry_date", horizon)
+        )
+        if count:
+            by_type[document_type.value] = count
+    
+    return DocumentDigest(
+        as_of=today,
+        expired=_count(_active_documents().lt("expiry_date", start)),
+        expiring_7d=_count(_active_documents().gte("expiry_date", start).lte("expiry_date", week)),
+        expiring_30d=_count(_active_documents().gte("expiry_date", start).lte("expiry_date", horizon)),
+        by_type=by_type,
+    )
+
+
+def get_document_digest() -> DocumentDigest:
+    """Today's digest from memory; computed on the first call of the day."""
+    today = date.today()
+    return document_digest_cache.get_or_load(today, lambda: compute_document_digest(today))
+
+
+@router.get("", response_model=VehicleDocumentListResponse)
+async def list_documents(
+    user: UserInDB = DispatcherOrAbove,
+    vehicle_id: Optional[int] = None,
+    document_type: Optional[DocumentType] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+):
+    """List vehicle documents, soonest expiry first."""
+    supabase = get_supabase()
+    
+    query = supabase.table("vehicle_documents").select("*", count="exact")
+    
+    if vehicle_id:
+        query = query.eq("vehicle_id", vehicle_id)
+    if document_type:
+        query = query.eq("document_type", document_type.value)
+    
+    result = query.order("expiry_date").order("id").range(skip, skip + limit - 1).execute()
+    
+    if not result.data:
+        return VehicleDocumentListResponse(data=[], total=0)
+    
+    vehicles = vehicle_map(d["vehicle_id"] for d in result.data)
+    today = date.today()
+    
+    return VehicleDocumentListResponse(
+        data=[_build_document_detail(d, vehicles, today) for d in result.data],
+        total=result.count or len(result.data),
+    )
+
+
+@router.get("/expiring", response_model=VehicleDocumentListResponse)
+async def list_expiring_documents(
+    user: UserInDB = DispatcherOrAbove,
+    within: str = Query("30d", description="Window from today: 30d, 4w or a number of days"),
+    include_expired: bool = True,
+    document_type: Optional[DocumentType] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+):
+    """
+    Documents of non-retired vehicles expiring within the window, soonest
+    first (the same documents the digest counts). Already expired
+    documents are included unless include_expired=false.
+    """
+    try:
+        days = parse_within(within)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    today = date.today()
+    
+    query = _active_documents("*").lte("expiry_date", (today + timedelta(days=days)).isoformat())
+    if not include_expired:
+        query = query.gte("expiry_date", today.isoformat())
+    if document_type:
+        query = query.eq("document_type", document_type.value)
+    
+    result = query.order("expiry_date").order("id").range(skip, skip + limit - 1).execute()
+    
+    if not result.data:
+        return VehicleDocumentListResponse(data=[], total=0)
+    
+    vehicles = vehicle_map(d["vehicle_id"] for d in result.data)
+    
+    return VehicleDocumentListResponse(
+        data=[_build_document_detail(d, vehicles, today) for d in result.data],
+        total=result.count or len(result.data),
+    )
+
+
+@router.get("/digest", response_model=DocumentDigest)
+async def get_digest(
+    user: UserInDB = AnyAuthenticatedUser,
+):
+    """Counts of expired and soon-expiring documents, served from memory."""
+    return get_document_digest()
+
+
+@router.get("/{document_id}", response_model=VehicleDocumentDetailResponse)
+async def get_document(
+    document_id: int,
+    user: UserInDB = DispatcherOrAbove,
+):
+    """Get a single vehicle document by ID."""
+    supabase = get_supabase()
+    
+    result = supabase.table("vehicle_documents").select("*").eq("id", document_id).execute()
+    
+    if not result.data:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    doc = result.data[0]
+    
+    return _build_document_detail(doc, vehicle_map([doc["vehicle_id"]]), date.today())
+
+
+@router.post("", response_model=VehicleDocumentResponse, status_code=201)
+async def create_document(
+    doc: VehicleDocumentCreate,
+    user: UserInDB = ManagerOrAbove,
+):
+    """Add a document to a vehicle. Requires Manager or Admin role."""
+    supabase = get_supabase()
+    
+    vehicle = supabase.table("vehicles").select("id").eq("id", doc.vehicle_id).execute()
+    if not vehicle.data:
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    
+    # Check for duplicate (vehicle, type, number)
+    existing = supabase.table("vehicle_documents").select("id").eq(
+        "vehicle_id", doc.vehicle_id
+    ).eq("document_type", doc.document_type.value).eq("document_number", doc.document_number).execute()
+    if existing.data:
+        raise HTTPException(status_code=400, detail="This document is already recorded for the vehicle")
+    
+    data = doc.model_dump()
+    # Convert dates to ISO strings for Supabase
+    data["issue_date"] = data["issue_date"].isoformat()
+    data["expiry_date"] = data["expiry_date"].isoformat()
+    
+    result = supabase.table("vehicle_documents").insert(data).execute()
+    
+    if not result.data:
+        raise HTTPException(status_code=500, detail="Failed to create document")
+    
+    invalidate_document_digest()
+    
+    return VehicleDocumentResponse(**result.data[0])
+
+
+@router.put("/{document_id}", response_model=VehicleDocumentResponse)
+async def update_document(
+    document_id: int,
+    doc: VehicleDocumentUpdate,
+    user: UserInDB = ManagerOrAbove,
+):
+    """Update a vehicle document (e.g. a renewal). Requires Manager or Admin role."""
+    supabase = get_supabase()
+    
+    existing = supabase.table("vehicle_documents").select("*").eq("id", document_id).execute()
+    if not existing.data:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    update_data = {k: v for k, v in doc.model_dump().items() if v is not None}
+    
+    if not update_data:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    
+    for field in ("issue_date", "expiry_date"):
+        if field in update_data:
+            update_data[field] = update_data[field].isoformat()
+    
+    # Validate the dates as they will be stored
+    merged = {**existing.data[0], **update_data}
+    if merged["expiry_date"] < merged["issue_date"]:
+        raise HTTPException(status_code=400, detail="expiry_date must be >= issue_date")
+    
+    # Check for duplicate (vehicle, type, number) against the row as it will be stored
+    if "document_type" in update_data or "document_number" in update_data:
+        duplicate = supabase.table("vehicle_documents").select("id").eq(
+            "vehicle_id", merged["vehicle_id"]
+        ).eq("document_type", DocumentType(merged["document_type"]).value).eq(
+            "document_number", merged["document_number"]
+        ).neq("id", document_id).execute()
+        if duplicate.data:
+            raise HTTPException(status_code=400, detail="This document is already recorded for the vehicle")
+    
+    result = supabase.table("vehicle_documents").update(update_data).eq("id", document_id).execute()
+    
+    invalidate_document_digest()
+    
+    return VehicleDocumentResponse(**result.data[0])
+
+
+@router.delete("/{document_id}", status_code=204)
+async def delete_document(
+    document_id: int,
+    user: UserInDB = ManagerOrAbove,
+):
+    """Delete a vehicle document. Requires Manager or Admin role."""
+    supabase = get_supabase()
+    
+    existing = supabase.table("vehicle_documents").select("id").eq("id", document_id).execute()
+    if not existing.data:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    supabase.table("vehicle_documents").delete().eq("id", document_id).execute()
+    
+    invalidate_document_digest()
+    
+    return None
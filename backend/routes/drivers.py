@@ -3,9 +3,12 @@ routes/drivers.py — Driver CRUD API endpoints.
 """
 
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
 from typing import Optional
 
-from db.supabase import get_supabase
+from db.batch import fetch_by_ids, in_request_order, parse_ids
+from db.supabase import get_supabase, has_capability
+from db.search import ilike_filter, search_rpc
 from models.drivers import (
     DriverCreate,
     DriverUpdate,
@@ -13,13 +16,36 @@ from models.drivers import (
     DriverWithUserResponse,
     DriverListResponse,
     DriverOption,
+    DriverBatchResponse,
 )
 from models.enums import DutyStatus
+from models.fields import FieldSet, parse_fields
 from auth import DispatcherOrAbove, ManagerOrAbove, UserInDB
+from services.cache import driver_options_cache, invalidate_driver_options
+from services.lookups import driver_map, invalidate_driver_label
+from services.events import live_dashboard
+from services.typeahead import index_driver, remove_driver
 
 router = APIRouter(prefix="/drivers", tags=["Drivers"])
 
 
+# Response fields read from the joined users row rather than drivers columns
+DRIVER_DERIVED_FIELDS = {
+    "first_name": ("users!inner(first_name, last_name, email)",),
+    "last_name": ("users!inner(first_name, last_name, email)",),
+    "email": ("users!inner(first_name, last_name, email)",),
+}
+
+
+def _projected_drivers(rows: list[dict], fieldset: FieldSet) -> list[dict]:
+    """Project drivers to `fieldset`, flattening the joined user columns."""
+    projected = []
+    for d in rows:
+        user_data = d.pop("users", None) or {}
+        projected.append(fieldset.dump({**d, **user_data}))
+    return projected
+
+
 @router.get("", response_model=DriverListResponse)
 async def list_drivers(
     user: UserInDB = DispatcherOrAbove,
@@ -27,24 +53,66 @@ async def list_drivers(
     search: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields, e.g. id,duty_status,first_name"),
 ):
-    """List all drivers with user info."""
+    """
+    List all drivers with user info. `search` matches name, email or
+    license number and results are ranked by relevance.
+    `fields` limits both the database select and the response to those fields.
+    """
     supabase = get_supabase()
     
+    try:
+        fieldset = parse_fields(fields, DriverWithUserResponse, DRIVER_DERIVED_FIELDS)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    if search and has_capability("fn_search_drivers"):
+        # Trigram-indexed, parameterized search (fn_search_drivers in schema.sql)
+        rows, total = search_rpc("fn_search_drivers", {
+            "p_query": search,
+            "p_duty_status": duty_status.value if duty_status else None,
+            "p_limit": limit,
+            "p_offset": skip,
+        })
+        if fieldset:
+            return JSONResponse({"data": _projected_drivers(rows, fieldset), "total": total})
+        return DriverListResponse(
+            data=[DriverWithUserResponse(**d) for d in rows],
+            total=total,
+        )
+    
     # Query drivers with joined user data
     query = supabase.table("drivers").select(
-        "*, users!inner(first_name, last_name, email)",
+        fieldset.select if fieldset else "*, users!inner(first_name, last_name, email)",
         count="exact"
     )
     
     if duty_status:
         query = query.eq("duty_status", duty_status.value)
     
+    if search:
+        # Fallback: match users first, then drivers by user_id or license
+        users = supabase.table("users").select("id").or_(
+            ilike_filter(["first_name", "last_name", "email"], search)
+        ).limit(500).execute()
+        conditions = [ilike_filter(["license_number"], search)]
+        if users.data:
+            user_ids = ",".join(str(u["id"]) for u in users.data)
+            conditions.append(f"user_id.in.({user_ids})")
+        query = query.or_(",".join(conditions))
+    
     # Pagination
     query = query.range(skip, skip + limit - 1).order("id", desc=True)
     
     result = query.execute()
     
+    if fieldset:
+        return JSONResponse({
+            "data": _projected_drivers(result.data, fieldset),
+            "total": result.count or len(result.data),
+        })
+    
     # Transform data to match response schema
     drivers = []
     for d in result.data:
@@ -62,12 +130,8 @@ async def list_drivers(
     )
 
 
-@router.get("/options")
-async def get_driver_options(
-    user: UserInDB = DispatcherOrAbove,
-    available_only: bool = True,
-):
-    """Get driver options for dropdowns."""
+def load_driver_options(available_only: bool) -> list[dict]:
+    """Query and shape the dropdown list for one availability filter."""
     supabase = get_supabase()
     
     query = supabase.table("drivers").select(
@@ -95,21 +159,67 @@ async def get_driver_options(
     return options
 
 
+@router.get("/options")
+async def get_driver_options(
+    user: UserInDB = DispatcherOrAbove,
+    available_only: bool = True,
+):
+    """Get driver options for dropdowns. Served from the reference cache."""
+    return driver_options_cache.get_or_load(available_only, lambda: load_driver_options(available_only))
+
+
+@router.get("/batch", response_model=DriverBatchResponse)
+async def get_drivers_batch(
+    user: UserInDB = DispatcherOrAbove,
+    ids: str = Query(..., description="Comma-separated IDs (max 100)"),
+):
+    """Get many drivers by ID with user info in one query, in the order requested."""
+    try:
+        id_list = parse_ids(ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    rows, missing = in_request_order(
+        id_list, fetch_by_ids("drivers", "*, users!inner(first_name, last_name, email)", id_list)
+    )
+    
+    drivers = []
+    for d in rows:
+        user_data = d.pop("users", {})
+        drivers.append(DriverWithUserResponse(
+            **d,
+            first_name=user_data.get("first_name", ""),
+            last_name=user_data.get("last_name", ""),
+            email=user_data.get("email", ""),
+        ))
+    
+    return DriverBatchResponse(data=drivers, missing=missing)
+
+
 @router.get("/{driver_id}", response_model=DriverWithUserResponse)
 async def get_driver(
     driver_id: int,
     user: UserInDB = DispatcherOrAbove,
+    fields: Optional[str] = Query(None, description="Comma-separated response fields"),
 ):
-    """Get a single driver by ID with user info."""
+    """Get a single driver by ID with user info, optionally projected to `fields`."""
     supabase = get_supabase()
     
+    try:
+        fieldset = parse_fields(fields, DriverWithUserResponse, DRIVER_DERIVED_FIELDS)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
     result = supabase.table("drivers").select(
-        "*, users!inner(first_name, last_name, email)"
+        fieldset.select if fieldset else "*, users!inner(first_name, last_name, email)"
     ).eq("id", driver_id).execute()
     
     if not result.data:
         raise HTTPException(status_code=404, detail="Driver not found")
     
+    if fieldset:
+        return JSONResponse(_projected_drivers(result.data, fieldset)[0])
+    
     d = result.data[0]
     user_data = d.pop("users", {})
     
@@ -133,7 +243,7 @@ async def create_driver(
     supabase = get_supabase()
     
     # Check if user exists
-    user_exists = supabase.table("users").select("id").eq("id", driver.user_id).execute()
+    user_exists = supabase.table("users").select("id, first_name, last_name").eq("id", driver.user_id).execute()
     if not user_exists.data:
         raise HTTPException(status_code=400, detail="User not found")
     
@@ -158,6 +268,15 @@ async def create_driver(
     if not result.data:
         raise HTTPException(status_code=500, detail="Failed to create driver")
     
+    invalidate_driver_options()
+    user_row = user_exists.data[0]
+    index_driver(
+        result.data[0]["id"],
+        f"{user_row['first_name']} {user_row['last_name']}".strip(),
+        result.data[0]["license_number"],
+    )
+    live_dashboard.notify("drivers")
+    
     return DriverResponse(**result.data[0])
 
 
@@ -189,6 +308,13 @@ async def update_driver(
     
     result = supabase.table("drivers").update(update_data).eq("id", driver_id).execute()
     
+    invalidate_driver_options()
+    invalidate_driver_label(driver_id)
+    if "license_number" in update_data:
+        name = driver_map([driver_id]).get(driver_id, {}).get("name", "")
+        index_driver(driver_id, name, result.data[0]["license_number"])
+    live_dashboard.notify("drivers")
+    
     return DriverResponse(**result.data[0])
 
 
@@ -213,6 +339,9 @@ async def suspend_driver(
     
     supabase.table("drivers").update({"duty_status": "suspended"}).eq("id", driver_id).execute()
     
+    invalidate_driver_options()
+    live_dashboard.notify("drivers")
+    
     return {"message": f"Driver {driver_id} suspended successfully"}
 
 
@@ -230,6 +359,9 @@ async def activate_driver(
     
     supabase.table("drivers").update({"duty_status": "off_duty"}).eq("id", driver_id).execute()
     
+    invalidate_driver_options()
+    live_dashboard.notify("drivers")
+    
     return {"message": f"Driver {driver_id} activated successfully"}
 
 
@@ -250,4 +382,9 @@ async def delete_driver(
     
     supabase.table("drivers").delete().eq("id", driver_id).execute()
     
+    invalidate_driver_options()
+    invalidate_driver_label(driver_id)
+    remove_driver(driver_id)
+    live_dashboard.notify("drivers")
+    
     return None
@@ -2,20 +2,27 @@
 routes/expenses.py — Expense CRUD API endpoints.
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
 from typing import Optional
 from datetime import date
 
-from db.supabase import get_supabase
+from db.batch import fetch_by_ids, in_request_order, parse_ids
+from db.supabase import get_supabase, has_capability
+from db.search import ilike_filter, search_rpc
 from models.expenses import (
     ExpenseCreate,
     ExpenseUpdate,
     ExpenseResponse,
     ExpenseDetailResponse,
     ExpenseListResponse,
+    ExpenseBatchResponse,
 )
 from models.enums import ExpenseType
+from models.fields import FieldSet, parse_fields
 from auth import DispatcherOrAbove, ManagerOrAbove, UserInDB
+from services.lookups import vehicle_map, driver_map
+from services.idempotency import create_requests, IdempotencyKeyReused
 
 router = APIRouter(prefix="/expenses", tags=["Expenses"])
 
@@ -41,6 +48,41 @@ def _build_expense_detail(expense: dict, vehicles: dict, trips: dict, drivers: d
     )
 
 
+# Response fields built from labels or the linked trip rather than expenses columns
+EXPENSE_DERIVED_FIELDS = {
+    "vehicle_plate": ("vehicle_id",),
+    "driver_name": ("trip_id",),
+    "distance_km": ("trip_id",),
+}
+
+
+def _projected_expenses(rows: list[dict], fieldset: FieldSet) -> list[dict]:
+    """Project expenses to `fieldset`, loading vehicles and trips only if asked."""
+    vehicles, trips, drivers = {}, {}, {}
+    if fieldset.wants("vehicle_plate"):
+        vehicles = vehicle_map(e["vehicle_id"] for e in rows)
+    trip_ids = list(set(e["trip_id"] for e in rows if e.get("trip_id")))
+    if trip_ids and fieldset.wants("driver_name", "distance_km"):
+        trips_result = get_supabase().table("trips").select(
+            "id, driver_id, distance_km"
+        ).in_("id", trip_ids).execute()
+        trips = {t["id"]: t for t in trips_result.data}
+        if fieldset.wants("driver_name"):
+            drivers = driver_map(t["driver_id"] for t in trips_result.data if t.get("driver_id"))
+    
+    projected = []
+    for e in rows:
+        trip = trips.get(e.get("trip_id"), {})
+        if fieldset.wants("vehicle_plate"):
+            e["vehicle_plate"] = vehicles.get(e["vehicle_id"], {}).get("license_plate", "Unknown")
+        if fieldset.wants("driver_name"):
+            e["driver_name"] = drivers.get(trip.get("driver_id"), {}).get("name")
+        if fieldset.wants("distance_km"):
+            e["distance_km"] = trip.get("distance_km")
+        projected.append(fieldset.dump(e))
+    return projected
+
+
 @router.get("", response_model=ExpenseListResponse)
 async def list_expenses(
     user: UserInDB = DispatcherOrAbove,
@@ -49,40 +91,96 @@ async def list_expenses(
     trip_id: Optional[int] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
+    search: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields, e.g. id,amount,expense_date"),
 ):
-    """List all expenses with filtering."""
+    """
+    List all expenses with filtering. `search` matches the description, ranked by relevance.
+    `fields` limits both the database select and the response to those fields.
+    """
     supabase = get_supabase()
     
-    query = supabase.table("expenses").select("*", count="exact")
+    try:
+        fieldset = parse_fields(fields, ExpenseDetailResponse, EXPENSE_DERIVED_FIELDS)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    if search and has_capability("fn_search_expenses"):
+        # Trigram-indexed, parameterized search (fn_search_expenses in schema.sql)
+        rows, total = search_rpc("fn_search_expenses", {
+            "p_query": search,
+            "p_expense_type": expense_type.value if expense_type else None,
+            "p_vehicle_id": vehicle_id,
+            "p_trip_id": trip_id,
+            "p_date_from": date_from.isoformat() if date_from else None,
+            "p_date_to": date_to.isoformat() if date_to else None,
+            "p_limit": limit,
+            "p_offset": skip,
+        })
+    else:
+        query = supabase.table("expenses").select(fieldset.select if fieldset else "*", count="exact")
+        
+        if expense_type:
+            query = query.eq("expense_type", expense_type.value)
+        if vehicle_id:
+            query = query.eq("vehicle_id", vehicle_id)
+        if trip_id:
+            query = query.eq("trip_id", trip_id)
+        if date_from:
+            query = query.gte("expense_date", date_from.isoformat())
+        if date_to:
+            query = query.lte("expense_date", date_to.isoformat())
+        if search:
+            query = query.or_(ilike_filter(["description"], search))
+        
+        query = query.range(skip, skip + limit - 1).order("expense_date", desc=True)
+        
+        result = query.execute()
+        rows, total = result.data, result.count or len(result.data)
     
-    if expense_type:
-        query = query.eq("expense_type", expense_type.value)
-    if vehicle_id:
-        query = query.eq("vehicle_id", vehicle_id)
-    if trip_id:
-        query = query.eq("trip_id", trip_id)
-    if date_from:
-        query = query.gte("expense_date", date_from.isoformat())
-    if date_to:
-        query = query.lte("expense_date", date_to.isoformat())
+    if not rows:
+        return ExpenseListResponse(data=[], total=0)
     
-    query = query.range(skip, skip + limit - 1).order("expense_date", desc=True)
+    if fieldset:
+        return JSONResponse({"data": _projected_expenses(rows, fieldset), "total": total})
     
-    result = query.execute()
+    # Get joined data (vehicle / driver labels are cached, trips are not)
+    trip_ids = list(set(e["trip_id"] for e in rows if e.get("trip_id")))
+    vehicles = vehicle_map(e["vehicle_id"] for e in rows)
     
-    if not result.data:
-        return ExpenseListResponse(data=[], total=0)
+    trips = {}
+    drivers = {}
+    if trip_ids:
+        trips_result = supabase.table("trips").select(
+            "id, driver_id, distance_km"
+        ).in_("id", trip_ids).execute()
+        trips = {t["id"]: t for t in trips_result.data}
+        drivers = driver_map(t["driver_id"] for t in trips_result.data if t.get("driver_id"))
     
-    # Get joined data
-    vehicle_ids = list(set(e["vehicle_id"] for e in result.data))
-    trip_ids = [e["trip_id"] for e in result.data if e.get("trip_id")]
+    expenses = [_build_expense_detail(e, vehicles, trips, drivers) for e in rows]
     
-    vehicles_result = supabase.table("vehicles").select(
-        "id, license_plate"
-    ).in_("id", vehicle_ids).execute()
-    vehicles = {v["id"]: v for v in vehicles_result.data}
+    return ExpenseListResponse(data=expenses, total=total)
+
+
+@router.get("/batch", response_model=ExpenseBatchResponse)
+async def get_expenses_batch(
+    user: UserInDB = DispatcherOrAbove,
+    ids: str = Query(..., description="Comma-separated IDs (max 100)"),
+):
+    """Get many expenses by ID with vehicle/trip/driver details, in the order requested."""
+    try:
+        id_list = parse_ids(ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    supabase = get_supabase()
+    rows, missing = in_request_order(id_list, fetch_by_ids("expenses", "*", id_list))
+    
+    # Get joined data (vehicle / driver labels are cached, trips are not)
+    trip_ids = list(set(e["trip_id"] for e in rows if e.get("trip_id")))
+    vehicles = vehicle_map(e["vehicle_id"] for e in rows)
     
     trips = {}
     drivers = {}
@@ -91,22 +189,11 @@ async def list_expenses(
             "id, driver_id, distance_km"
         ).in_("id", trip_ids).execute()
         trips = {t["id"]: t for t in trips_result.data}
-        
-        driver_ids = list(set(t["driver_id"] for t in trips_result.data if t.get("driver_id")))
-        if driver_ids:
-            drivers_result = supabase.table("drivers").select(
-                "id, users!inner(first_name, last_name)"
-            ).in_("id", driver_ids).execute()
-            for d in drivers_result.data:
-                user_data = d.get("users", {})
-                name = f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip()
-                drivers[d["id"]] = {"name": name}
-    
-    expenses = [_build_expense_detail(e, vehicles, trips, drivers) for e in result.data]
-    
-    return ExpenseListResponse(
-        data=expenses,
-        total=result.count or len(result.data)
+        drivers = driver_map(t["driver_id"] for t in trips_result.data if t.get("driver_id"))
+    
+    return ExpenseBatchResponse(
+        data=[_build_expense_detail(e, vehicles, trips, drivers) for e in rows],
+        missing=missing,
     )
 
 
@@ -114,22 +201,30 @@ async def list_expenses(
 async def get_expense(
     expense_id: int,
     user: UserInDB = DispatcherOrAbove,
+    fields: Optional[str] = Query(None, description="Comma-separated response fields"),
 ):
-    """Get a single expense by ID."""
+    """Get a single expense by ID, optionally projected to `fields`."""
     supabase = get_supabase()
     
-    result = supabase.table("expenses").select("*").eq("id", expense_id).execute()
+    try:
+        fieldset = parse_fields(fields, ExpenseDetailResponse, EXPENSE_DERIVED_FIELDS)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    result = supabase.table("expenses").select(
+        fieldset.select if fieldset else "*"
+    ).eq("id", expense_id).execute()
     
     if not result.data:
         raise HTTPException(status_code=404, detail="Expense not found")
     
+    if fieldset:
+        return JSONResponse(_projected_expenses(result.data, fieldset)[0])
+    
     expense = result.data[0]
     
-    # Get joined data
-    vehicle_result = supabase.table("vehicles").select(
-        "id, license_plate"
-    ).eq("id", expense["vehicle_id"]).execute()
-    vehicles = {v["id"]: v for v in vehicle_result.data} if vehicle_result.data else {}
+    # Get joined data (cached labels)
+    vehicles = vehicle_map([expense["vehicle_id"]])
     
     trips = {}
     drivers = {}
@@ -141,14 +236,7 @@ async def get_expense(
             trips = {t["id"]: t for t in trip_result.data}
             driver_id = trip_result.data[0].get("driver_id")
             if driver_id:
-                driver_result = supabase.table("drivers").select(
-                    "id, users!inner(first_name, last_name)"
-                ).eq("id", driver_id).execute()
-                if driver_result.data:
-                    d = driver_result.data[0]
-                    user_data = d.get("users", {})
-                    name = f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip()
-                    drivers[d["id"]] = {"name": name}
+                drivers = driver_map([driver_id])
     
     return _build_expense_detail(expense, vehicles, trips, drivers)
 
@@ -156,9 +244,35 @@ async def get_expense(
 @router.post("", response_model=ExpenseResponse, status_code=201)
 async def create_expense(
     expense: ExpenseCreate,
+    response: Response,
     user: UserInDB = DispatcherOrAbove,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
 ):
-    """Create a new expense record."""
+    """
+    Create a new expense record.
+    
+    Retries carrying the same Idempotency-Key get the stored response back.
+    """
+    if not idempotency_key:
+        return await _create_expense(expense)
+    
+    try:
+        result, replayed = await create_requests.run(
+            ("expenses", user.id, idempotency_key),
+            expense.model_dump_json(),
+            lambda: _create_expense(expense),
+        )
+    except IdempotencyKeyReused:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request body",
+        )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def _create_expense(expense: ExpenseCreate) -> ExpenseResponse:
     supabase = get_supabase()
     
     # Validate vehicle
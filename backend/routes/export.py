@@ -0,0 +1,98 @@
+"""
+routes/export.py — Columnar export of the fact tables for offline analysis.
+
+/export/{table}.parquet returns one zstd-compressed Parquet file;
+/export/{table}.arrow streams an Arrow IPC stream batch by batch as pages
+are read. Both keep DECIMAL columns exact and support a date range on the
+table's date column and column projection. Requires pyarrow (501 without).
+"""
+
+import asyncio
+from datetime import date
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
+
+from auth import HeavyRateLimit, ManagerOrAbove, UserInDB
+from services.columnar import (
+    EXPORT_TABLES,
+    MissingDependency,
+    arrow_schema,
+    batches_to_ipc_stream,
+    batches_to_parquet,
+    iter_batches,
+)
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+ExportTable = Literal["trips", "fuel_logs", "expenses", "maintenance_logs"]
+
+
+def _resolve_columns(table: str, columns: Optional[str]) -> list[str]:
+    available = list(EXPORT_TABLES[table]["columns"])
+    if not columns:
+        return available
+    
+    requested = [c.strip() for c in columns.split(",") if c.strip()]
+    unknown = [c for c in requested if c not in available]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown columns for {table}: {', '.join(unknown)}. Available: {', '.join(available)}",
+        )
+    return list(dict.fromkeys(requested))
+
+
+def _schema_or_501(table: str, columns: list[str]):
+    try:
+        return arrow_schema(table, columns)
+    except MissingDependency:
+        raise HTTPException(status_code=501, detail="Columnar export requires pyarrow on the server")
+
+
+@router.get("/{table}.parquet", dependencies=[HeavyRateLimit])
+async def export_parquet(
+    table: ExportTable,
+    user: UserInDB = ManagerOrAbove,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    columns: Optional[str] = None,
+):
+    """
+    Export a table as Parquet. `columns` is a comma-separated projection;
+    `date_from` / `date_to` filter on the table's date column.
+    """
+    selected = _resolve_columns(table, columns)
+    schema = _schema_or_501(table, selected)
+    
+    content = await asyncio.to_thread(
+        lambda: batches_to_parquet(iter_batches(table, selected, date_from, date_to), schema)
+    )
+    return Response(
+        content=content,
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": f'attachment; filename="{table}.parquet"'},
+    )
+
+
+@router.get("/{table}.arrow", dependencies=[HeavyRateLimit])
+async def export_arrow(
+    table: ExportTable,
+    user: UserInDB = ManagerOrAbove,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    columns: Optional[str] = None,
+):
+    """
+    Stream a table as Arrow IPC (stream format); each record batch is sent
+    as soon as its pages are read. Same filters as the Parquet export.
+    """
+    selected = _resolve_columns(table, columns)
+    schema = _schema_or_501(table, selected)
+    
+    return StreamingResponse(
+        batches_to_ipc_stream(iter_batches(table, selected, date_from, date_to), schema),
+        media_type="application/vnd.apache.arrow.stream",
+        headers={"Content-Disposition": f'attachment; filename="{table}.arrow"'},
+    )
@@ -2,10 +2,12 @@
 routes/fuel_logs.py — Fuel log CRUD API endpoints.
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
 from typing import Optional
 from datetime import date
 
+from db.batch import fetch_by_ids, in_request_order, parse_ids
 from db.supabase import get_supabase
 from models.fuel_logs import (
     FuelLogCreate,
@@ -13,8 +15,12 @@ from models.fuel_logs import (
     FuelLogResponse,
     FuelLogDetailResponse,
     FuelLogListResponse,
+    FuelLogBatchResponse,
 )
+from models.fields import FieldSet, parse_fields
 from auth import DispatcherOrAbove, ManagerOrAbove, UserInDB
+from services.lookups import vehicle_map, driver_map
+from services.idempotency import create_requests, IdempotencyKeyReused
 
 router = APIRouter(prefix="/fuel-logs", tags=["Fuel Logs"])
 
@@ -39,6 +45,31 @@ def _build_fuel_log_detail(log: dict, vehicles: dict, drivers: dict) -> FuelLogD
     )
 
 
+# Response fields built from labels rather than fuel_logs columns
+FUEL_LOG_DERIVED_FIELDS = {
+    "vehicle_plate": ("vehicle_id",),
+    "driver_name": ("driver_id",),
+}
+
+
+def _projected_fuel_logs(rows: list[dict], fieldset: FieldSet) -> list[dict]:
+    """Project fuel logs to `fieldset`, looking up only the labels it asks for."""
+    vehicles, drivers = {}, {}
+    if fieldset.wants("vehicle_plate"):
+        vehicles = vehicle_map(f["vehicle_id"] for f in rows)
+    if fieldset.wants("driver_name"):
+        drivers = driver_map(f["driver_id"] for f in rows if f.get("driver_id"))
+    
+    projected = []
+    for f in rows:
+        if fieldset.wants("vehicle_plate"):
+            f["vehicle_plate"] = vehicles.get(f["vehicle_id"], {}).get("license_plate", "Unknown")
+        if fieldset.wants("driver_name"):
+            f["driver_name"] = drivers.get(f.get("driver_id"), {}).get("name")
+        projected.append(fieldset.dump(f))
+    return projected
+
+
 @router.get("", response_model=FuelLogListResponse)
 async def list_fuel_logs(
     user: UserInDB = DispatcherOrAbove,
@@ -49,11 +80,20 @@ async def list_fuel_logs(
     date_to: Optional[date] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields, e.g. id,fuel_date,liters"),
 ):
-    """List all fuel logs with filtering."""
+    """
+    List all fuel logs with filtering.
+    `fields` limits both the database select and the response to those fields.
+    """
     supabase = get_supabase()
     
-    query = supabase.table("fuel_logs").select("*", count="exact")
+    try:
+        fieldset = parse_fields(fields, FuelLogDetailResponse, FUEL_LOG_DERIVED_FIELDS)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    query = supabase.table("fuel_logs").select(fieldset.select if fieldset else "*", count="exact")
     
     if vehicle_id:
         query = query.eq("vehicle_id", vehicle_id)
@@ -73,24 +113,15 @@ async def list_fuel_logs(
     if not result.data:
         return FuelLogListResponse(data=[], total=0)
     
-    # Get joined data
-    vehicle_ids = list(set(f["vehicle_id"] for f in result.data))
-    driver_ids = [f["driver_id"] for f in result.data if f.get("driver_id")]
-    
-    vehicles_result = supabase.table("vehicles").select(
-        "id, license_plate"
-    ).in_("id", vehicle_ids).execute()
-    vehicles = {v["id"]: v for v in vehicles_result.data}
-    
-    drivers = {}
-    if driver_ids:
-        drivers_result = supabase.table("drivers").select(
-            "id, users!inner(first_name, last_name)"
-        ).in_("id", driver_ids).execute()
-        for d in drivers_result.data:
-            user_data = d.get("users", {})
-            name = f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip()
-            drivers[d["id"]] = {"name": name}
+    if fieldset:
+        return JSONResponse({
+            "data": _projected_fuel_logs(result.data, fieldset),
+            "total": result.count or len(result.data),
+        })
+    
+    # Get joined data (cached labels)
+    vehicles = vehicle_map(f["vehicle_id"] for f in result.data)
+    drivers = driver_map(f["driver_id"] for f in result.data if f.get("driver_id"))
     
     logs = [_build_fuel_log_detail(f, vehicles, drivers) for f in result.data]
     
@@ -100,37 +131,58 @@ async def list_fuel_logs(
     )
 
 
+@router.get("/batch", response_model=FuelLogBatchResponse)
+async def get_fuel_logs_batch(
+    user: UserInDB = DispatcherOrAbove,
+    ids: str = Query(..., description="Comma-separated IDs (max 100)"),
+):
+    """Get many fuel logs by ID with vehicle/driver details, in the order requested."""
+    try:
+        id_list = parse_ids(ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    rows, missing = in_request_order(id_list, fetch_by_ids("fuel_logs", "*", id_list))
+    
+    # Get joined data (cached labels)
+    vehicles = vehicle_map(f["vehicle_id"] for f in rows)
+    drivers = driver_map(f["driver_id"] for f in rows if f.get("driver_id"))
+    
+    return FuelLogBatchResponse(
+        data=[_build_fuel_log_detail(f, vehicles, drivers) for f in rows],
+        missing=missing,
+    )
+
+
 @router.get("/{log_id}", response_model=FuelLogDetailResponse)
 async def get_fuel_log(
     log_id: int,
     user: UserInDB = DispatcherOrAbove,
+    fields: Optional[str] = Query(None, description="Comma-separated response fields"),
 ):
-    """Get a single fuel log by ID."""
+    """Get a single fuel log by ID, optionally projected to `fields`."""
     supabase = get_supabase()
     
-    result = supabase.table("fuel_logs").select("*").eq("id", log_id).execute()
+    try:
+        fieldset = parse_fields(fields, FuelLogDetailResponse, FUEL_LOG_DERIVED_FIELDS)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    result = supabase.table("fuel_logs").select(
+        fieldset.select if fieldset else "*"
+    ).eq("id", log_id).execute()
     
     if not result.data:
         raise HTTPException(status_code=404, detail="Fuel log not found")
     
+    if fieldset:
+        return JSONResponse(_projected_fuel_logs(result.data, fieldset)[0])
+    
     log = result.data[0]
     
-    # Get joined data
-    vehicle_result = supabase.table("vehicles").select(
-        "id, license_plate"
-    ).eq("id", log["vehicle_id"]).execute()
-    vehicles = {v["id"]: v for v in vehicle_result.data} if vehicle_result.data else {}
-    
-    drivers = {}
-    if log.get("driver_id"):
-        driver_result = supabase.table("drivers").select(
-            "id, users!inner(first_name, last_name)"
-        ).eq("id", log["driver_id"]).execute()
-        if driver_result.data:
-            d = driver_result.data[0]
-            user_data = d.get("users", {})
-            name = f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip()
-            drivers[d["id"]] = {"name": name}
+    # Get joined data (cached labels)
+    vehicles = vehicle_map([log["vehicle_id"]])
+    drivers = driver_map([log["driver_id"]]) if log.get("driver_id") else {}
     
     return _build_fuel_log_detail(log, vehicles, drivers)
 
@@ -138,9 +190,35 @@ async def get_fuel_log(
 @router.post("", response_model=FuelLogResponse, status_code=201)
 async def create_fuel_log(
     log: FuelLogCreate,
+    response: Response,
     user: UserInDB = DispatcherOrAbove,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
 ):
-    """Create a new fuel log record."""
+    """
+    Create a new fuel log record.
+    
+    Retries carrying the same Idempotency-Key get the stored response back.
+    """
+    if not idempotency_key:
+        return await _create_fuel_log(log)
+    
+    try:
+        result, replayed = await create_requests.run(
+            ("fuel-logs", user.id, idempotency_key),
+            log.model_dump_json(),
+            lambda: _create_fuel_log(log),
+        )
+    except IdempotencyKeyReused:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request body",
+        )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def _create_fuel_log(log: FuelLogCreate) -> FuelLogResponse:
     supabase = get_supabase()
     
     # Validate vehicle
@@ -255,19 +333,13 @@ async def fuel_summary_by_vehicle(
         totals[vid]["liters"] += float(f["liters"])
         totals[vid]["cost"] += float(f["total_cost"])
     
-    # Get vehicle plates
-    if totals:
-        vehicles_result = supabase.table("vehicles").select(
-            "id, license_plate"
-        ).in_("id", list(totals.keys())).execute()
-        vehicle_map = {v["id"]: v["license_plate"] for v in vehicles_result.data}
-    else:
-        vehicle_map = {}
+    # Get vehicle plates (cached labels)
+    vehicles = vehicle_map(totals.keys()) if totals else {}
     
     return [
         {
             "vehicle_id": vid,
-            "license_plate": vehicle_map.get(vid, "Unknown"),
+            "license_plate": vehicles.get(vid, {}).get("license_plate", "Unknown"),
             "total_liters": round(data["liters"], 2),
             "total_cost": round(data["cost"], 2),
         }
@@ -3,18 +3,31 @@ routes/maintenance.py — Maintenance logs CRUD API endpoints.
 """
 
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
 from typing import Optional
+from datetime import date, timedelta
 
-from db.supabase import get_supabase
+from db.batch import fetch_by_ids, in_request_order, parse_ids
+from db.paging import fetch_all
+from db.supabase import get_supabase, has_capability
 from models.maintenance import (
     MaintenanceCreate,
     MaintenanceUpdate,
     MaintenanceResponse,
     MaintenanceDetailResponse,
     MaintenanceListResponse,
+    MaintenanceBatchResponse,
+    MaintenanceDueItem,
+    MaintenanceDueListResponse,
 )
 from models.enums import MaintenanceStatus, ServiceType
+from models.fields import FieldSet, parse_fields
 from auth import DispatcherOrAbove, ManagerOrAbove, UserInDB
+from services.cache import invalidate_vehicle_options
+from services.lookups import vehicle_map
+from services.events import live_dashboard
+from services.kpis import embedded_vehicle_status, kpi_state
+from services.maintenance_due import DEFAULT_INTERVALS, USAGE_WINDOW_DAYS, compute_due
 
 router = APIRouter(prefix="/maintenance", tags=["Maintenance"])
 
@@ -37,6 +50,29 @@ def _build_maintenance_detail(log: dict, vehicles: dict) -> MaintenanceDetailRes
     )
 
 
+# Response fields built from labels rather than maintenance_logs columns
+MAINTENANCE_DERIVED_FIELDS = {
+    "vehicle_plate": ("vehicle_id",),
+    "vehicle_model": ("vehicle_id",),
+}
+
+
+def _projected_logs(rows: list[dict], fieldset: FieldSet) -> list[dict]:
+    """Project maintenance logs to `fieldset`, looking up vehicle labels only if asked."""
+    vehicles = {}
+    if fieldset.wants("vehicle_plate", "vehicle_model"):
+        vehicles = vehicle_map(m["vehicle_id"] for m in rows)
+    
+    projected = []
+    for m in rows:
+        if vehicles:
+            vehicle = vehicles.get(m["vehicle_id"], {})
+            m["vehicle_plate"] = vehicle.get("license_plate", "Unknown")
+            m["vehicle_model"] = f"{vehicle.get('make', '')} {vehicle.get('model', '')}".strip() or "Unknown"
+        projected.append(fieldset.dump(m))
+    return projected
+
+
 @router.get("", response_model=MaintenanceListResponse)
 async def list_maintenance_logs(
     user: UserInDB = DispatcherOrAbove,
@@ -46,11 +82,20 @@ async def list_maintenance_logs(
     search: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields, e.g. id,status,vehicle_plate"),
 ):
-    """List all maintenance logs with filtering."""
+    """
+    List all maintenance logs with filtering.
+    `fields` limits both the database select and the response to those fields.
+    """
     supabase = get_supabase()
     
-    query = supabase.table("maintenance_logs").select("*", count="exact")
+    try:
+        fieldset = parse_fields(fields, MaintenanceDetailResponse, MAINTENANCE_DERIVED_FIELDS)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    query = supabase.table("maintenance_logs").select(fieldset.select if fieldset else "*", count="exact")
     
     if status:
         query = query.eq("status", status.value)
@@ -68,13 +113,14 @@ async def list_maintenance_logs(
     if not result.data:
         return MaintenanceListResponse(data=[], total=0)
     
-    # Get vehicle info
-    vehicle_ids = list(set(m["vehicle_id"] for m in result.data))
-    vehicles_result = supabase.table("vehicles").select(
-        "id, license_plate, make, model"
-    ).in_("id", vehicle_ids).execute()
+    if fieldset:
+        return JSONResponse({
+            "data": _projected_logs(result.data, fieldset),
+            "total": result.count or len(result.data),
+        })
     
-    vehicles = {v["id"]: v for v in vehicles_result.data}
+    # Get vehicle info (cached labels)
+    vehicles = vehicle_map(m["vehicle_id"] for m in result.data)
     
     logs = [_build_maintenance_detail(m, vehicles) for m in result.data]
     
@@ -84,26 +130,193 @@ async def list_maintenance_logs(
     )
 
 
+@router.get("/batch", response_model=MaintenanceBatchResponse)
+async def get_maintenance_logs_batch(
+    user: UserInDB = DispatcherOrAbove,
+    ids: str = Query(..., description="Comma-separated IDs (max 100)"),
+):
+    """Get many maintenance logs by ID with vehicle details, in the order requested."""
+    try:
+        id_list = parse_ids(ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    rows, missing = in_request_order(id_list, fetch_by_ids("maintenance_logs", "*", id_list))
+    
+    # Get vehicle info (cached labels)
+    vehicles = vehicle_map(m["vehicle_id"] for m in rows)
+    
+    return MaintenanceBatchResponse(
+        data=[_build_maintenance_detail(m, vehicles) for m in rows],
+        missing=missing,
+    )
+
+
+def _baseline_fill(supabase, vehicle_id: int, serviced: date) -> list[dict]:
+    """The fill that stands in for a service's odometer: last on or before it, else first after."""
+    columns = "id, vehicle_id, fuel_date, odometer_at_fill"
+    before = supabase.table("fuel_logs").select(columns).eq("vehicle_id", vehicle_id).lte(
+        "fuel_date", serviced.isoformat()
+    ).order("fuel_date", desc=True).order("odometer_at_fill", desc=True).limit(1).execute()
+    if before.data:
+        return before.data
+    return supabase.table("fuel_logs").select(columns).eq("vehicle_id", vehicle_id).gt(
+        "fuel_date", serviced.isoformat()
+    ).order("fuel_date").order("odometer_at_fill").limit(1).execute().data
+
+
+def _load_due_fallback(vehicle_id: Optional[int], service_type: Optional[ServiceType]) -> list[dict]:
+    """
+    Compute due rows in process. Reads the fills of the usage window, plus
+    one baseline fill per last service the window does not already cover,
+    instead of every vehicle's whole fuel history.
+    """
+    supabase = get_supabase()
+    window_start = date.today() - timedelta(days=USAGE_WINDOW_DAYS)
+    
+    def scoped(query, column: str = "vehicle_id"):
+        return query.eq(column, vehicle_id) if vehicle_id else query
+    
+    def completed_query():
+        query = scoped(supabase.table("maintenance_logs").select(
+            "id, vehicle_id, service_type, completion_date"
+        ).eq("status", MaintenanceStatus.completed.value).not_.is_("completion_date", "null"))
+        if service_type:
+            query = query.eq("service_type", service_type.value)
+        return query.order("id")
+    
+    vehicles = fetch_all(lambda: scoped(
+        supabase.table("vehicles").select("id, current_odometer_km, status").neq("status", "retired"), "id"
+    ).order("id"))
+    completed = fetch_all(completed_query)
+    fills = {
+        f["id"]: f for f in fetch_all(lambda: scoped(
+            supabase.table("fuel_logs").select("id, vehicle_id, fuel_date, odometer_at_fill").gte(
+                "fuel_date", window_start.isoformat()
+            )
+        ).order("id"))
+    }
+    
+    last_service: dict[tuple[int, str], date] = {}
+    for log in completed:
+        key = (log["vehicle_id"], log["service_type"])
+        done = date.fromisoformat(str(log["completion_date"]))
+        if key not in last_service or done > last_service[key]:
+            last_service[key] = done
+    
+    # A window fill on or before the service means the window already holds
+    # the last fill before it; otherwise look that one fill up
+    first_in_window: dict[int, date] = {}
+    for f in fills.values():
+        day = date.fromisoformat(str(f["fuel_date"]))
+        if f["vehicle_id"] not in first_in_window or day < first_in_window[f["vehicle_id"]]:
+            first_in_window[f["vehicle_id"]] = day
+    for vid, serviced in set((vid, done) for (vid, _), done in last_service.items()):
+        first = first_in_window.get(vid)
+        if first is None or first > serviced:
+            for f in _baseline_fill(supabase, vid, serviced):
+                fills[f["id"]] = f
+    
+    intervals = DEFAULT_INTERVALS
+    if service_type:
+        intervals = {k: v for k, v in intervals.items() if k == service_type.value}
+    
+    return compute_due(vehicles, intervals, completed, fills.values())
+
+
+@router.get("/due", response_model=MaintenanceDueListResponse)
+async def list_maintenance_due(
+    user: UserInDB = DispatcherOrAbove,
+    vehicle_id: Optional[int] = None,
+    service_type: Optional[ServiceType] = None,
+    within_days: int = Query(30, ge=0, le=3650, description="Due on or before today + N days"),
+    within_km: Optional[float] = Query(None, ge=0, description="Or due within N km"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+):
+    """
+    Services coming due, soonest first: predicted from each vehicle's last
+    completed service of that type, the service interval and its recent
+    usage (km/day from fuel logs). Overdue items have days_remaining < 0
+    or km_remaining < 0.
+    """
+    today = date.today()
+    horizon = today + timedelta(days=within_days)
+    
+    if has_capability("maintenance_due"):
+        query = get_supabase().table("maintenance_due").select("*", count="exact")
+        if vehicle_id:
+            query = query.eq("vehicle_id", vehicle_id)
+        if service_type:
+            query = query.eq("service_type", service_type.value)
+        if within_km is not None:
+            query = query.or_(f"due_date.lte.{horizon.isoformat()},km_remaining.lte.{within_km}")
+        else:
+            query = query.lte("due_date", horizon.isoformat())
+        
+        result = query.order("due_date").order("km_remaining").range(skip, skip + limit - 1).execute()
+        rows, total = result.data, result.count or len(result.data)
+    else:
+        rows = [
+            r for r in _load_due_fallback(vehicle_id, service_type)
+            if (r["due_date"] is not None and r["due_date"] <= horizon)
+            or (within_km is not None and r["km_remaining"] is not None and r["km_remaining"] <= within_km)
+        ]
+        rows.sort(key=lambda r: (r["due_date"] or date.max, r["km_remaining"] if r["km_remaining"] is not None else float("inf")))
+        total = len(rows)
+        rows = rows[skip:skip + limit]
+    
+    vehicles = vehicle_map(r["vehicle_id"] for r in rows)
+    
+    items = []
+    for r in rows:
+        vehicle = vehicles.get(r["vehicle_id"], {})
+        due_date = date.fromisoformat(str(r["due_date"])) if r["due_date"] else None
+        days_remaining = (due_date - today).days if due_date else None
+        km_remaining = r["km_remaining"]
+        items.append(MaintenanceDueItem(
+            **{k: r[k] for k in (
+                "vehicle_id", "service_type", "last_service_date", "last_service_km",
+                "current_km", "km_per_day", "due_km", "km_remaining",
+            )},
+            due_date=due_date,
+            days_remaining=days_remaining,
+            overdue=(days_remaining is not None and days_remaining < 0)
+            or (km_remaining is not None and float(km_remaining) < 0),
+            vehicle_plate=vehicle.get("license_plate", "Unknown"),
+            vehicle_model=f"{vehicle.get('make', '')} {vehicle.get('model', '')}".strip() or "Unknown",
+        ))
+    
+    return MaintenanceDueListResponse(data=items, total=total)
+
+
 @router.get("/{log_id}", response_model=MaintenanceDetailResponse)
 async def get_maintenance_log(
     log_id: int,
     user: UserInDB = DispatcherOrAbove,
+    fields: Optional[str] = Query(None, description="Comma-separated response fields"),
 ):
-    """Get a single maintenance log by ID."""
+    """Get a single maintenance log by ID, optionally projected to `fields`."""
     supabase = get_supabase()
     
-    result = supabase.table("maintenance_logs").select("*").eq("id", log_id).execute()
+    try:
+        fieldset = parse_fields(fields, MaintenanceDetailResponse, MAINTENANCE_DERIVED_FIELDS)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    result = supabase.table("maintenance_logs").select(
+        fieldset.select if fieldset else "*"
+    ).eq("id", log_id).execute()
     
     if not result.data:
         raise HTTPException(status_code=404, detail="Maintenance log not found")
     
-    log = result.data[0]
+    if fieldset:
+        return JSONResponse(_projected_logs(result.data, fieldset)[0])
     
-    vehicle_result = supabase.table("vehicles").select(
-        "id, license_plate, make, model"
-    ).eq("id", log["vehicle_id"]).execute()
+    log = result.data[0]
     
-    vehicles = {v["id"]: v for v in vehicle_result.data} if vehicle_result.data else {}
+    vehicles = vehicle_map([log["vehicle_id"]])
     
     return _build_maintenance_detail(log, vehicles)
 
@@ -137,6 +350,11 @@ async def create_maintenance_log(
     if not result.data:
         raise HTTPException(status_code=500, detail="Failed to create maintenance log")
     
+    # fn_maintenance_vehicle_status moves the vehicle to in_shop
+    invalidate_vehicle_options()
+    kpi_state.maintenance_moved(None, result.data[0]["status"], vehicle.data[0]["status"])
+    live_dashboard.notify("maintenance", "vehicles")
+    
     return MaintenanceResponse(**result.data[0])
 
 
@@ -149,7 +367,9 @@ async def update_maintenance_log(
     """Update a maintenance log."""
     supabase = get_supabase()
     
-    existing = supabase.table("maintenance_logs").select("id, status").eq("id", log_id).execute()
+    existing = supabase.table("maintenance_logs").select(
+        "id, status, vehicle_id, vehicles(status)"
+    ).eq("id", log_id).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Maintenance log not found")
     
@@ -169,6 +389,13 @@ async def update_maintenance_log(
     
     result = supabase.table("maintenance_logs").update(update_data).eq("id", log_id).execute()
     
+    if "status" in update_data:
+        invalidate_vehicle_options()
+        kpi_state.maintenance_moved(
+            existing.data[0]["status"], update_data["status"], embedded_vehicle_status(existing.data[0])
+        )
+        live_dashboard.notify("maintenance", "vehicles")
+    
     return MaintenanceResponse(**result.data[0])
 
 
@@ -205,7 +432,7 @@ async def complete_maintenance(
     """Mark maintenance as completed."""
     supabase = get_supabase()
     
-    existing = supabase.table("maintenance_logs").select("id, status").eq("id", log_id).execute()
+    existing = supabase.table("maintenance_logs").select("id, status, vehicles(status)").eq("id", log_id).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Maintenance log not found")
     
@@ -222,6 +449,13 @@ async def complete_maintenance(
     
     result = supabase.table("maintenance_logs").update(update_data).eq("id", log_id).execute()
     
+    # fn_maintenance_vehicle_status returns the vehicle to idle
+    invalidate_vehicle_options()
+    kpi_state.maintenance_moved(
+        existing.data[0]["status"], "completed", embedded_vehicle_status(existing.data[0])
+    )
+    live_dashboard.notify("maintenance", "vehicles")
+    
     return {"message": "Maintenance completed", "log": MaintenanceResponse(**result.data[0])}
 
 
@@ -233,7 +467,7 @@ async def cancel_maintenance(
     """Cancel a maintenance log."""
     supabase = get_supabase()
     
-    existing = supabase.table("maintenance_logs").select("id, status").eq("id", log_id).execute()
+    existing = supabase.table("maintenance_logs").select("id, status, vehicles(status)").eq("id", log_id).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Maintenance log not found")
     
@@ -242,6 +476,12 @@ async def cancel_maintenance(
     
     result = supabase.table("maintenance_logs").update({"status": "cancelled"}).eq("id", log_id).execute()
     
+    invalidate_vehicle_options()
+    kpi_state.maintenance_moved(
+        existing.data[0]["status"], "cancelled", embedded_vehicle_status(existing.data[0])
+    )
+    live_dashboard.notify("maintenance", "vehicles")
+    
     return {"message": "Maintenance cancelled", "log": MaintenanceResponse(**result.data[0])}
 
 
@@ -0,0 +1,214 @@
+"""
+routes/reports.py — Month-end financial and fleet reports as background jobs.
+
+POST /reports queues a job and returns immediately; the report is built one
+month at a time from vehicle_daily_rollup by the report worker pool, so a
+multi-year range never turns into one long request. Poll GET /reports/{id}
+for progress, then fetch the CSV from /reports/{id}/download before it
+expires.
+"""
+
+import csv
+import io
+from datetime import date, timedelta
+
+from fastapi import APIRouter, HTTPException, Response
+
+from db.supabase import get_supabase, has_capability
+from models.enums import ExpenseType
+from models.reports import ReportCreate, ReportJobResponse
+from auth import DispatcherOrAbove, HeavyRateLimit, UserInDB, UserRole
+from routes.analytics import ROLLUP_METRICS, load_rollup_series
+from services.jobs import Job, JobQueueFull, report_jobs
+from services.lookups import vehicle_map
+
+router = APIRouter(prefix="/reports", tags=["Reports"])
+
+MAX_RANGE = timedelta(days=366 * 5)
+PAGE_SIZE = 1000  # PostgREST max rows per request
+
+
+# ---------------------------------------------------------------------------
+# Report builders (run in the report worker pool)
+# ---------------------------------------------------------------------------
+
+def month_chunks(date_from: date, date_to: date) -> list[tuple[date, date]]:
+    """Split [date_from, date_to] into calendar-month ranges."""
+    chunks = []
+    start = date_from
+    while start <= date_to:
+        next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        end = min(next_month - timedelta(days=1), date_to)
+        chunks.append((start, end))
+        start = next_month
+    return chunks
+
+
+def _with_totals(row: dict) -> dict:
+    total_cost = row["fuel_cost"] + row["maintenance_cost"] + sum(
+        row[f"expense_{t.value}"] for t in ExpenseType
+    )
+    return {
+        **{k: round(v, 2) if isinstance(v, float) else v for k, v in row.items()},
+        "total_cost": round(total_cost, 2),
+        "net_profit": round(row["revenue"] - total_cost, 2),
+    }
+
+
+def financial_chunk(chunk: tuple[date, date], vehicle_id: int | None) -> list[dict]:
+    start, end = chunk
+    rows = load_rollup_series(start, end, vehicle_id, bucket="month")
+    return [
+        _with_totals({"period": r["period"], **{m: float(r[m] or 0) for m in ROLLUP_METRICS}})
+        for r in rows
+    ]
+
+
+def fleet_chunk(chunk: tuple[date, date], vehicle_id: int | None) -> list[dict]:
+    start, end = chunk
+    supabase = get_supabase()
+
+    totals: dict[int, dict] = {}
+    offset = 0
+    while True:
+        query = supabase.table("vehicle_daily_rollup").select(
+            "vehicle_id, day, " + ", ".join(ROLLUP_METRICS)
+        ).gte("day", start.isoformat()).lte("day", end.isoformat())
+        if vehicle_id:
+            query = query.eq("vehicle_id", vehicle_id)
+        page = query.order("vehicle_id").order("day").range(offset, offset + PAGE_SIZE - 1).execute()
+
+        for r in page.data:
+            row = totals.setdefault(r["vehicle_id"], {m: 0.0 for m in ROLLUP_METRICS})
+            for m in ROLLUP_METRICS:
+                row[m] += float(r[m] or 0)
+
+        if len(page.data) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+
+    period = start.replace(day=1).isoformat()
+    return [
+        _with_totals({"period": period, "vehicle_id": vid, **totals[vid]})
+        for vid in sorted(totals)
+    ]
+
+
+def render_csv(report_type: str, partials: list[list[dict]]) -> tuple[bytes, str, str]:
+    rows = [row for chunk in partials for row in chunk]
+
+    columns = ["period"]
+    if report_type == "fleet":
+        columns += ["vehicle_id", "license_plate"]
+        labels = vehicle_map(r["vehicle_id"] for r in rows)
+        for r in rows:
+            r["license_plate"] = labels.get(r["vehicle_id"], {}).get("license_plate", "")
+    columns += list(ROLLUP_METRICS) + ["total_cost", "net_profit"]
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(rows)
+
+    first = rows[0]["period"] if rows else "empty"
+    return buffer.getvalue().encode(), "text/csv", f"{report_type}-report-{first}.csv"
+
+
+# ---------------------------------------------------------------------------
+# Endpoints
+# ---------------------------------------------------------------------------
+
+def _job_response(job: Job) -> ReportJobResponse:
+    return ReportJobResponse(
+        id=job.id,
+        report_type=job.kind,
+        status=job.status,
+        progress=job.progress,
+        chunks_done=job.chunks_done,
+        chunks_total=job.chunks_total,
+        date_from=job.params["date_from"],
+        date_to=job.params["date_to"],
+        vehicle_id=job.params["vehicle_id"],
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        expires_at=job.expires_at,
+        error=job.error,
+        download_url=f"/reports/{job.id}/download" if job.status == "completed" else None,
+    )
+
+
+def _get_job(job_id: str, user: UserInDB) -> Job:
+    job = report_jobs.get(job_id)
+    # Other users' jobs are indistinguishable from missing ones
+    if job is None or (job.owner != user.id and user.role != UserRole.admin):
+        raise HTTPException(status_code=404, detail="Report not found or expired")
+    return job
+
+
+@router.post("", response_model=ReportJobResponse, status_code=202, dependencies=[HeavyRateLimit])
+async def create_report(
+    report: ReportCreate,
+    user: UserInDB = DispatcherOrAbove,
+):
+    """
+    Queue a report over the daily rollup. Returns the job; poll
+    GET /reports/{id} until it is completed, then download the CSV.
+    """
+    if report.date_from > report.date_to:
+        raise HTTPException(status_code=400, detail="date_from must be on or before date_to")
+    if report.date_to - report.date_from > MAX_RANGE:
+        raise HTTPException(status_code=400, detail="Date range is limited to 5 years")
+
+    if not has_capability("vehicle_daily_rollup"):
+        raise HTTPException(status_code=503, detail="vehicle_daily_rollup is not deployed")
+
+    build = financial_chunk if report.report_type == "financial" else fleet_chunk
+    vehicle_id = report.vehicle_id
+
+    try:
+        job = report_jobs.submit(
+            kind=report.report_type,
+            owner=user.id,
+            params=report.model_dump(),
+            chunks=month_chunks(report.date_from, report.date_to),
+            run_chunk=lambda chunk: build(chunk, vehicle_id),
+            finish=lambda partials: render_csv(report.report_type, partials),
+        )
+    except JobQueueFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many reports in progress. Wait for one to finish and retry.",
+            headers={"Retry-After": "30"},
+        )
+
+    return _job_response(job)
+
+
+@router.get("/{job_id}", response_model=ReportJobResponse)
+async def get_report(
+    job_id: str,
+    user: UserInDB = DispatcherOrAbove,
+):
+    """Report job status and progress (fraction of months built)."""
+    return _job_response(_get_job(job_id, user))
+
+
+@router.get("/{job_id}/download")
+async def download_report(
+    job_id: str,
+    user: UserInDB = DispatcherOrAbove,
+):
+    """Download a completed report as CSV."""
+    job = _get_job(job_id, user)
+
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Report failed: {job.error}")
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Report is still {job.status}")
+
+    return Response(
+        content=job.result,
+        media_type=job.content_type,
+        headers={"Content-Disposition": f'attachment; filename="{job.filename}"'},
+    )
@@ -0,0 +1,25 @@
+"""
+routes/search.py — Typeahead search served from the in-memory prefix index.
+"""
+
+from fastapi import APIRouter, Query
+from typing import Literal, Optional
+
+from auth import DispatcherOrAbove, UserInDB
+from services.typeahead import typeahead_index
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+
+@router.get("/typeahead")
+async def typeahead(
+    q: str = Query(..., min_length=1, max_length=100),
+    kind: Optional[Literal["vehicle", "driver"]] = None,
+    limit: int = Query(10, ge=1, le=25),
+    user: UserInDB = DispatcherOrAbove,
+):
+    """
+    Prefix matches over vehicle plates, make/model and driver names /
+    license numbers. Served from memory — no database hit per keystroke.
+    """
+    return typeahead_index.search(q, kind=kind, limit=limit)
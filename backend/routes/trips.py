@@ -2,20 +2,36 @@
 routes/trips.py — Trip CRUD API endpoints.
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 
-from db.supabase import get_supabase
+from db.batch import fetch_by_ids, in_request_order, parse_ids
+from db.paging import fetch_all
+from db.supabase import get_supabase, has_capability
+from db.search import ilike_filter, search_rpc
 from models.trips import (
     TripCreate,
     TripUpdate,
     TripResponse,
     TripDetailResponse,
     TripListResponse,
+    AutoAssignRequest,
+    AutoAssignResponse,
+    TripAssignment,
+    UnassignedCargo,
+    TripBatchResponse,
 )
 from models.enums import TripStatus
-from auth import DispatcherOrAbove, UserInDB
+from models.fields import FieldSet, parse_fields
+from auth import DispatcherOrAbove, HeavyRateLimit, UserInDB
+from services.cache import invalidate_vehicle_options, invalidate_driver_options
+from services.lookups import vehicle_map, driver_map
+from services.idempotency import create_requests, IdempotencyKeyReused
+from services.events import live_dashboard
+from services.kpis import embedded_vehicle_status, kpi_state
+from services.dispatch import plan_assignments
 
 router = APIRouter(prefix="/trips", tags=["Trips"])
 
@@ -43,6 +59,34 @@ def _build_trip_detail(trip: dict, vehicles: dict, drivers: dict) -> TripDetailR
     )
 
 
+# Response fields built from labels rather than trips columns
+TRIP_DERIVED_FIELDS = {
+    "vehicle_plate": ("vehicle_id",),
+    "vehicle_model": ("vehicle_id",),
+    "driver_name": ("driver_id",),
+}
+
+
+def _projected_trips(rows: list[dict], fieldset: FieldSet) -> list[dict]:
+    """Project trips to `fieldset`, looking up only the labels it asks for."""
+    vehicles, drivers = {}, {}
+    if fieldset.wants("vehicle_plate", "vehicle_model"):
+        vehicles = vehicle_map(t["vehicle_id"] for t in rows)
+    if fieldset.wants("driver_name"):
+        drivers = driver_map(t["driver_id"] for t in rows)
+    
+    projected = []
+    for t in rows:
+        if vehicles:
+            vehicle = vehicles.get(t["vehicle_id"], {})
+            t["vehicle_plate"] = vehicle.get("license_plate", "Unknown")
+            t["vehicle_model"] = f"{vehicle.get('make', '')} {vehicle.get('model', '')}".strip() or "Unknown"
+        if drivers:
+            t["driver_name"] = drivers.get(t["driver_id"], {}).get("name", "Unknown")
+        projected.append(fieldset.dump(t))
+    return projected
+
+
 @router.get("", response_model=TripListResponse)
 async def list_trips(
     user: UserInDB = DispatcherOrAbove,
@@ -52,52 +96,81 @@ async def list_trips(
     search: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields, e.g. id,status,vehicle_plate"),
 ):
-    """List all trips with filtering."""
+    """
+    List all trips with filtering. `search` results are ranked by relevance.
+    `fields` limits both the database select and the response to those fields.
+    """
     supabase = get_supabase()
     
-    query = supabase.table("trips").select("*", count="exact")
-    
-    if status:
-        query = query.eq("status", status.value)
-    if vehicle_id:
-        query = query.eq("vehicle_id", vehicle_id)
-    if driver_id:
-        query = query.eq("driver_id", driver_id)
-    if search:
-        query = query.or_(f"origin.ilike.%{search}%,destination.ilike.%{search}%")
-    
-    query = query.range(skip, skip + limit - 1).order("scheduled_departure", desc=True)
-    
-    result = query.execute()
-    
-    if not result.data:
+    try:
+        fieldset = parse_fields(fields, TripDetailResponse, TRIP_DERIVED_FIELDS)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    if search and has_capability("fn_search_trips"):
+        # Trigram-indexed, parameterized search (fn_search_trips in schema.sql)
+        rows, total = search_rpc("fn_search_trips", {
+            "p_query": search,
+            "p_status": status.value if status else None,
+            "p_vehicle_id": vehicle_id,
+            "p_driver_id": driver_id,
+            "p_limit": limit,
+            "p_offset": skip,
+        })
+    else:
+        query = supabase.table("trips").select(fieldset.select if fieldset else "*", count="exact")
+        
+        if status:
+            query = query.eq("status", status.value)
+        if vehicle_id:
+            query = query.eq("vehicle_id", vehicle_id)
+        if driver_id:
+            query = query.eq("driver_id", driver_id)
+        if search:
+            query = query.or_(ilike_filter(["origin", "destination"], search))
+        
+        query = query.range(skip, skip + limit - 1).order("scheduled_departure", desc=True)
+        
+        result = query.execute()
+        rows, total = result.data, result.count or len(result.data)
+    
+    if not rows:
         return TripListResponse(data=[], total=0)
     
-    # Get vehicle and driver info for joined response
-    vehicle_ids = list(set(t["vehicle_id"] for t in result.data))
-    driver_ids = list(set(t["driver_id"] for t in result.data))
+    if fieldset:
+        return JSONResponse({"data": _projected_trips(rows, fieldset), "total": total})
+    
+    # Get vehicle and driver info for joined response (cached labels)
+    vehicles = vehicle_map(t["vehicle_id"] for t in rows)
+    drivers = driver_map(t["driver_id"] for t in rows)
     
-    vehicles_result = supabase.table("vehicles").select(
-        "id, license_plate, make, model"
-    ).in_("id", vehicle_ids).execute()
+    trips = [_build_trip_detail(t, vehicles, drivers) for t in rows]
     
-    drivers_result = supabase.table("drivers").select(
-        "id, users!inner(first_name, last_name)"
-    ).in_("id", driver_ids).execute()
+    return TripListResponse(data=trips, total=total)
+
+
+@router.get("/batch", response_model=TripBatchResponse)
+async def get_trips_batch(
+    user: UserInDB = DispatcherOrAbove,
+    ids: str = Query(..., description="Comma-separated IDs (max 100)"),
+):
+    """Get many trips by ID with vehicle/driver details, in the order requested."""
+    try:
+        id_list = parse_ids(ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     
-    vehicles = {v["id"]: v for v in vehicles_result.data}
-    drivers = {}
-    for d in drivers_result.data:
-        user_data = d.get("users", {})
-        name = f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip()
-        drivers[d["id"]] = {"name": name}
+    rows, missing = in_request_order(id_list, fetch_by_ids("trips", "*", id_list))
     
-    trips = [_build_trip_detail(t, vehicles, drivers) for t in result.data]
+    # Get vehicle and driver info for joined response (cached labels)
+    vehicles = vehicle_map(t["vehicle_id"] for t in rows)
+    drivers = driver_map(t["driver_id"] for t in rows)
     
-    return TripListResponse(
-        data=trips,
-        total=result.count or len(result.data)
+    return TripBatchResponse(
+        data=[_build_trip_detail(t, vehicles, drivers) for t in rows],
+        missing=missing,
     )
 
 
@@ -105,33 +178,31 @@ async def list_trips(
 async def get_trip(
     trip_id: int,
     user: UserInDB = DispatcherOrAbove,
+    fields: Optional[str] = Query(None, description="Comma-separated response fields"),
 ):
-    """Get a single trip by ID."""
+    """Get a single trip by ID, optionally projected to `fields`."""
     supabase = get_supabase()
     
-    result = supabase.table("trips").select("*").eq("id", trip_id).execute()
+    try:
+        fieldset = parse_fields(fields, TripDetailResponse, TRIP_DERIVED_FIELDS)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    result = supabase.table("trips").select(
+        fieldset.select if fieldset else "*"
+    ).eq("id", trip_id).execute()
     
     if not result.data:
         raise HTTPException(status_code=404, detail="Trip not found")
     
-    trip = result.data[0]
-    
-    # Get vehicle and driver info
-    vehicle_result = supabase.table("vehicles").select(
-        "id, license_plate, make, model"
-    ).eq("id", trip["vehicle_id"]).execute()
+    if fieldset:
+        return JSONResponse(_projected_trips(result.data, fieldset)[0])
     
-    driver_result = supabase.table("drivers").select(
-        "id, users!inner(first_name, last_name)"
-    ).eq("id", trip["driver_id"]).execute()
+    trip = result.data[0]
     
-    vehicles = {v["id"]: v for v in vehicle_result.data} if vehicle_result.data else {}
-    drivers = {}
-    if driver_result.data:
-        d = driver_result.data[0]
-        user_data = d.get("users", {})
-        name = f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip()
-        drivers[d["id"]] = {"name": name}
+    # Get vehicle and driver info (cached labels)
+    vehicles = vehicle_map([trip["vehicle_id"]])
+    drivers = driver_map([trip["driver_id"]])
     
     return _build_trip_detail(trip, vehicles, drivers)
 
@@ -139,14 +210,38 @@ async def get_trip(
 @router.post("", response_model=TripResponse, status_code=201)
 async def create_trip(
     trip: TripCreate,
+    response: Response,
     user: UserInDB = DispatcherOrAbove,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
 ):
     """
     Create a new trip. Validates:
     - Vehicle exists and is idle
     - Driver exists and is eligible
     - Cargo weight doesn't exceed vehicle capacity
+    
+    Retries carrying the same Idempotency-Key get the stored response back.
     """
+    if not idempotency_key:
+        return await _create_trip(trip)
+    
+    try:
+        result, replayed = await create_requests.run(
+            ("trips", user.id, idempotency_key),
+            trip.model_dump_json(),
+            lambda: _create_trip(trip),
+        )
+    except IdempotencyKeyReused:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request body",
+        )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def _create_trip(trip: TripCreate) -> TripResponse:
     supabase = get_supabase()
     
     # Validate vehicle
@@ -200,9 +295,165 @@ async def create_trip(
     if not result.data:
         raise HTTPException(status_code=500, detail="Failed to create trip")
     
+    kpi_state.trip_added(result.data[0]["status"])
+    live_dashboard.notify("trips")
+    
     return TripResponse(**result.data[0])
 
 
+def _scheduled_holders() -> tuple[set[int], set[int]]:
+    """Vehicle and driver ids that already hold a scheduled trip."""
+    supabase = get_supabase()
+    
+    scheduled = fetch_all(lambda: supabase.table("trips").select(
+        "id, vehicle_id, driver_id"
+    ).eq("status", TripStatus.scheduled.value).order("id"))
+    return {t["vehicle_id"] for t in scheduled}, {t["driver_id"] for t in scheduled}
+
+
+def _load_dispatch_pool() -> tuple[list[dict], list[dict]]:
+    """Idle vehicles and available drivers not already holding a scheduled trip."""
+    supabase = get_supabase()
+    
+    busy_vehicles, busy_drivers = _scheduled_holders()
+    
+    vehicles = fetch_all(lambda: supabase.table("vehicles").select(
+        "id, max_load_capacity_kg"
+    ).eq("status", "idle").order("id"))
+    
+    drivers = fetch_all(lambda: supabase.table("drivers").select(
+        "id, license_expiry"
+    ).not_.in_("duty_status", ["on_duty", "suspended"]).gte(
+        "license_expiry", date.today().isoformat()
+    ).order("id"))
+    
+    return (
+        [v for v in vehicles if v["id"] not in busy_vehicles],
+        [
+            {"id": d["id"], "license_expiry": date.fromisoformat(d["license_expiry"])}
+            for d in drivers if d["id"] not in busy_drivers
+        ],
+    )
+
+
+def _insert_planned_trips(rows: list[dict]) -> list[dict]:
+    """
+    Insert the planned trips, skipping any whose vehicle or driver was given
+    a scheduled trip after the pool was loaded. Returns the rows inserted.
+    """
+    supabase = get_supabase()
+    
+    if has_capability("fn_insert_dispatch_trips"):
+        # Checked and inserted under one lock (fn_insert_dispatch_trips in schema.sql)
+        return supabase.rpc("fn_insert_dispatch_trips", {"p_trips": rows}).execute().data or []
+    
+    # Fallback: re-check just before the insert (narrows the race, does not close it)
+    busy_vehicles, busy_drivers = _scheduled_holders()
+    rows = [
+        r for r in rows
+        if r["vehicle_id"] not in busy_vehicles and r["driver_id"] not in busy_drivers
+    ]
+    if not rows:
+        return []
+    return supabase.table("trips").insert(rows).execute().data
+
+
+@router.post("/auto-assign", response_model=AutoAssignResponse, dependencies=[HeavyRateLimit])
+async def auto_assign_trips(
+    request: AutoAssignRequest,
+    user: UserInDB = DispatcherOrAbove,
+):
+    """
+    Assign vehicles and drivers to a batch of pending cargo in one pass.
+    Respects vehicle capacity and idle status, driver duty status and
+    license expiry, and keeps unused capacity low (best-fit decreasing).
+    Vehicles and drivers that already hold a scheduled trip are skipped.
+    With `create_trips=true` the planned trips are inserted as scheduled;
+    a vehicle or driver claimed by a concurrent request in the meantime is
+    not double-booked, and its cargo is reported as unassigned.
+    """
+    vehicles, drivers = _load_dispatch_pool()
+    
+    cargo = [
+        {
+            "index": i,
+            "cargo_weight_kg": c.cargo_weight_kg,
+            "departure": c.scheduled_departure.date(),
+        }
+        for i, c in enumerate(request.cargo)
+    ]
+    planned, unplaced = plan_assignments(cargo, vehicles, drivers, date.today())
+    
+    trip_ids: dict[int, int] = {}
+    if request.create_trips and planned:
+        rows = []
+        for a in planned:
+            c = request.cargo[a["index"]]
+            rows.append({
+                "vehicle_id": a["vehicle_id"],
+                "driver_id": a["driver_id"],
+                "cargo_weight_kg": float(c.cargo_weight_kg),
+                "origin": c.origin,
+                "destination": c.destination,
+                "distance_km": float(c.distance_km) if c.distance_km is not None else None,
+                "revenue": float(c.revenue),
+                "scheduled_departure": c.scheduled_departure.isoformat(),
+            })
+        
+        # One batch; the trip triggers still validate every row
+        try:
+            inserted = _insert_planned_trips(rows)
+        except Exception as exc:
+            raise HTTPException(status_code=409, detail=f"Auto-assign insert rejected: {exc}")
+        
+        # Each planned vehicle is used once, so it identifies its trip
+        by_vehicle = {row["vehicle_id"]: row for row in inserted}
+        kept = []
+        for a in planned:
+            row = by_vehicle.get(a["vehicle_id"])
+            if row is None:
+                unplaced.append({
+                    "index": a["index"],
+                    "reason": "Vehicle or driver was assigned by a concurrent request",
+                })
+                continue
+            trip_ids[a["index"]] = row["id"]
+            kpi_state.trip_added(row["status"])
+            kept.append(a)
+        planned = kept
+        if inserted:
+            live_dashboard.notify("trips")
+    
+    vehicles_by_id = vehicle_map({a["vehicle_id"] for a in planned}) if planned else {}
+    drivers_by_id = driver_map({a["driver_id"] for a in planned}) if planned else {}
+    
+    assignments = [
+        TripAssignment(
+            index=a["index"],
+            ref=request.cargo[a["index"]].ref,
+            vehicle_id=a["vehicle_id"],
+            vehicle_plate=vehicles_by_id.get(a["vehicle_id"], {}).get("license_plate", "Unknown"),
+            driver_id=a["driver_id"],
+            driver_name=drivers_by_id.get(a["driver_id"], {}).get("name", "Unknown"),
+            cargo_weight_kg=request.cargo[a["index"]].cargo_weight_kg,
+            unused_capacity_kg=a["unused_capacity_kg"],
+            trip_id=trip_ids.get(a["index"]),
+        )
+        for a in planned
+    ]
+    unassigned = [
+        UnassignedCargo(index=u["index"], ref=request.cargo[u["index"]].ref, reason=u["reason"])
+        for u in unplaced
+    ]
+    
+    return AutoAssignResponse(
+        assignments=assignments,
+        unassigned=unassigned,
+        total_unused_capacity_kg=round(sum(a["unused_capacity_kg"] for a in planned), 2),
+        created=bool(trip_ids),
+    )
+
+
 @router.put("/{trip_id}", response_model=TripResponse)
 async def update_trip(
     trip_id: int,
@@ -212,7 +463,7 @@ async def update_trip(
     """Update a trip."""
     supabase = get_supabase()
     
-    existing = supabase.table("trips").select("id, status").eq("id", trip_id).execute()
+    existing = supabase.table("trips").select("id, status, vehicles(status)").eq("id", trip_id).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Trip not found")
     
@@ -245,6 +496,15 @@ async def update_trip(
     
     result = supabase.table("trips").update(update_data).eq("id", trip_id).execute()
     
+    # fn_trip_status_sync may have moved the vehicle/driver status
+    if "status" in update_data:
+        invalidate_vehicle_options()
+        invalidate_driver_options()
+        kpi_state.trip_moved(
+            current_status, update_data["status"], embedded_vehicle_status(existing.data[0])
+        )
+    live_dashboard.notify("trips")
+    
     return TripResponse(**result.data[0])
 
 
@@ -256,7 +516,7 @@ async def start_trip(
     """Mark a trip as in_transit."""
     supabase = get_supabase()
     
-    existing = supabase.table("trips").select("id, status").eq("id", trip_id).execute()
+    existing = supabase.table("trips").select("id, status, vehicles(status)").eq("id", trip_id).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Trip not found")
     
@@ -265,6 +525,12 @@ async def start_trip(
     
     result = supabase.table("trips").update({"status": "in_transit"}).eq("id", trip_id).execute()
     
+    # fn_trip_status_sync puts the vehicle on_trip and the driver on_duty
+    invalidate_vehicle_options()
+    invalidate_driver_options()
+    kpi_state.trip_moved("scheduled", "in_transit", embedded_vehicle_status(existing.data[0]))
+    live_dashboard.notify("trips", "vehicles", "drivers")
+    
     return {"message": "Trip started", "trip": TripResponse(**result.data[0])}
 
 
@@ -276,7 +542,7 @@ async def complete_trip(
     """Mark a trip as delivered."""
     supabase = get_supabase()
     
-    existing = supabase.table("trips").select("id, status").eq("id", trip_id).execute()
+    existing = supabase.table("trips").select("id, status, vehicles(status)").eq("id", trip_id).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Trip not found")
     
@@ -288,6 +554,11 @@ async def complete_trip(
         "actual_arrival": datetime.now().isoformat()
     }).eq("id", trip_id).execute()
     
+    invalidate_vehicle_options()
+    invalidate_driver_options()
+    kpi_state.trip_moved("in_transit", "delivered", embedded_vehicle_status(existing.data[0]))
+    live_dashboard.notify("trips", "vehicles", "drivers")
+    
     return {"message": "Trip completed", "trip": TripResponse(**result.data[0])}
 
 
@@ -299,7 +570,7 @@ async def cancel_trip(
     """Cancel a trip."""
     supabase = get_supabase()
     
-    existing = supabase.table("trips").select("id, status").eq("id", trip_id).execute()
+    existing = supabase.table("trips").select("id, status, vehicles(status)").eq("id", trip_id).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Trip not found")
     
@@ -308,6 +579,13 @@ async def cancel_trip(
     
     result = supabase.table("trips").update({"status": "cancelled"}).eq("id", trip_id).execute()
     
+    invalidate_vehicle_options()
+    invalidate_driver_options()
+    kpi_state.trip_moved(
+        existing.data[0]["status"], "cancelled", embedded_vehicle_status(existing.data[0])
+    )
+    live_dashboard.notify("trips", "vehicles", "drivers")
+    
     return {"message": "Trip cancelled", "trip": TripResponse(**result.data[0])}
 
 
@@ -331,4 +609,7 @@ async def delete_trip(
     
     supabase.table("trips").delete().eq("id", trip_id).execute()
     
+    kpi_state.trip_removed("scheduled")
+    live_dashboard.notify("trips")
+    
     return None
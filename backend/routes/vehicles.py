@@ -3,17 +3,27 @@ routes/vehicles.py — Vehicle CRUD API endpoints.
 """
 
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
 from typing import Optional
 
-from db.supabase import get_supabase
+from db.batch import fetch_by_ids, in_request_order, parse_ids
+from db.supabase import get_supabase, has_capability
+from db.search import ilike_filter, search_rpc
 from models.vehicles import (
     VehicleCreate,
     VehicleUpdate,
     VehicleResponse,
     VehicleListResponse,
+    VehicleBatchResponse,
 )
 from models.enums import VehicleStatus, VehicleType
+from models.fields import parse_fields
 from auth import DispatcherOrAbove, ManagerOrAbove, UserInDB
+from services.cache import vehicle_options_cache, invalidate_vehicle_options, invalidate_document_digest
+from services.lookups import invalidate_vehicle_label
+from services.events import live_dashboard
+from services.kpis import kpi_state
+from services.typeahead import index_vehicle, remove_vehicle
 
 router = APIRouter(prefix="/vehicles", tags=["Vehicles"])
 
@@ -26,11 +36,33 @@ async def list_vehicles(
     search: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields, e.g. id,status,license_plate"),
 ):
-    """List all vehicles with optional filtering."""
+    """
+    List all vehicles with optional filtering. `search` results are ranked by relevance.
+    `fields` limits both the database select and the response to those fields.
+    """
     supabase = get_supabase()
     
-    query = supabase.table("vehicles").select("*", count="exact")
+    try:
+        fieldset = parse_fields(fields, VehicleResponse)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    if search and has_capability("fn_search_vehicles"):
+        # Trigram-indexed, parameterized search (fn_search_vehicles in schema.sql)
+        rows, total = search_rpc("fn_search_vehicles", {
+            "p_query": search,
+            "p_status": status.value if status else None,
+            "p_vehicle_type": vehicle_type.value if vehicle_type else None,
+            "p_limit": limit,
+            "p_offset": skip,
+        })
+        if fieldset:
+            return JSONResponse({"data": [fieldset.dump(v) for v in rows], "total": total})
+        return VehicleListResponse(data=[VehicleResponse(**v) for v in rows], total=total)
+    
+    query = supabase.table("vehicles").select(fieldset.select if fieldset else "*", count="exact")
     
     # Apply filters
     if status:
@@ -43,25 +75,27 @@ async def list_vehicles(
         query = query.eq("vehicle_type", vehicle_type.value)
     
     if search:
-        query = query.or_(f"license_plate.ilike.%{search}%,make.ilike.%{search}%,model.ilike.%{search}%")
+        query = query.or_(ilike_filter(["license_plate", "make", "model"], search))
     
     # Pagination
     query = query.range(skip, skip + limit - 1).order("id", desc=True)
     
     result = query.execute()
     
+    if fieldset:
+        return JSONResponse({
+            "data": [fieldset.dump(v) for v in result.data],
+            "total": result.count or len(result.data),
+        })
+    
     return VehicleListResponse(
         data=[VehicleResponse(**v) for v in result.data],
         total=result.count or len(result.data)
     )
 
 
-@router.get("/options")
-async def get_vehicle_options(
-    user: UserInDB = DispatcherOrAbove,
-    status: Optional[VehicleStatus] = VehicleStatus.idle,
-):
-    """Get vehicle options for dropdowns (id, plate, model)."""
+def load_vehicle_options(status: Optional[VehicleStatus]) -> list[dict]:
+    """Query and shape the dropdown list for one status filter."""
     supabase = get_supabase()
     
     query = supabase.table("vehicles").select("id, license_plate, make, model, max_load_capacity_kg")
@@ -84,19 +118,55 @@ async def get_vehicle_options(
     ]
 
 
+@router.get("/options")
+async def get_vehicle_options(
+    user: UserInDB = DispatcherOrAbove,
+    status: Optional[VehicleStatus] = VehicleStatus.idle,
+):
+    """Get vehicle options for dropdowns (id, plate, model). Served from the reference cache."""
+    return vehicle_options_cache.get_or_load(status, lambda: load_vehicle_options(status))
+
+
+@router.get("/batch", response_model=VehicleBatchResponse)
+async def get_vehicles_batch(
+    user: UserInDB = DispatcherOrAbove,
+    ids: str = Query(..., description="Comma-separated IDs (max 100)"),
+):
+    """Get many vehicles by ID in one query, in the order requested."""
+    try:
+        id_list = parse_ids(ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    rows, missing = in_request_order(id_list, fetch_by_ids("vehicles", "*", id_list))
+    
+    return VehicleBatchResponse(data=[VehicleResponse(**v) for v in rows], missing=missing)
+
+
 @router.get("/{vehicle_id}", response_model=VehicleResponse)
 async def get_vehicle(
     vehicle_id: int,
     user: UserInDB = DispatcherOrAbove,
+    fields: Optional[str] = Query(None, description="Comma-separated response fields"),
 ):
-    """Get a single vehicle by ID."""
+    """Get a single vehicle by ID, optionally projected to `fields`."""
     supabase = get_supabase()
     
-    result = supabase.table("vehicles").select("*").eq("id", vehicle_id).execute()
+    try:
+        fieldset = parse_fields(fields, VehicleResponse)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    result = supabase.table("vehicles").select(
+        fieldset.select if fieldset else "*"
+    ).eq("id", vehicle_id).execute()
     
     if not result.data:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     
+    if fieldset:
+        return JSONResponse(fieldset.dump(result.data[0]))
+    
     return VehicleResponse(**result.data[0])
 
 
@@ -124,6 +194,11 @@ async def create_vehicle(
     if not result.data:
         raise HTTPException(status_code=500, detail="Failed to create vehicle")
     
+    invalidate_vehicle_options()
+    kpi_state.vehicle_added(result.data[0]["status"])
+    index_vehicle(result.data[0])
+    live_dashboard.notify("vehicles")
+    
     return VehicleResponse(**result.data[0])
 
 
@@ -137,7 +212,7 @@ async def update_vehicle(
     supabase = get_supabase()
     
     # Check if vehicle exists
-    existing = supabase.table("vehicles").select("id").eq("id", vehicle_id).execute()
+    existing = supabase.table("vehicles").select("id, status").eq("id", vehicle_id).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     
@@ -155,6 +230,14 @@ async def update_vehicle(
     
     result = supabase.table("vehicles").update(update_data).eq("id", vehicle_id).execute()
     
+    invalidate_vehicle_options()
+    invalidate_vehicle_label(vehicle_id)
+    if "status" in update_data:
+        invalidate_document_digest()
+    kpi_state.vehicle_moved(existing.data[0]["status"], result.data[0]["status"])
+    index_vehicle(result.data[0])
+    live_dashboard.notify("vehicles")
+    
     return VehicleResponse(**result.data[0])
 
 
@@ -180,4 +263,10 @@ async def delete_vehicle(
     # Soft delete by setting status to retired
     supabase.table("vehicles").update({"status": "retired"}).eq("id", vehicle_id).execute()
     
+    invalidate_vehicle_options()
+    invalidate_document_digest()  # retired vehicles' documents drop out
+    kpi_state.vehicle_moved(existing.data[0]["status"], "retired")
+    remove_vehicle(vehicle_id)
+    live_dashboard.notify("vehicles")
+    
     return None
@@ -0,0 +1 @@
+# In-process state shared by the routers (caches, indexes, background work)
@@ -0,0 +1,72 @@
+"""
+services/cache.py — In-process reference cache for dropdown option lists.
+
+Option lists change only on writes that go through this API, so the routers
+invalidate them explicitly. The TTL is a safety net for rows changed outside
+the API (SQL editor, triggers fired by other clients).
+"""
+
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+
+class ReferenceCache:
+    """Keyed cache of fully built responses with explicit invalidation."""
+
+    def __init__(self, name: str, ttl_seconds: float = 300.0):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[Hashable, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        value = loader()
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        return value
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        """Drop one key, or everything when no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Keyed by the status filter passed to /vehicles/options
+vehicle_options_cache = ReferenceCache("vehicle_options")
+
+# Keyed by the available_only flag passed to /drivers/options
+driver_options_cache = ReferenceCache("driver_options")
+
+# Keyed by date: a new day computes a fresh digest
+document_digest_cache = ReferenceCache("document_digest", ttl_seconds=24 * 3600)
+
+
+def invalidate_vehicle_options() -> None:
+    vehicle_options_cache.invalidate()
+
+
+def invalidate_driver_options() -> None:
+    driver_options_cache.invalidate()
+
+
+def invalidate_document_digest() -> None:
+    document_digest_cache.invalidate()
@@ -0,0 +1,223 @@
+"""
+services/columnar.py — Arrow / Parquet export of the fact tables.
+
+Rows are read in id-ordered pages (keyset pagination, so deep pages stay
+cheap and partitioned tables are pruned by the date filter) and turned into
+Arrow record batches column by column. Numeric columns are selected as
+text (`col::text`) and cast to decimal128 inside Arrow, so values keep the
+exact DECIMAL(p,s) of the schema instead of passing through float; dates
+and timestamps are parsed by Arrow's C++ casts rather than per row in
+Python. Batches are written straight to the IPC stream or assembled into a
+Table without copying for Parquet.
+
+pyarrow is optional: it is imported on first use and MissingDependency is
+raised when it is not installed.
+"""
+
+import io
+from datetime import date
+from typing import Any, Iterator, Optional
+
+from db.supabase import get_supabase
+
+PAGE_SIZE = 1000        # PostgREST max rows per request
+BATCH_ROWS = 20_000     # rows per Arrow record batch
+
+
+class MissingDependency(Exception):
+    """pyarrow is not installed."""
+
+
+# Column kinds: "int", "string", "enum", "date", "timestamp", ("decimal", p, s)
+EXPORT_TABLES: dict[str, dict[str, Any]] = {
+    "trips": {
+        "date_column": "scheduled_departure",
+        "columns": {
+            "id": "int",
+            "vehicle_id": "int",
+            "driver_id": "int",
+            "cargo_weight_kg": ("decimal", 10, 2),
+            "origin": "string",
+            "destination": "string",
+            "distance_km": ("decimal", 10, 2),
+            "revenue": ("decimal", 14, 2),
+            "status": "enum",
+            "scheduled_departure": "timestamp",
+            "actual_arrival": "timestamp",
+        },
+    },
+    "fuel_logs": {
+        "date_column": "fuel_date",
+        "columns": {
+            "id": "int",
+            "vehicle_id": "int",
+            "driver_id": "int",
+            "trip_id": "int",
+            "liters": ("decimal", 8, 2),
+            "cost_per_liter": ("decimal", 8, 2),
+            "total_cost": ("decimal", 12, 2),
+            "odometer_at_fill": ("decimal", 12, 2),
+            "fuel_date": "date",
+        },
+    },
+    "expenses": {
+        "date_column": "expense_date",
+        "columns": {
+            "id": "int",
+            "trip_id": "int",
+            "vehicle_id": "int",
+            "expense_type": "enum",
+            "amount": ("decimal", 12, 2),
+            "description": "string",
+            "expense_date": "date",
+        },
+    },
+    "maintenance_logs": {
+        "date_column": "start_date",
+        "columns": {
+            "id": "int",
+            "vehicle_id": "int",
+            "service_type": "enum",
+            "description": "string",
+            "start_date": "date",
+            "completion_date": "date",
+            "cost": ("decimal", 12, 2),
+            "status": "enum",
+        },
+    },
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError as exc:
+        raise MissingDependency("pyarrow") from exc
+    return pyarrow
+
+
+def _arrow_type(pa, kind):
+    if isinstance(kind, tuple):
+        return pa.decimal128(kind[1], kind[2])
+    return {
+        "int": pa.int32(),
+        "string": pa.string(),
+        "enum": pa.dictionary(pa.int32(), pa.string()),
+        "date": pa.date32(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }[kind]
+
+
+def arrow_schema(table: str, columns: list[str]):
+    pa = _pyarrow()
+    spec = EXPORT_TABLES[table]["columns"]
+    return pa.schema([pa.field(c, _arrow_type(pa, spec[c])) for c in columns])
+
+
+def _column_array(pa, kind, values: list):
+    if kind == "int":
+        return pa.array(values, pa.int32())
+    if kind == "string":
+        return pa.array(values, pa.string())
+    if kind == "enum":
+        return pa.array(values, pa.string()).dictionary_encode()
+    # Decimal (as text), date and timestamp strings are cast in C++
+    return pa.array(values, pa.string()).cast(_arrow_type(pa, kind))
+
+
+def _select_clause(table: str, columns: list[str]) -> str:
+    spec = EXPORT_TABLES[table]["columns"]
+    select = [f"{c}::text" if isinstance(spec[c], tuple) else c for c in columns]
+    if "id" not in columns:
+        select.append("id")  # keyset cursor
+    return ", ".join(select)
+
+
+def iter_pages(
+    table: str,
+    columns: list[str],
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> Iterator[list[dict]]:
+    """Rows in id order, one PostgREST page at a time."""
+    supabase = get_supabase()
+    date_column = EXPORT_TABLES[table]["date_column"]
+    timestamp_filter = EXPORT_TABLES[table]["columns"][date_column] == "timestamp"
+    select = _select_clause(table, columns)
+
+    last_id = 0
+    while True:
+        query = supabase.table(table).select(select).gt("id", last_id)
+        if date_from:
+            query = query.gte(date_column, date_from.isoformat())
+        if date_to:
+            # Timestamps: include the whole end day
+            bound = date_to.isoformat() + ("T23:59:59.999999" if timestamp_filter else "")
+            query = query.lte(date_column, bound)
+        page = query.order("id").limit(PAGE_SIZE).execute().data
+        if not page:
+            return
+        yield page
+        if len(page) < PAGE_SIZE:
+            return
+        last_id = page[-1]["id"]
+
+
+def rows_to_batch(table: str, columns: list[str], rows: list[dict]):
+    """One record batch from PostgREST rows (decimals as text)."""
+    pa = _pyarrow()
+    spec = EXPORT_TABLES[table]["columns"]
+    arrays = [_column_array(pa, spec[c], [r[c] for r in rows]) for c in columns]
+    return pa.RecordBatch.from_arrays(arrays, schema=arrow_schema(table, columns))
+
+
+def iter_batches(table: str, columns: list[str], date_from=None, date_to=None):
+    pending: list[dict] = []
+    for page in iter_pages(table, columns, date_from, date_to):
+        pending.extend(page)
+        if len(pending) >= BATCH_ROWS:
+            yield rows_to_batch(table, columns, pending)
+            pending = []
+    if pending:
+        yield rows_to_batch(table, columns, pending)
+
+
+def batches_to_parquet(batches, schema) -> bytes:
+    pa = _pyarrow()
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_batches(list(batches), schema=schema)  # no copy
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression="zstd")
+    return sink.getvalue().to_pybytes()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written buffers to the response stream."""
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def batches_to_ipc_stream(batches, schema) -> Iterator[bytes]:
+    """Arrow IPC stream: schema, then one message per batch as it is built."""
+    pa = _pyarrow()
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        yield sink.drain()
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()  # end-of-stream marker
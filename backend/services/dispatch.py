@@ -0,0 +1,77 @@
+"""
+services/dispatch.py — Batch vehicle/driver assignment for pending cargo.
+
+Best-fit decreasing over sorted arrays: cargo is taken heaviest first and
+given the smallest idle vehicle that can carry it (a bisect into the sorted
+capacity array), so large vehicles stay free for large loads and unused
+capacity is kept low. Drivers are matched the same way on license expiry:
+the eligible driver whose license runs out soonest (but after departure)
+takes the trip. Planning is pure — the router loads the pool and writes.
+"""
+
+import bisect
+from datetime import date
+from typing import Any
+
+
+def plan_assignments(
+    cargo: list[dict[str, Any]],
+    vehicles: list[dict[str, Any]],
+    drivers: list[dict[str, Any]],
+    today: date,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """
+    Assign each cargo item (index, cargo_weight_kg, departure: date) one
+    vehicle (id, max_load_capacity_kg) and one driver (id, license_expiry:
+    date). Every vehicle and driver is used at most once.
+
+    Returns (assignments, unassigned); assignments carry the cargo index,
+    vehicle_id, driver_id and unused_capacity_kg.
+    """
+    # Parallel sorted arrays; removal is a C-level memmove
+    pool = sorted((float(v["max_load_capacity_kg"]), v["id"]) for v in vehicles)
+    capacities = [capacity for capacity, _ in pool]
+    vehicle_ids = [vehicle_id for _, vehicle_id in pool]
+
+    roster = sorted((d["license_expiry"], d["id"]) for d in drivers)
+    expiries = [expiry for expiry, _ in roster]
+    driver_ids = [driver_id for _, driver_id in roster]
+
+    assignments, unassigned = [], []
+    for item in sorted(cargo, key=lambda c: float(c["cargo_weight_kg"]), reverse=True):
+        weight = float(item["cargo_weight_kg"])
+
+        v = bisect.bisect_left(capacities, weight)
+        if v == len(capacities):
+            reason = (
+                "No idle vehicles left" if not capacities
+                else f"No idle vehicle can carry {weight:g} kg"
+            )
+            unassigned.append({"index": item["index"], "reason": reason})
+            continue
+
+        # License must still be valid on the departure day
+        d = bisect.bisect_left(expiries, max(item["departure"], today))
+        if d == len(expiries):
+            reason = (
+                "No available drivers left" if not expiries
+                else "No available driver with a license valid on departure"
+            )
+            unassigned.append({"index": item["index"], "reason": reason})
+            continue
+
+        capacity = capacities.pop(v)
+        vehicle_id = vehicle_ids.pop(v)
+        del expiries[d]
+        driver_id = driver_ids.pop(d)
+
+        assignments.append({
+            "index": item["index"],
+            "vehicle_id": vehicle_id,
+            "driver_id": driver_id,
+            "unused_capacity_kg": round(capacity - weight, 2),
+        })
+
+    assignments.sort(key=lambda a: a["index"])
+    unassigned.sort(key=lambda u: u["index"])
+    return assignments, unassigned
@@ -0,0 +1,191 @@
+"""
+services/events.py — Change-driven live dashboard broadcaster.
+
+Write paths call notify() after a change. The broadcaster recomputes the
+dashboard snapshot once (debounced, off the event loop) and pushes only the
+keys that changed to every subscriber, so database load is one computation
+per change instead of one per open tab per refresh. Recomputes are
+serialized: a subscriber that arrives while one is running waits for it and
+reuses its snapshot.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Callable
+
+logger = logging.getLogger("fleetflow")
+
+
+def diff_snapshot(old: dict, new: dict) -> dict:
+    """Nested dict diff — returns only the leaves that changed in `new`."""
+    delta = {}
+    for key, value in new.items():
+        previous = old.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = diff_snapshot(previous, value)
+            if nested:
+                delta[key] = nested
+        elif previous != value:
+            delta[key] = value
+    return delta
+
+
+def format_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class LiveBroadcaster:
+    """Fan out one computed snapshot (and its deltas) to many SSE clients."""
+
+    def __init__(
+        self,
+        debounce_seconds: float = 0.25,
+        refresh_seconds: float = 60.0,
+        heartbeat_seconds: float = 15.0,
+        queue_size: int = 16,
+    ):
+        self.debounce_seconds = debounce_seconds
+        self.refresh_seconds = refresh_seconds  # catches changes made outside the API
+        self.heartbeat_seconds = heartbeat_seconds
+        self.queue_size = queue_size
+
+        self._compute: Callable[[], dict] | None = None
+        self._subscribers: set[asyncio.Queue] = set()
+        self._changed: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._snapshot: dict | None = None
+        self._snapshot_at = 0.0
+        self._pending_topics: set[str] = set()
+        self._refresh_lock = asyncio.Lock()
+
+        self.computations = 0
+        self.events_sent = 0
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def start(self, compute: Callable[[], dict]) -> None:
+        """Begin the recompute loop. `compute` must return a JSON-safe dict."""
+        self._compute = compute
+        self._changed = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # -- producers -----------------------------------------------------------
+
+    def notify(self, *topics: str) -> None:
+        """Record that a write touched the given tables; cheap, non-blocking."""
+        self._pending_topics.update(topics)
+        if self._changed is not None:
+            self._changed.set()
+
+    # -- consumers -----------------------------------------------------------
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        """Yield SSE frames: a full snapshot first, then deltas and heartbeats."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        try:
+            try:
+                snapshot = await self._current_snapshot()
+            except Exception:
+                logger.exception("Live dashboard snapshot failed")
+                # End the stream cleanly; EventSource reconnects after `retry` ms
+                yield "retry: 5000\n" + format_sse("error", {"detail": "Dashboard snapshot unavailable"})
+                return
+            yield format_sse("snapshot", snapshot)
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), timeout=self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield frame
+        finally:
+            self._subscribers.discard(queue)
+
+    # -- internals -----------------------------------------------------------
+
+    async def _current_snapshot(self) -> dict:
+        # Idle periods skip the periodic refresh, so catch up on outside changes
+        # and keep existing subscribers in step with the snapshot we hand out
+        await self._refresh()
+        return self._snapshot or {}
+
+    def _needs_refresh(self) -> bool:
+        stale = time.monotonic() - self._snapshot_at >= self.refresh_seconds
+        return self._snapshot is None or bool(self._pending_topics) or stale
+
+    async def _refresh(self) -> None:
+        """
+        Recompute and broadcast the delta if anything changed. One recompute
+        runs at a time, so snapshots are installed (and deltas computed) in
+        order; callers queued behind it reuse its result.
+        """
+        async with self._refresh_lock:
+            if not self._needs_refresh():
+                return
+            delta = await self._recompute()
+            if delta:
+                self._broadcast(format_sse("delta", delta))
+
+    async def _recompute(self) -> dict:
+        pending, self._pending_topics = self._pending_topics, set()
+        try:
+            new = await asyncio.to_thread(self._compute)
+        except Exception:
+            self._pending_topics |= pending  # retried on the next recompute
+            raise
+        self.computations += 1
+        old, self._snapshot = self._snapshot, new
+        self._snapshot_at = time.monotonic()
+        # The first snapshot is handed out whole, not broadcast as a delta
+        return diff_snapshot(old, new) if old is not None else {}
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=self.refresh_seconds)
+                # Coalesce bursts (e.g. complete trip + vehicle update) into one recompute
+                await asyncio.sleep(self.debounce_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._changed.clear()
+
+            if not self._subscribers:
+                continue  # nobody listening — compute lazily on next subscribe
+
+            try:
+                await self._refresh()
+            except Exception:
+                logger.exception("Live dashboard recompute failed")
+
+    def _broadcast(self, frame: str) -> None:
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Slow client: drop its backlog and resync with a full snapshot
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(format_sse("snapshot", self._snapshot))
+            self.events_sent += 1
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "computations": self.computations,
+            "events_sent": self.events_sent,
+        }
+
+
+live_dashboard = LiveBroadcaster()
@@ -0,0 +1,72 @@
+"""
+services/fuel_economy.py — Per-fill fuel economy and anomaly flags.
+
+Each fill's economy is the distance driven since the vehicle's previous
+fill divided by the liters put in (full-tank to full-tank). Per vehicle,
+fills are compared to the median km/L using the median absolute deviation
+(MAD, scaled by 1.4826 to estimate σ), which is not skewed by the very
+outliers it is looking for. fn_fuel_anomalies() in schema.sql computes the
+same thing with window functions; this is the fallback when it is not
+deployed.
+
+Flags:
+  odometer_rollback — odometer lower than at the previous fill
+  possible_theft    — km/L below median − k·MAD (more fuel than distance explains)
+  outlier_high      — km/L above median + k·MAD (missed or partial fill)
+"""
+
+from itertools import groupby
+from operator import itemgetter
+from statistics import median
+from typing import Any, Iterable
+
+MAD_SCALE = 1.4826
+MIN_FILLS = 5            # fewer fills than this: only rollbacks are flagged
+MAD_FLOOR_RATIO = 0.05   # MAD floor as a share of the median (uniform fleets)
+
+
+def _vehicle_anomalies(fills: list[dict[str, Any]], k: float) -> list[dict[str, Any]]:
+    economy = []  # (fill, distance_km, km_per_liter)
+    flagged = []
+    previous = None
+    for fill in fills:
+        odometer = float(fill["odometer_at_fill"])
+        if previous is not None:
+            distance = odometer - previous
+            if distance < 0:
+                flagged.append({**fill, "distance_km": round(distance, 2), "km_per_liter": None,
+                                "median_km_per_liter": None, "mad": None,
+                                "anomaly": "odometer_rollback"})
+            else:
+                economy.append((fill, distance, distance / float(fill["liters"])))
+        previous = odometer
+
+    if len(economy) >= MIN_FILLS:
+        values = [kpl for _, _, kpl in economy]
+        center = median(values)
+        mad = median(abs(v - center) for v in values) * MAD_SCALE
+        spread = k * max(mad, center * MAD_FLOOR_RATIO)
+        low, high = center - spread, center + spread
+
+        for fill, distance, kpl in economy:
+            if kpl < low:
+                anomaly = "possible_theft"
+            elif kpl > high:
+                anomaly = "outlier_high"
+            else:
+                continue
+            flagged.append({**fill, "distance_km": round(distance, 2), "km_per_liter": round(kpl, 3),
+                            "median_km_per_liter": round(center, 3), "mad": round(mad, 3),
+                            "anomaly": anomaly})
+    return flagged
+
+
+def detect_anomalies(fills: Iterable[dict[str, Any]], k: float = 3.5) -> list[dict[str, Any]]:
+    """
+    Flag anomalous fills. `fills` need id, vehicle_id, fuel_date, liters and
+    odometer_at_fill, and must be sorted by (vehicle_id, fuel_date, id).
+    """
+    anomalies = []
+    for _, group in groupby(fills, key=itemgetter("vehicle_id")):
+        anomalies.extend(_vehicle_anomalies(list(group), k))
+    return anomalies
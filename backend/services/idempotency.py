@@ -0,0 +1,115 @@
+"""
+services/idempotency.py — Idempotency-Key support for create endpoints.
+
+Clients on flaky connections retry POSTs. A request that carries an
+Idempotency-Key is run once per (endpoint, user, key); retries get the stored
+response back without touching the database. A duplicate that arrives while
+the first request is still running awaits the same future instead of racing
+it into a second insert.
+
+The store is an in-process LRU bounded by entry count, with a TTL. Failed
+requests are not stored, so a retry after an error runs again. Reusing a key
+with a different body raises IdempotencyKeyReused.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a request with a different body."""
+
+
+class IdempotencyStore:
+    """Bounded TTL LRU of completed (or in-flight) create responses."""
+
+    def __init__(self, name: str, max_entries: int = 10_000, ttl_seconds: float = 86_400.0):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (expires, fingerprint, future)
+        self._entries: OrderedDict[Hashable, tuple[float, str, asyncio.Future]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.replays = 0
+        self.collapsed = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(body: str | bytes) -> str:
+        if isinstance(body, str):
+            body = body.encode()
+        return hashlib.sha256(body).hexdigest()
+
+    async def run(
+        self,
+        key: Hashable,
+        body: str | bytes,
+        create: Callable[[], Awaitable[Any]],
+    ) -> tuple[Any, bool]:
+        """
+        Run `create` once per key. Returns (result, replayed); replayed is
+        True when the result came from an earlier or concurrent request.
+        """
+        fingerprint = self.fingerprint(body)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+
+            if entry is not None:
+                if entry[1] != fingerprint:
+                    raise IdempotencyKeyReused(key)
+                self._entries.move_to_end(key)
+                future = entry[2]
+                if future.done():
+                    self.replays += 1
+                else:
+                    self.collapsed += 1
+            else:
+                self.misses += 1
+                future = asyncio.get_running_loop().create_future()
+                self._entries[key] = (now + self.ttl_seconds, fingerprint, future)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                entry = None
+
+        if entry is not None:
+            # shield: a waiter that disconnects must not cancel the owner's work
+            return await asyncio.shield(future), True
+
+        try:
+            result = await create()
+        except BaseException as exc:
+            with self._lock:
+                current = self._entries.get(key)
+                if current is not None and current[2] is future:
+                    del self._entries[key]
+            if isinstance(exc, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(exc)
+                # Nobody else may be waiting; mark the exception as retrieved
+                future.exception()
+            raise
+
+        future.set_result(result)
+        return result, False
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "replays": self.replays,
+            "collapsed": self.collapsed,
+            "misses": self.misses,
+        }
+
+
+# Keyed by (endpoint, user id, Idempotency-Key)
+create_requests = IdempotencyStore("create_requests")
@@ -0,0 +1,184 @@
+"""
+services/jobs.py — In-process background jobs for long-running reports.
+
+A year of month-end data is too slow for a synchronous request, so reports
+are submitted as jobs: the caller gets an ID back immediately and polls for
+progress. Each job is split into chunks (e.g. one month each) so progress is
+reported as it goes and no single database call grows with the range.
+
+Admission is bounded at three levels so reports cannot starve interactive
+traffic: a fixed number of worker coroutines, a private thread pool of the
+same size (blocking SDK calls never occupy the default executor the API
+uses), and caps on queued jobs overall and per user. Finished results are
+kept for download until they expire.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger("fleetflow")
+
+
+class JobQueueFull(Exception):
+    """Too many jobs are queued (overall or for this owner)."""
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    owner: int
+    params: dict
+    chunks_total: int
+    status: str = "queued"          # queued | running | completed | failed
+    chunks_done: int = 0
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    error: Optional[str] = None
+    result: Optional[bytes] = None
+    content_type: Optional[str] = None
+    filename: Optional[str] = None
+
+    @property
+    def progress(self) -> float:
+        return round(self.chunks_done / self.chunks_total, 3) if self.chunks_total else 1.0
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+
+# chunk -> partial result; partial results -> (body, content type, filename)
+ChunkFn = Callable[[Any], Any]
+FinishFn = Callable[[list], tuple[bytes, str, str]]
+
+
+class JobRunner:
+    """Bounded worker pool with per-job chunk progress and result expiry."""
+
+    def __init__(
+        self,
+        name: str,
+        workers: int = 2,
+        max_queued: int = 20,
+        max_per_owner: int = 3,
+        result_ttl_seconds: float = 3600.0,
+    ):
+        self.name = name
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_per_owner = max_per_owner
+        self.result_ttl_seconds = result_ttl_seconds
+        self._jobs: dict[str, Job] = {}
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._executor: ThreadPoolExecutor | None = None
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=f"{self.name}-job")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(
+        self,
+        kind: str,
+        owner: int,
+        params: dict,
+        chunks: list,
+        run_chunk: ChunkFn,
+        finish: FinishFn,
+    ) -> Job:
+        if self._queue is None:
+            raise RuntimeError(f"{self.name} job runner is not started")
+        self._purge()
+
+        active = [j for j in self._jobs.values() if j.active]
+        if len(active) >= self.max_queued or sum(j.owner == owner for j in active) >= self.max_per_owner:
+            self.rejected += 1
+            raise JobQueueFull(kind)
+
+        job = Job(id=uuid.uuid4().hex, kind=kind, owner=owner, params=params, chunks_total=len(chunks))
+        self._jobs[job.id] = job
+        self._queue.put_nowait((job, chunks, run_chunk, finish))
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    def _purge(self) -> None:
+        now = datetime.now(timezone.utc)
+        expired = [k for k, j in self._jobs.items() if j.expires_at is not None and j.expires_at <= now]
+        for k in expired:
+            del self._jobs[k]
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job, chunks, run_chunk, finish = await self._queue.get()
+            job.status = "running"
+            job.started_at = datetime.now(timezone.utc)
+            started = time.perf_counter()
+            try:
+                partials = []
+                for chunk in chunks:
+                    partials.append(await loop.run_in_executor(self._executor, run_chunk, chunk))
+                    job.chunks_done += 1
+                job.result, job.content_type, job.filename = await loop.run_in_executor(
+                    self._executor, finish, partials
+                )
+                job.status = "completed"
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.exception("%s job %s failed", job.kind, job.id)
+                job.status = "failed"
+                job.error = str(exc) or type(exc).__name__
+                self.failed += 1
+            finally:
+                job.finished_at = datetime.now(timezone.utc)
+                job.expires_at = job.finished_at + timedelta(seconds=self.result_ttl_seconds)
+                self._queue.task_done()
+            logger.info("%s job %s %s in %.0f ms", job.kind, job.id, job.status,
+                        (time.perf_counter() - started) * 1000)
+
+    def stats(self) -> dict:
+        jobs = list(self._jobs.values())
+        return {
+            "queued": sum(j.status == "queued" for j in jobs),
+            "running": sum(j.status == "running" for j in jobs),
+            "stored": sum(not j.active for j in jobs),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+report_jobs = JobRunner("reports")
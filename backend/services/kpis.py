@@ -0,0 +1,191 @@
+"""
+services/kpis.py — Incrementally maintained dashboard KPI state.
+
+The counters behind DashboardKPIs are loaded once at startup and then moved
+in O(1) by the trip, maintenance and vehicle write paths, mirroring what the
+status-sync triggers (fn_trip_status_sync, fn_maintenance_vehicle_status) do
+in the database. A periodic reconcile reloads the counts to correct drift
+from writes made outside the API.
+"""
+
+import asyncio
+import logging
+import threading
+
+from db.supabase import get_supabase
+from models.analytics import DashboardKPIs
+from models.enums import TripStatus, VehicleStatus
+
+logger = logging.getLogger("fleetflow")
+
+_ACTIVE_MAINTENANCE = {"new", "in_progress"}
+
+
+def _value(status) -> str | None:
+    return status.value if hasattr(status, "value") else status
+
+
+class KpiState:
+    """Vehicle-by-status and scheduled-trip counters behind the dashboard KPIs."""
+
+    def __init__(self):
+        self.vehicles: dict[str, int] = {s.value: 0 for s in VehicleStatus}
+        self.scheduled_trips = 0
+        self.loaded = False
+        self.reconciles = 0
+        self.last_drift: dict = {}
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+
+    # -- loading -------------------------------------------------------------
+
+    def _fetch(self) -> tuple[dict[str, int], int]:
+        supabase = get_supabase()
+        # One exact count per status: a plain select would stop at PostgREST's row cap
+        counts = {}
+        for status in VehicleStatus:
+            result = supabase.table("vehicles").select("id", count="exact").eq(
+                "status", status.value
+            ).limit(1).execute()
+            counts[status.value] = result.count or 0
+
+        trips = supabase.table("trips").select("id", count="exact").eq(
+            "status", TripStatus.scheduled.value
+        ).limit(1).execute()
+        return counts, trips.count or 0
+
+    def load(self) -> None:
+        counts, scheduled = self._fetch()
+        with self._lock:
+            self.vehicles = counts
+            self.scheduled_trips = scheduled
+            self.loaded = True
+
+    def reconcile(self) -> dict:
+        """Reload from the database; returns (and remembers) any drift found."""
+        counts, scheduled = self._fetch()
+        with self._lock:
+            drift = {
+                status: counts.get(status, 0) - self.vehicles.get(status, 0)
+                for status in counts
+                if counts.get(status, 0) != self.vehicles.get(status, 0)
+            }
+            if scheduled != self.scheduled_trips:
+                drift["scheduled_trips"] = scheduled - self.scheduled_trips
+            self.vehicles = counts
+            self.scheduled_trips = scheduled
+            self.loaded = True
+            self.reconciles += 1
+            self.last_drift = drift
+        if drift:
+            logger.info("KPI state drift corrected: %s", drift)
+        return drift
+
+    def start_reconciler(self, interval_seconds: float = 300.0) -> None:
+        async def _loop():
+            while True:
+                await asyncio.sleep(interval_seconds)
+                try:
+                    await asyncio.to_thread(self.reconcile)
+                except Exception:
+                    logger.exception("KPI reconcile failed")
+
+        self._task = asyncio.create_task(_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # -- O(1) updates from write paths ---------------------------------------
+
+    def vehicle_added(self, status=VehicleStatus.idle) -> None:
+        with self._lock:
+            key = _value(status)
+            self.vehicles[key] = self.vehicles.get(key, 0) + 1
+
+    def vehicle_moved(self, old, new) -> None:
+        old, new = _value(old), _value(new)
+        if old == new or old is None:
+            return
+        with self._lock:
+            self.vehicles[old] = max(self.vehicles.get(old, 0) - 1, 0)
+            self.vehicles[new] = self.vehicles.get(new, 0) + 1
+
+    def trip_added(self, status=TripStatus.scheduled) -> None:
+        if _value(status) == TripStatus.scheduled.value:
+            with self._lock:
+                self.scheduled_trips += 1
+
+    def trip_removed(self, status) -> None:
+        if _value(status) == TripStatus.scheduled.value:
+            with self._lock:
+                self.scheduled_trips = max(self.scheduled_trips - 1, 0)
+
+    def trip_moved(self, old, new, vehicle_status) -> None:
+        """Apply a trip status change plus its fn_trip_status_sync side effect.
+
+        ``vehicle_status`` is the trip vehicle's status read before the write,
+        so the counter leaves the bucket the vehicle was really in.
+        """
+        old, new = _value(old), _value(new)
+        if old == new:
+            return
+        self.trip_removed(old)
+        self.trip_added(new)
+        if new == TripStatus.in_transit.value:
+            self.vehicle_moved(vehicle_status, VehicleStatus.on_trip)
+        elif old == TripStatus.in_transit.value and new in ("delivered", "cancelled"):
+            self.vehicle_moved(vehicle_status, VehicleStatus.idle)
+
+    def maintenance_moved(self, old, new, vehicle_status) -> None:
+        """Apply fn_maintenance_vehicle_status: open log → in_shop, closed → idle.
+
+        ``vehicle_status`` is the vehicle's status read before the write.
+        """
+        old, new = _value(old), _value(new)
+        if new in _ACTIVE_MAINTENANCE and old not in _ACTIVE_MAINTENANCE:
+            self.vehicle_moved(vehicle_status, VehicleStatus.in_shop)
+        elif old in _ACTIVE_MAINTENANCE and new in ("completed", "cancelled"):
+            self.vehicle_moved(vehicle_status, VehicleStatus.idle)
+
+    # -- reads ---------------------------------------------------------------
+
+    def kpis(self) -> DashboardKPIs:
+        with self._lock:
+            on_trip = self.vehicles.get("on_trip", 0)
+            in_shop = self.vehicles.get("in_shop", 0)
+            active_total = sum(
+                n for status, n in self.vehicles.items() if status != "retired"
+            )
+            scheduled = self.scheduled_trips
+
+        utilization_rate = round((on_trip * 100.0) / active_total, 1) if active_total > 0 else 0
+        return DashboardKPIs(
+            active_fleet=on_trip,
+            maintenance_alerts=in_shop,
+            utilization_rate=utilization_rate,
+            pending_cargo=scheduled,
+        )
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "vehicles": dict(self.vehicles),
+            "scheduled_trips": self.scheduled_trips,
+            "reconciles": self.reconciles,
+            "last_drift": self.last_drift,
+        }
+
+
+def embedded_vehicle_status(row: dict):
+    """Read ``vehicles(status)`` embedded in a trip or maintenance row."""
+    vehicle = row.get("vehicles") or {}
+    return vehicle.get("status")
+
+
+kpi_state = KpiState()
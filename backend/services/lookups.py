@@ -0,0 +1,125 @@
+"""
+services/lookups.py — Shared ID → label cache used to enrich list responses.
+
+Trips, fuel logs, expenses and maintenance lists all decorate their rows with
+a vehicle plate / model and a driver name. Those labels rarely change, so they
+are kept in a read-through cache: only IDs missing from the cache are fetched,
+in one batched query, and a warm page costs no database calls at all.
+"""
+
+import threading
+import time
+from typing import Callable, Iterable
+
+from db.supabase import get_supabase
+
+
+class LabelCache:
+    """Read-through ID → dict cache with batched miss loading."""
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[[list[int]], dict[int, dict]],
+        ttl_seconds: float = 900.0,
+    ):
+        self.name = name
+        self._fetch = fetch
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[int, tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, ids: Iterable[int]) -> dict[int, dict]:
+        now = time.monotonic()
+        found: dict[int, dict] = {}
+        missing: list[int] = []
+
+        for entity_id in set(i for i in ids if i is not None):
+            entry = self._entries.get(entity_id)
+            if entry is not None and entry[0] > now:
+                found[entity_id] = entry[1]
+            else:
+                missing.append(entity_id)
+
+        self.hits += len(found)
+        self.misses += len(missing)
+
+        if missing:
+            fetched = self._fetch(missing)
+            expires = now + self.ttl_seconds
+            with self._lock:
+                for entity_id, value in fetched.items():
+                    self._entries[entity_id] = (expires, value)
+            found.update(fetched)
+
+        return found
+
+    def invalidate(self, entity_id: int | None = None) -> None:
+        """Drop one ID, or everything when no ID is given."""
+        with self._lock:
+            if entity_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(entity_id, None)
+
+    def invalidate_where(self, predicate: Callable[[dict], bool]) -> None:
+        with self._lock:
+            stale = [k for k, (_, v) in self._entries.items() if predicate(v)]
+            for k in stale:
+                del self._entries[k]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def _fetch_vehicles(ids: list[int]) -> dict[int, dict]:
+    result = get_supabase().table("vehicles").select(
+        "id, license_plate, make, model"
+    ).in_("id", ids).execute()
+    return {v["id"]: v for v in result.data}
+
+
+def _fetch_drivers(ids: list[int]) -> dict[int, dict]:
+    result = get_supabase().table("drivers").select(
+        "id, user_id, users!inner(first_name, last_name)"
+    ).in_("id", ids).execute()
+
+    drivers = {}
+    for d in result.data:
+        user_data = d.get("users", {})
+        name = f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip()
+        drivers[d["id"]] = {"name": name, "user_id": d["user_id"]}
+    return drivers
+
+
+vehicle_labels = LabelCache("vehicle_labels", _fetch_vehicles)
+driver_labels = LabelCache("driver_labels", _fetch_drivers)
+
+
+def vehicle_map(ids: Iterable[int]) -> dict[int, dict]:
+    """{vehicle_id: {"id", "license_plate", "make", "model"}} for the given IDs."""
+    return vehicle_labels.get_many(ids)
+
+
+def driver_map(ids: Iterable[int]) -> dict[int, dict]:
+    """{driver_id: {"name", "user_id"}} for the given IDs."""
+    return driver_labels.get_many(ids)
+
+
+def invalidate_vehicle_label(vehicle_id: int | None = None) -> None:
+    vehicle_labels.invalidate(vehicle_id)
+
+
+def invalidate_driver_label(driver_id: int | None = None) -> None:
+    driver_labels.invalidate(driver_id)
+
+
+def invalidate_user_label(user_id: int) -> None:
+    """Driver names come from users.first_name/last_name — call on user renames."""
+    driver_labels.invalidate_where(lambda d: d.get("user_id") == user_id)
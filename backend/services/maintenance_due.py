@@ -0,0 +1,132 @@
+"""
+services/maintenance_due.py — Predicted next service per vehicle and service type.
+
+Each scheduled service type has a distance interval, a time interval or
+both; whichever comes first makes it due. The last completed service of a
+type sets the baseline: its date, and as its odometer the vehicle's last
+fill on or before that date (maintenance logs do not record one), else its
+first fill after it, else its current odometer. With no service on record
+the baseline is 0 km and the time interval is due now.
+The usage rate (km/day between the first and last fill of the past 90
+days) projects the distance interval onto a date.
+
+fn_maintenance_due_refresh() in schema.sql computes the same thing into the
+maintenance_due table and triggers keep it current; this is the fallback
+when it is not deployed.
+"""
+
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, timedelta
+from math import ceil
+from typing import Any, Iterable, Optional
+
+# service_type -> (interval_km, interval_days); same defaults as service_intervals
+DEFAULT_INTERVALS: dict[str, tuple[Optional[float], Optional[int]]] = {
+    "oil_change": (10000, 180),
+    "tire_replacement": (50000, 730),
+    "brake_service": (30000, 365),
+    "general_inspection": (None, 365),
+}
+
+USAGE_WINDOW_DAYS = 90
+MAX_HORIZON_DAYS = 36500   # caps projections for vehicles that barely move
+
+
+def _usage(fills: list[tuple[date, float]], today: date) -> tuple[float, Optional[float]]:
+    """(highest odometer in the window, km/day) from date-ordered fills."""
+    recent = [f for f in fills if f[0] >= today - timedelta(days=USAGE_WINDOW_DAYS)]
+    if not recent:
+        return 0.0, None
+    odometers = [km for _, km in recent]
+    days = (recent[-1][0] - recent[0][0]).days
+    rate = (max(odometers) - min(odometers)) / days if days > 0 else None
+    return max(odometers), rate
+
+
+def _due_date(
+    today: date,
+    last_service_date: Optional[date],
+    interval_days: Optional[int],
+    due_km: Optional[float],
+    current_km: float,
+    km_per_day: Optional[float],
+) -> Optional[date]:
+    candidates = []
+    if interval_days is not None:
+        candidates.append(last_service_date + timedelta(days=interval_days) if last_service_date else today)
+    if due_km is not None:
+        if due_km <= current_km:
+            candidates.append(today)
+        elif km_per_day:
+            candidates.append(today + timedelta(days=min(ceil((due_km - current_km) / km_per_day), MAX_HORIZON_DAYS)))
+    return min(candidates) if candidates else None
+
+
+def compute_due(
+    vehicles: Iterable[dict[str, Any]],
+    intervals: dict[str, tuple[Optional[float], Optional[int]]],
+    completed: Iterable[dict[str, Any]],
+    fills: Iterable[dict[str, Any]],
+    today: Optional[date] = None,
+) -> list[dict[str, Any]]:
+    """
+    One row per non-retired vehicle and scheduled service type, shaped like
+    the maintenance_due table.
+
+    vehicles:  id, current_odometer_km, status
+    completed: vehicle_id, service_type, completion_date (completed logs)
+    fills:     vehicle_id, fuel_date, odometer_at_fill; the usage window
+               plus the fills around each last service are enough
+    """
+    today = today or date.today()
+
+    fills_by_vehicle: dict[int, list[tuple[date, float]]] = defaultdict(list)
+    for f in fills:
+        fills_by_vehicle[f["vehicle_id"]].append((date.fromisoformat(str(f["fuel_date"])), float(f["odometer_at_fill"])))
+    for history in fills_by_vehicle.values():
+        history.sort()
+
+    last_service: dict[tuple[int, str], date] = {}
+    for log in completed:
+        if not log.get("completion_date"):
+            continue
+        key = (log["vehicle_id"], log["service_type"])
+        done = date.fromisoformat(str(log["completion_date"]))
+        if key not in last_service or done > last_service[key]:
+            last_service[key] = done
+
+    rows = []
+    for v in vehicles:
+        if v["status"] == "retired":
+            continue
+        history = fills_by_vehicle.get(v["id"], [])
+        last_km, km_per_day = _usage(history, today)
+        current_km = max(float(v["current_odometer_km"]), last_km)
+
+        for service_type, (interval_km, interval_days) in intervals.items():
+            serviced = last_service.get((v["id"], service_type))
+            # Last fill on or before the service date, else the first after it
+            before = bisect_right(history, (serviced, float("inf"))) if serviced else 0
+            if not serviced:
+                service_km = 0.0
+            elif before:
+                service_km = history[before - 1][1]
+            elif history:
+                service_km = history[0][1]
+            else:
+                service_km = float(v["current_odometer_km"])
+            due_km = service_km + interval_km if interval_km is not None else None
+
+            rows.append({
+                "vehicle_id": v["id"],
+                "service_type": service_type,
+                "last_service_date": serviced,
+                "last_service_km": round(service_km, 2),
+                "current_km": round(current_km, 2),
+                "km_per_day": round(km_per_day, 2) if km_per_day is not None else None,
+                "due_km": round(due_km, 2) if due_km is not None else None,
+                "km_remaining": round(due_km - current_km, 2) if due_km is not None else None,
+                "due_date": _due_date(today, serviced, interval_days, due_km, current_km, km_per_day),
+            })
+    return rows
@@ -0,0 +1,106 @@
+"""
+services/ratelimit.py — In-memory token buckets for per-user admission control.
+
+Every authenticated request draws a token from the caller's bucket for the
+route's cost class. "standard" covers all resource routes; "heavy" is also
+drawn by endpoints that fan out into several full-table queries (analytics
+summaries, auto-assign). Buckets refill continuously, so a client that stays
+under its rate is never throttled, while a script hammering an endpoint is
+turned away before it reaches Supabase.
+
+Quotas grow with the caller's rank in the role hierarchy: rank r (0 for the
+lowest role) gets (r + 1) times the base burst and refill rate.
+"""
+
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Quota:
+    burst: float        # bucket capacity, for the lowest role
+    per_second: float   # refill rate, for the lowest role
+
+
+COST_CLASSES: dict[str, Quota] = {
+    "standard": Quota(burst=30, per_second=1.0),
+    "heavy": Quota(burst=4, per_second=0.1),
+}
+
+
+class RateLimiter:
+    """Token buckets keyed on (user, cost class)."""
+
+    def __init__(self, quotas: dict[str, Quota], max_buckets: int = 50_000):
+        self.quotas = quotas
+        self.max_buckets = max_buckets
+        self.enabled = True
+        # (user, cost class) -> [tokens, last refill]
+        self._buckets: dict[tuple[str, str], list[float]] = {}
+        self._lock = threading.Lock()
+        self.allowed = {name: 0 for name in quotas}
+        self.throttled = {name: 0 for name in quotas}
+
+    def limits(self, cost_class: str, rank: int) -> tuple[float, float]:
+        quota = self.quotas[cost_class]
+        scale = max(rank, 0) + 1
+        return quota.burst * scale, quota.per_second * scale
+
+    def acquire(self, user: str, cost_class: str, rank: int) -> float:
+        """
+        Take one token. Returns 0 when admitted, otherwise the seconds until
+        a token will be available (the caller should reject the request).
+        """
+        if not self.enabled:
+            return 0.0
+
+        capacity, rate = self.limits(cost_class, rank)
+        now = time.monotonic()
+        key = (user, cost_class)
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_buckets:
+                    self._prune(now)
+                bucket = self._buckets[key] = [capacity, now]
+            else:
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                self.allowed[cost_class] += 1
+                return 0.0
+
+            self.throttled[cost_class] += 1
+            return (1.0 - bucket[0]) / rate
+
+    def _prune(self, now: float) -> None:
+        """Drop buckets that have refilled completely (state equals a new bucket)."""
+        idle_after = max(q.burst / q.per_second for q in self.quotas.values())
+        stale = [k for k, (_, last) in self._buckets.items() if now - last >= idle_after]
+        for k in stale:
+            del self._buckets[k]
+        if len(self._buckets) >= self.max_buckets:
+            # Still full: evict the least recently used
+            oldest = sorted(self._buckets, key=lambda k: self._buckets[k][1])
+            for k in oldest[: len(oldest) // 10 or 1]:
+                del self._buckets[k]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "buckets": len(self._buckets),
+            "allowed": dict(self.allowed),
+            "throttled": dict(self.throttled),
+        }
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+rate_limiter = RateLimiter(COST_CLASSES)
@@ -0,0 +1,55 @@
+"""
+services/singleflight.py — Coalesce concurrent identical computations.
+
+When a shift starts, many dispatchers open the analytics page at once and
+each request would run the same multi-query aggregation. A SingleFlight
+group runs one computation per key at a time (in a worker thread, since the
+Supabase SDK is blocking); requests arriving while it is in flight await the
+same result instead of starting their own. Nothing is cached once the
+computation finishes — the next request after that recomputes.
+
+Keys must capture everything the result depends on: the route, its
+parameters, and any role-dependent visibility.
+"""
+
+import asyncio
+from typing import Any, Callable, Hashable
+
+
+class SingleFlight:
+    """Per-key shared in-flight computations."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args: Any) -> Any:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            self.executed += 1
+            # Owned by the group, not the first caller: a caller that
+            # disconnects must not cancel the work others are waiting on
+            task = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._finished(key, t))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here if every caller went away
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "executed": self.executed,
+            "shared": self.shared,
+        }
+
+
+analytics_flights = SingleFlight("analytics")
@@ -0,0 +1,189 @@
+"""
+services/typeahead.py — In-memory prefix index for the trip form typeahead.
+
+Vehicle plates, make/model and driver names are tokenized into a sorted list
+of (token, kind, id) tuples. A lookup is a bisect to the first token with the
+typed prefix followed by a short forward scan, so keystrokes never hit the
+database. The index is built at startup and patched by vehicle/driver writes.
+"""
+
+import bisect
+import re
+import threading
+
+from db.paging import fetch_all
+from db.supabase import get_supabase
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _tokens(*phrases: str) -> set[str]:
+    """Every word, every word suffix-phrase, plus a punctuation-free form (plates)."""
+    tokens = set()
+    for phrase in phrases:
+        phrase = _normalize(phrase or "")
+        if not phrase:
+            continue
+        words = phrase.split(" ")
+        for i in range(len(words)):
+            tokens.add(" ".join(words[i:]))
+        compact = _NON_ALNUM.sub("", phrase)
+        if compact:
+            tokens.add(compact)
+    return tokens
+
+
+class PrefixIndex:
+    """Sorted-array prefix index over (kind, id) entities."""
+
+    def __init__(self):
+        self._keys: list[tuple[str, str, int]] = []      # sorted (token, kind, id)
+        self._entities: dict[tuple[str, int], dict] = {}  # (kind, id) -> result payload
+        self._entity_tokens: dict[tuple[str, int], set[str]] = {}
+        self._lock = threading.Lock()
+        self.built = False
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def _remove_locked(self, kind: str, entity_id: int) -> None:
+        for token in self._entity_tokens.pop((kind, entity_id), ()):
+            key = (token, kind, entity_id)
+            i = bisect.bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+        self._entities.pop((kind, entity_id), None)
+
+    def upsert(self, kind: str, entity_id: int, payload: dict, *phrases: str) -> None:
+        tokens = _tokens(*phrases)
+        with self._lock:
+            self._remove_locked(kind, entity_id)
+            for token in tokens:
+                bisect.insort(self._keys, (token, kind, entity_id))
+            self._entities[(kind, entity_id)] = payload
+            self._entity_tokens[(kind, entity_id)] = tokens
+
+    def remove(self, kind: str, entity_id: int) -> None:
+        with self._lock:
+            self._remove_locked(kind, entity_id)
+
+    def get(self, kind: str, entity_id: int) -> dict | None:
+        return self._entities.get((kind, entity_id))
+
+    def replace_all(self, entries: list[tuple[str, int, dict, tuple[str, ...]]]) -> None:
+        """Bulk (re)build: one sort instead of N insorts."""
+        keys, entities, entity_tokens = [], {}, {}
+        for kind, entity_id, payload, phrases in entries:
+            tokens = _tokens(*phrases)
+            keys.extend((token, kind, entity_id) for token in tokens)
+            entities[(kind, entity_id)] = payload
+            entity_tokens[(kind, entity_id)] = tokens
+        keys.sort()
+        with self._lock:
+            self._keys = keys
+            self._entities = entities
+            self._entity_tokens = entity_tokens
+            self.built = True
+
+    def search(self, prefix: str, kind: str | None = None, limit: int = 10) -> list[dict]:
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+        compact = _NON_ALNUM.sub("", prefix)
+
+        matches: dict[tuple[str, int], tuple[int, int]] = {}
+        keys = self._keys  # snapshot reference; writers swap or patch under lock
+        for probe in {prefix, compact} - {""}:
+            i = bisect.bisect_left(keys, (probe,))
+            while i < len(keys) and keys[i][0].startswith(probe):
+                token, entity_kind, entity_id = keys[i]
+                i += 1
+                if kind and entity_kind != kind:
+                    continue
+                # Rank: exact token match first, then shorter (tighter) tokens
+                score = (0 if token == probe else 1, len(token))
+                ref = (entity_kind, entity_id)
+                if ref not in matches or score < matches[ref]:
+                    matches[ref] = score
+                if len(matches) >= limit * 4:
+                    break
+
+        ranked = sorted(matches.items(), key=lambda item: item[1])[:limit]
+        return [self._entities[ref] for ref, _ in ranked if ref in self._entities]
+
+
+typeahead_index = PrefixIndex()
+
+
+# ---------------------------------------------------------------------------
+# Entity adapters — keep payload shapes in one place
+# ---------------------------------------------------------------------------
+
+def _vehicle_entry(v: dict) -> tuple[dict, tuple[str, ...]]:
+    payload = {
+        "kind": "vehicle",
+        "id": v["id"],
+        "label": f"{v['make']} {v['model']} - {v['license_plate']}",
+        "license_plate": v["license_plate"],
+    }
+    return payload, (v["license_plate"], f"{v['make']} {v['model']}")
+
+
+def _driver_entry(driver_id: int, name: str, license_number: str) -> tuple[dict, tuple[str, ...]]:
+    payload = {
+        "kind": "driver",
+        "id": driver_id,
+        "label": name,
+        "license_number": license_number,
+    }
+    return payload, (name, license_number)
+
+
+def index_vehicle(vehicle: dict) -> None:
+    """Add / refresh a vehicle row (needs id, license_plate, make, model, status)."""
+    if vehicle.get("status") == "retired":
+        typeahead_index.remove("vehicle", vehicle["id"])
+        return
+    payload, phrases = _vehicle_entry(vehicle)
+    typeahead_index.upsert("vehicle", vehicle["id"], payload, *phrases)
+
+
+def index_driver(driver_id: int, name: str, license_number: str) -> None:
+    payload, phrases = _driver_entry(driver_id, name, license_number)
+    typeahead_index.upsert("driver", driver_id, payload, *phrases)
+
+
+def remove_vehicle(vehicle_id: int) -> None:
+    typeahead_index.remove("vehicle", vehicle_id)
+
+
+def remove_driver(driver_id: int) -> None:
+    typeahead_index.remove("driver", driver_id)
+
+
+def build_typeahead_index() -> int:
+    """Load all active vehicles and drivers; returns the number of entities indexed."""
+    supabase = get_supabase()
+    vehicles = fetch_all(lambda: supabase.table("vehicles").select(
+        "id, license_plate, make, model"
+    ).neq("status", "retired").order("id"))
+    drivers = fetch_all(lambda: supabase.table("drivers").select(
+        "id, license_number, users!inner(first_name, last_name)"
+    ).order("id"))
+
+    entries = []
+    for v in vehicles:
+        payload, phrases = _vehicle_entry(v)
+        entries.append(("vehicle", v["id"], payload, phrases))
+    for d in drivers:
+        user_data = d.get("users", {})
+        name = f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip()
+        payload, phrases = _driver_entry(d["id"], name, d["license_number"])
+        entries.append(("driver", d["id"], payload, phrases))
+
+    typeahead_index.replace_all(entries)
+    return len(entries)
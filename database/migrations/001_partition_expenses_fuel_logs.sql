@@ -0,0 +1,273 @@
+-- ============================================================
+-- Migration 001: monthly range partitioning for expenses & fuel_logs
+-- ============================================================
+-- For databases created from schema.sql v3.0 (unpartitioned tables).
+-- Fresh installs get the partitioned layout from schema.sql directly.
+--
+-- What it does, in one transaction:
+--   1. Renames the existing tables to *_unpartitioned
+--   2. Creates the partitioned tables (reusing the id sequences, so ids
+--      are preserved and new ids continue where they left off)
+--   3. Creates a monthly partition for every month that has data, plus
+--      the usual window around the current month
+--   4. Copies the rows, then re-creates indexes, the odometer trigger and
+--      the views that read fuel_logs
+--   5. Drops the old tables
+--
+-- Run with:  psql "$DATABASE_URL" -f database/migrations/001_partition_expenses_fuel_logs.sql
+-- The copy holds an ACCESS EXCLUSIVE lock on both tables; run it in a
+-- maintenance window for large tables.
+-- ============================================================
+
+BEGIN;
+
+-- idx_expenses_desc_trgm below needs gin_trgm_ops
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Views bind to the table, not the name — drop and re-create around the swap
+DROP VIEW IF EXISTS vw_vehicle_cost_summary;
+DROP VIEW IF EXISTS vw_monthly_financial_summary;
+
+
+-- 1. Park the old tables -----------------------------------
+
+ALTER TABLE expenses  RENAME TO expenses_unpartitioned;
+ALTER TABLE fuel_logs RENAME TO fuel_logs_unpartitioned;
+
+ALTER TABLE expenses_unpartitioned  RENAME CONSTRAINT expenses_pkey  TO expenses_unpartitioned_pkey;
+ALTER TABLE fuel_logs_unpartitioned RENAME CONSTRAINT fuel_logs_pkey TO fuel_logs_unpartitioned_pkey;
+
+DROP INDEX IF EXISTS idx_expenses_trip;
+DROP INDEX IF EXISTS idx_expenses_vehicle;
+DROP INDEX IF EXISTS idx_expenses_type;
+DROP INDEX IF EXISTS idx_expenses_desc_trgm;
+DROP INDEX IF EXISTS idx_fuel_vehicle;
+DROP INDEX IF EXISTS idx_fuel_trip;
+
+
+-- 2. Partitioned tables ------------------------------------
+
+CREATE TABLE expenses (
+    id                  INTEGER         NOT NULL DEFAULT nextval('expenses_id_seq'),
+    trip_id             INTEGER         REFERENCES trips(id) ON DELETE SET NULL,
+    vehicle_id          INTEGER         NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
+    expense_type        expense_type    NOT NULL,
+    amount              DECIMAL(12,2)   NOT NULL CHECK (amount > 0),
+    description         VARCHAR(500),
+    expense_date        DATE            NOT NULL DEFAULT CURRENT_DATE,
+
+    PRIMARY KEY (id, expense_date)
+) PARTITION BY RANGE (expense_date);
+
+CREATE TABLE fuel_logs (
+    id                  INTEGER         NOT NULL DEFAULT nextval('fuel_logs_id_seq'),
+    vehicle_id          INTEGER         NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
+    driver_id           INTEGER         REFERENCES drivers(id) ON DELETE SET NULL,
+    trip_id             INTEGER         REFERENCES trips(id) ON DELETE SET NULL,
+    liters              DECIMAL(8,2)    NOT NULL CHECK (liters > 0),
+    cost_per_liter      DECIMAL(8,2)    NOT NULL CHECK (cost_per_liter > 0),
+    total_cost          DECIMAL(12,2)   NOT NULL GENERATED ALWAYS AS (liters * cost_per_liter) STORED,
+    odometer_at_fill    DECIMAL(12,2)   NOT NULL CHECK (odometer_at_fill >= 0),
+    fuel_date           DATE            NOT NULL DEFAULT CURRENT_DATE,
+
+    PRIMARY KEY (id, fuel_date)
+) PARTITION BY RANGE (fuel_date);
+
+-- The sequences now belong to the new tables (survive the DROP below)
+ALTER SEQUENCE expenses_id_seq  OWNED BY expenses.id;
+ALTER SEQUENCE fuel_logs_id_seq OWNED BY fuel_logs.id;
+
+CREATE TABLE expenses_default  PARTITION OF expenses  DEFAULT;
+CREATE TABLE fuel_logs_default PARTITION OF fuel_logs DEFAULT;
+
+
+-- 3. Partition management functions (same as schema.sql) ---
+
+CREATE OR REPLACE FUNCTION fn_create_monthly_partition(p_table TEXT, p_month DATE)
+RETURNS BOOLEAN AS $$
+DECLARE
+    v_key   TEXT;
+    v_start DATE := DATE_TRUNC('month', p_month)::DATE;
+    v_end   DATE := (DATE_TRUNC('month', p_month) + INTERVAL '1 month')::DATE;
+    v_name  TEXT := format('%s_y%sm%s', p_table, to_char(v_start, 'YYYY'), to_char(v_start, 'MM'));
+    v_parked BOOLEAN;
+BEGIN
+    v_key := CASE p_table
+        WHEN 'expenses'  THEN 'expense_date'
+        WHEN 'fuel_logs' THEN 'fuel_date'
+    END;
+    IF v_key IS NULL THEN
+        RAISE EXCEPTION 'Table "%" is not partitioned by month', p_table;
+    END IF;
+
+    IF to_regclass(v_name) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+
+    EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE %I >= %L AND %I < %L)',
+                   p_table || '_default', v_key, v_start, v_key, v_end)
+        INTO v_parked;
+    IF v_parked THEN
+        RAISE NOTICE '% has rows for % in its default partition; skipped', p_table, v_start;
+        RETURN FALSE;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                   v_name, p_table, v_start, v_end);
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_ensure_monthly_partitions(
+    p_months_back  INTEGER DEFAULT 1,
+    p_months_ahead INTEGER DEFAULT 3
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_table   TEXT;
+    v_offset  INTEGER;
+    v_created INTEGER := 0;
+BEGIN
+    FOREACH v_table IN ARRAY ARRAY['expenses', 'fuel_logs'] LOOP
+        FOR v_offset IN -p_months_back .. p_months_ahead LOOP
+            IF fn_create_monthly_partition(
+                   v_table, (DATE_TRUNC('month', CURRENT_DATE) + v_offset * INTERVAL '1 month')::DATE)
+            THEN
+                v_created := v_created + 1;
+            END IF;
+        END LOOP;
+    END LOOP;
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One partition per month that has data, then the rolling window
+DO $$
+DECLARE
+    v_month DATE;
+BEGIN
+    FOR v_month IN
+        SELECT DISTINCT DATE_TRUNC('month', expense_date)::DATE FROM expenses_unpartitioned
+    LOOP
+        PERFORM fn_create_monthly_partition('expenses', v_month);
+    END LOOP;
+
+    FOR v_month IN
+        SELECT DISTINCT DATE_TRUNC('month', fuel_date)::DATE FROM fuel_logs_unpartitioned
+    LOOP
+        PERFORM fn_create_monthly_partition('fuel_logs', v_month);
+    END LOOP;
+END;
+$$;
+
+SELECT fn_ensure_monthly_partitions(12, 3);
+
+
+-- 4. Move the data -----------------------------------------
+-- Copied before the trigger exists so the odometer sync does not re-fire.
+
+INSERT INTO expenses (id, trip_id, vehicle_id, expense_type, amount, description, expense_date)
+SELECT id, trip_id, vehicle_id, expense_type, amount, description, expense_date
+FROM expenses_unpartitioned;
+
+INSERT INTO fuel_logs (id, vehicle_id, driver_id, trip_id, liters, cost_per_liter, odometer_at_fill, fuel_date)
+SELECT id, vehicle_id, driver_id, trip_id, liters, cost_per_liter, odometer_at_fill, fuel_date
+FROM fuel_logs_unpartitioned;
+
+DO $$
+BEGIN
+    IF (SELECT COUNT(*) FROM expenses) <> (SELECT COUNT(*) FROM expenses_unpartitioned)
+       OR (SELECT COUNT(*) FROM fuel_logs) <> (SELECT COUNT(*) FROM fuel_logs_unpartitioned)
+    THEN
+        RAISE EXCEPTION 'Row counts differ after copy; rolling back';
+    END IF;
+END;
+$$;
+
+CREATE INDEX idx_expenses_trip      ON expenses(trip_id);
+CREATE INDEX idx_expenses_vehicle   ON expenses(vehicle_id);
+CREATE INDEX idx_expenses_type      ON expenses(expense_type);
+CREATE INDEX idx_expenses_date      ON expenses(expense_date);
+CREATE INDEX idx_expenses_desc_trgm ON expenses USING GIN (description gin_trgm_ops);
+CREATE INDEX idx_fuel_vehicle       ON fuel_logs(vehicle_id);
+CREATE INDEX idx_fuel_trip          ON fuel_logs(trip_id);
+CREATE INDEX idx_fuel_date          ON fuel_logs(fuel_date);
+
+CREATE INDEX IF NOT EXISTS idx_trips_delivered_arrival ON trips(actual_arrival) WHERE status = 'delivered';
+
+CREATE TRIGGER trg_sync_odometer
+    AFTER INSERT ON fuel_logs
+    FOR EACH ROW EXECUTE FUNCTION fn_sync_odometer();
+
+
+-- Views (unchanged definitions from schema.sql) ------------
+
+CREATE VIEW vw_vehicle_cost_summary AS
+SELECT
+    v.id                    AS vehicle_id,
+    v.license_plate,
+    v.make || ' ' || v.model AS vehicle_name,
+    COALESCE(f.total_fuel, 0)       AS total_fuel_cost,
+    COALESCE(m.total_maint, 0)      AS total_maintenance_cost,
+    COALESCE(f.total_fuel, 0)
+        + COALESCE(m.total_maint, 0) AS total_cost,
+    COALESCE(t.total_revenue, 0)    AS total_revenue,
+    COALESCE(t.total_revenue, 0)
+        - COALESCE(f.total_fuel, 0)
+        - COALESCE(m.total_maint, 0) AS net_profit,
+    CASE WHEN COALESCE(f.total_liters, 0) > 0
+         THEN ROUND(COALESCE(t.total_distance, 0) / f.total_liters, 2)
+         ELSE 0
+    END                              AS km_per_liter
+FROM vehicles v
+LEFT JOIN (
+    SELECT vehicle_id, SUM(total_cost) AS total_fuel, SUM(liters) AS total_liters
+    FROM fuel_logs GROUP BY vehicle_id
+) f ON f.vehicle_id = v.id
+LEFT JOIN (
+    SELECT vehicle_id, SUM(cost) AS total_maint
+    FROM maintenance_logs WHERE status = 'completed'
+    GROUP BY vehicle_id
+) m ON m.vehicle_id = v.id
+LEFT JOIN (
+    SELECT vehicle_id, SUM(revenue) AS total_revenue, SUM(distance_km) AS total_distance
+    FROM trips WHERE status = 'delivered'
+    GROUP BY vehicle_id
+) t ON t.vehicle_id = v.id
+WHERE v.status != 'retired';
+
+CREATE VIEW vw_monthly_financial_summary AS
+SELECT
+    DATE_TRUNC('month', t.actual_arrival)::DATE AS month,
+    SUM(t.revenue)                              AS total_revenue,
+    COALESCE(SUM(f.fuel_cost), 0)               AS total_fuel_cost,
+    COALESCE(SUM(m.maint_cost), 0)              AS total_maintenance_cost,
+    SUM(t.revenue)
+        - COALESCE(SUM(f.fuel_cost), 0)
+        - COALESCE(SUM(m.maint_cost), 0)         AS net_profit
+FROM trips t
+LEFT JOIN (
+    SELECT trip_id, SUM(total_cost) AS fuel_cost
+    FROM fuel_logs WHERE trip_id IS NOT NULL
+    GROUP BY trip_id
+) f ON f.trip_id = t.id
+LEFT JOIN (
+    SELECT vehicle_id, DATE_TRUNC('month', completion_date) AS month, SUM(cost) AS maint_cost
+    FROM maintenance_logs WHERE status = 'completed'
+    GROUP BY vehicle_id, DATE_TRUNC('month', completion_date)
+) m ON m.vehicle_id = t.vehicle_id
+   AND m.month = DATE_TRUNC('month', t.actual_arrival)
+WHERE t.status = 'delivered' AND t.actual_arrival IS NOT NULL
+GROUP BY DATE_TRUNC('month', t.actual_arrival)
+ORDER BY month DESC;
+
+
+-- 5. Drop the old tables -----------------------------------
+
+DROP TABLE expenses_unpartitioned;
+DROP TABLE fuel_logs_unpartitioned;
+
+COMMIT;
+
+ANALYZE expenses;
+ANALYZE fuel_logs;
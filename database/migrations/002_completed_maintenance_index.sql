@@ -0,0 +1,8 @@
+-- ============================================================
+-- Migration 002: index completed maintenance by completion date
+-- ============================================================
+-- Reported missing by database/plan_check.py for the monthly financial
+-- summary (status = 'completed' AND completion_date >= ...).
+
+CREATE INDEX IF NOT EXISTS idx_maintenance_completed
+    ON maintenance_logs(completion_date) WHERE status = 'completed';
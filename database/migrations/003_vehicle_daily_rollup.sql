@@ -0,0 +1,250 @@
+-- ============================================================
+-- Migration 003: per-vehicle daily rollup
+-- ============================================================
+-- Creates vehicle_daily_rollup, its maintenance triggers and helper
+-- functions (same definitions as schema.sql), then backfills it from the
+-- raw tables. Safe to run on a live database: the backfill and the trigger
+-- creation happen in one transaction, so no event is missed or counted twice.
+
+BEGIN;
+
+CREATE TABLE vehicle_daily_rollup (
+    vehicle_id                  INTEGER         NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
+    day                         DATE            NOT NULL,
+    trips_delivered             INTEGER         NOT NULL DEFAULT 0,
+    distance_km                 DECIMAL(14,2)   NOT NULL DEFAULT 0,
+    revenue                     DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    fuel_liters                 DECIMAL(14,2)   NOT NULL DEFAULT 0,
+    fuel_cost                   DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    maintenance_cost            DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    expense_fuel                DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    expense_toll                DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    expense_parking             DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    expense_maintenance         DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    expense_fine                DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    expense_loading_unloading   DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    expense_misc                DECIMAL(16,2)   NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (vehicle_id, day)
+);
+
+CREATE INDEX idx_rollup_day ON vehicle_daily_rollup(day);
+
+-- Add (or with negative values, remove) one event's contribution
+CREATE OR REPLACE FUNCTION fn_rollup_apply(
+    p_vehicle_id    INTEGER,
+    p_day           DATE,
+    p_trips         INTEGER      DEFAULT 0,
+    p_distance      NUMERIC      DEFAULT 0,
+    p_revenue       NUMERIC      DEFAULT 0,
+    p_fuel_liters   NUMERIC      DEFAULT 0,
+    p_fuel_cost     NUMERIC      DEFAULT 0,
+    p_maintenance   NUMERIC      DEFAULT 0,
+    p_expense_type  expense_type DEFAULT NULL,
+    p_expense       NUMERIC      DEFAULT 0
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO vehicle_daily_rollup AS r (
+        vehicle_id, day, trips_delivered, distance_km, revenue, fuel_liters, fuel_cost,
+        maintenance_cost, expense_fuel, expense_toll, expense_parking, expense_maintenance,
+        expense_fine, expense_loading_unloading, expense_misc
+    )
+    VALUES (
+        p_vehicle_id, p_day, p_trips, p_distance, p_revenue, p_fuel_liters, p_fuel_cost,
+        p_maintenance,
+        CASE WHEN p_expense_type = 'fuel'              THEN p_expense ELSE 0 END,
+        CASE WHEN p_expense_type = 'toll'              THEN p_expense ELSE 0 END,
+        CASE WHEN p_expense_type = 'parking'           THEN p_expense ELSE 0 END,
+        CASE WHEN p_expense_type = 'maintenance'       THEN p_expense ELSE 0 END,
+        CASE WHEN p_expense_type = 'fine'              THEN p_expense ELSE 0 END,
+        CASE WHEN p_expense_type = 'loading_unloading' THEN p_expense ELSE 0 END,
+        CASE WHEN p_expense_type = 'misc'              THEN p_expense ELSE 0 END
+    )
+    ON CONFLICT (vehicle_id, day) DO UPDATE SET
+        trips_delivered           = r.trips_delivered           + EXCLUDED.trips_delivered,
+        distance_km               = r.distance_km               + EXCLUDED.distance_km,
+        revenue                   = r.revenue                   + EXCLUDED.revenue,
+        fuel_liters               = r.fuel_liters               + EXCLUDED.fuel_liters,
+        fuel_cost                 = r.fuel_cost                 + EXCLUDED.fuel_cost,
+        maintenance_cost          = r.maintenance_cost          + EXCLUDED.maintenance_cost,
+        expense_fuel              = r.expense_fuel              + EXCLUDED.expense_fuel,
+        expense_toll              = r.expense_toll              + EXCLUDED.expense_toll,
+        expense_parking           = r.expense_parking           + EXCLUDED.expense_parking,
+        expense_maintenance       = r.expense_maintenance       + EXCLUDED.expense_maintenance,
+        expense_fine              = r.expense_fine              + EXCLUDED.expense_fine,
+        expense_loading_unloading = r.expense_loading_unloading + EXCLUDED.expense_loading_unloading,
+        expense_misc              = r.expense_misc              + EXCLUDED.expense_misc;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_rollup_trips()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Most trip updates (route edits, start) do not touch the rollup
+    IF TG_OP = 'UPDATE'
+       AND (OLD.status, OLD.vehicle_id, OLD.actual_arrival, OLD.scheduled_departure,
+            OLD.distance_km, OLD.revenue)
+           IS NOT DISTINCT FROM
+           (NEW.status, NEW.vehicle_id, NEW.actual_arrival, NEW.scheduled_departure,
+            NEW.distance_km, NEW.revenue)
+    THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'delivered' THEN
+        PERFORM fn_rollup_apply(OLD.vehicle_id,
+            COALESCE(OLD.actual_arrival, OLD.scheduled_departure)::DATE,
+            p_trips => -1, p_distance => -COALESCE(OLD.distance_km, 0), p_revenue => -OLD.revenue);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'delivered' THEN
+        PERFORM fn_rollup_apply(NEW.vehicle_id,
+            COALESCE(NEW.actual_arrival, NEW.scheduled_departure)::DATE,
+            p_trips => 1, p_distance => COALESCE(NEW.distance_km, 0), p_revenue => NEW.revenue);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_rollup_trips
+    AFTER INSERT OR UPDATE OR DELETE ON trips
+    FOR EACH ROW EXECUTE FUNCTION fn_rollup_trips();
+
+CREATE OR REPLACE FUNCTION fn_rollup_fuel_logs()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM fn_rollup_apply(OLD.vehicle_id, OLD.fuel_date,
+            p_fuel_liters => -OLD.liters, p_fuel_cost => -OLD.total_cost);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM fn_rollup_apply(NEW.vehicle_id, NEW.fuel_date,
+            p_fuel_liters => NEW.liters, p_fuel_cost => NEW.total_cost);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_rollup_fuel_logs
+    AFTER INSERT OR UPDATE OR DELETE ON fuel_logs
+    FOR EACH ROW EXECUTE FUNCTION fn_rollup_fuel_logs();
+
+CREATE OR REPLACE FUNCTION fn_rollup_maintenance()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'completed' AND OLD.completion_date IS NOT NULL THEN
+        PERFORM fn_rollup_apply(OLD.vehicle_id, OLD.completion_date, p_maintenance => -OLD.cost);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'completed' AND NEW.completion_date IS NOT NULL THEN
+        PERFORM fn_rollup_apply(NEW.vehicle_id, NEW.completion_date, p_maintenance => NEW.cost);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_rollup_maintenance
+    AFTER INSERT OR UPDATE OR DELETE ON maintenance_logs
+    FOR EACH ROW EXECUTE FUNCTION fn_rollup_maintenance();
+
+CREATE OR REPLACE FUNCTION fn_rollup_expenses()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM fn_rollup_apply(OLD.vehicle_id, OLD.expense_date,
+            p_expense_type => OLD.expense_type, p_expense => -OLD.amount);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM fn_rollup_apply(NEW.vehicle_id, NEW.expense_date,
+            p_expense_type => NEW.expense_type, p_expense => NEW.amount);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_rollup_expenses
+    AFTER INSERT OR UPDATE OR DELETE ON expenses
+    FOR EACH ROW EXECUTE FUNCTION fn_rollup_expenses();
+
+-- Recompute [p_from, p_to] from the raw tables; NULL bounds = all time.
+-- Returns the number of rollup rows written.
+CREATE OR REPLACE FUNCTION fn_rollup_rebuild(p_from DATE DEFAULT NULL, p_to DATE DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    DELETE FROM vehicle_daily_rollup
+    WHERE (p_from IS NULL OR day >= p_from) AND (p_to IS NULL OR day <= p_to);
+
+    INSERT INTO vehicle_daily_rollup (
+        vehicle_id, day, trips_delivered, distance_km, revenue, fuel_liters, fuel_cost,
+        maintenance_cost, expense_fuel, expense_toll, expense_parking, expense_maintenance,
+        expense_fine, expense_loading_unloading, expense_misc
+    )
+    SELECT vehicle_id, day,
+           SUM(trips), SUM(distance), SUM(revenue), SUM(liters), SUM(fuel_cost), SUM(maintenance),
+           COALESCE(SUM(expense) FILTER (WHERE expense_type = 'fuel'), 0),
+           COALESCE(SUM(expense) FILTER (WHERE expense_type = 'toll'), 0),
+           COALESCE(SUM(expense) FILTER (WHERE expense_type = 'parking'), 0),
+           COALESCE(SUM(expense) FILTER (WHERE expense_type = 'maintenance'), 0),
+           COALESCE(SUM(expense) FILTER (WHERE expense_type = 'fine'), 0),
+           COALESCE(SUM(expense) FILTER (WHERE expense_type = 'loading_unloading'), 0),
+           COALESCE(SUM(expense) FILTER (WHERE expense_type = 'misc'), 0)
+    FROM (
+        SELECT vehicle_id, COALESCE(actual_arrival, scheduled_departure)::DATE AS day,
+               1 AS trips, COALESCE(distance_km, 0) AS distance, revenue,
+               0 AS liters, 0 AS fuel_cost, 0 AS maintenance,
+               NULL::expense_type AS expense_type, 0 AS expense
+        FROM trips WHERE status = 'delivered'
+        UNION ALL
+        -- Bounds repeated per source so partitions outside the range are pruned
+        SELECT vehicle_id, fuel_date, 0, 0, 0, liters, total_cost, 0, NULL, 0
+        FROM fuel_logs
+        WHERE (p_from IS NULL OR fuel_date >= p_from) AND (p_to IS NULL OR fuel_date <= p_to)
+        UNION ALL
+        SELECT vehicle_id, completion_date, 0, 0, 0, 0, 0, cost, NULL, 0
+        FROM maintenance_logs WHERE status = 'completed' AND completion_date IS NOT NULL
+        UNION ALL
+        SELECT vehicle_id, expense_date, 0, 0, 0, 0, 0, 0, expense_type, amount
+        FROM expenses
+        WHERE (p_from IS NULL OR expense_date >= p_from) AND (p_to IS NULL OR expense_date <= p_to)
+    ) events
+    WHERE (p_from IS NULL OR day >= p_from) AND (p_to IS NULL OR day <= p_to)
+    GROUP BY vehicle_id, day;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Bucketed series for charts: p_bucket is 'day', 'week' or 'month'
+CREATE OR REPLACE FUNCTION fn_rollup_series(
+    p_from       DATE,
+    p_to         DATE,
+    p_vehicle_id INTEGER DEFAULT NULL,
+    p_bucket     TEXT    DEFAULT 'day'
+)
+RETURNS TABLE (
+    period DATE, trips_delivered BIGINT, distance_km NUMERIC, revenue NUMERIC,
+    fuel_liters NUMERIC, fuel_cost NUMERIC, maintenance_cost NUMERIC,
+    expense_fuel NUMERIC, expense_toll NUMERIC, expense_parking NUMERIC,
+    expense_maintenance NUMERIC, expense_fine NUMERIC,
+    expense_loading_unloading NUMERIC, expense_misc NUMERIC
+) AS $$
+    SELECT DATE_TRUNC(p_bucket, r.day)::DATE,
+           SUM(r.trips_delivered), SUM(r.distance_km), SUM(r.revenue),
+           SUM(r.fuel_liters), SUM(r.fuel_cost), SUM(r.maintenance_cost),
+           SUM(r.expense_fuel), SUM(r.expense_toll), SUM(r.expense_parking),
+           SUM(r.expense_maintenance), SUM(r.expense_fine),
+           SUM(r.expense_loading_unloading), SUM(r.expense_misc)
+    FROM vehicle_daily_rollup r
+    WHERE r.day >= p_from AND r.day <= p_to
+      AND (p_vehicle_id IS NULL OR r.vehicle_id = p_vehicle_id)
+    GROUP BY 1
+    ORDER BY 1;
+$$ LANGUAGE sql STABLE;
+
+SELECT fn_rollup_rebuild();
+
+COMMIT;
+
+ANALYZE vehicle_daily_rollup;
@@ -0,0 +1,165 @@
+-- ============================================================
+-- Migration 004: incrementally maintained driver stats
+-- ============================================================
+-- Creates driver_stats and its triggers (same definitions as schema.sql),
+-- backfills the counters and points vw_driver_performance at them. Creating
+-- the triggers locks trips / driver_complaints against writes until COMMIT,
+-- so the backfill cannot miss or double-count a change.
+
+BEGIN;
+
+CREATE TABLE driver_stats (
+    driver_id           INTEGER         PRIMARY KEY REFERENCES drivers(id) ON DELETE CASCADE,
+    total_trips         INTEGER         NOT NULL DEFAULT 0,
+    completed_trips     INTEGER         NOT NULL DEFAULT 0,
+    cancelled_trips     INTEGER         NOT NULL DEFAULT 0,
+    total_complaints    INTEGER         NOT NULL DEFAULT 0,
+    completion_rate     DECIMAL(5,2)    NOT NULL GENERATED ALWAYS AS (
+        CASE WHEN total_trips > 0
+             THEN ROUND(completed_trips * 100.0 / total_trips, 2)
+             ELSE 100 END
+    ) STORED
+);
+
+CREATE INDEX idx_driver_stats_completion ON driver_stats(completion_rate DESC);
+CREATE INDEX idx_drivers_safety_score    ON drivers(safety_score DESC);
+
+CREATE OR REPLACE FUNCTION fn_driver_stats_apply(
+    p_driver_id  INTEGER,
+    p_total      INTEGER DEFAULT 0,
+    p_completed  INTEGER DEFAULT 0,
+    p_cancelled  INTEGER DEFAULT 0,
+    p_complaints INTEGER DEFAULT 0
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO driver_stats AS s (driver_id, total_trips, completed_trips, cancelled_trips, total_complaints)
+    VALUES (p_driver_id, p_total, p_completed, p_cancelled, p_complaints)
+    ON CONFLICT (driver_id) DO UPDATE SET
+        total_trips      = s.total_trips      + EXCLUDED.total_trips,
+        completed_trips  = s.completed_trips  + EXCLUDED.completed_trips,
+        cancelled_trips  = s.cancelled_trips  + EXCLUDED.cancelled_trips,
+        total_complaints = s.total_complaints + EXCLUDED.total_complaints;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Every driver gets a zeroed row, so the view never needs COALESCE-heavy joins
+CREATE OR REPLACE FUNCTION fn_driver_stats_init()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO driver_stats (driver_id) VALUES (NEW.id) ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_driver_stats_init
+    AFTER INSERT ON drivers
+    FOR EACH ROW EXECUTE FUNCTION fn_driver_stats_init();
+
+CREATE OR REPLACE FUNCTION fn_driver_stats_trips()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.status = NEW.status AND OLD.driver_id = NEW.driver_id THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM fn_driver_stats_apply(OLD.driver_id,
+            p_total     => -1,
+            p_completed => -(OLD.status = 'delivered')::INTEGER,
+            p_cancelled => -(OLD.status = 'cancelled')::INTEGER);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM fn_driver_stats_apply(NEW.driver_id,
+            p_total     => 1,
+            p_completed => (NEW.status = 'delivered')::INTEGER,
+            p_cancelled => (NEW.status = 'cancelled')::INTEGER);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_driver_stats_trips
+    AFTER INSERT OR UPDATE OF status, driver_id OR DELETE ON trips
+    FOR EACH ROW EXECUTE FUNCTION fn_driver_stats_trips();
+
+CREATE OR REPLACE FUNCTION fn_driver_stats_complaints()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.driver_id = NEW.driver_id THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM fn_driver_stats_apply(OLD.driver_id, p_complaints => -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM fn_driver_stats_apply(NEW.driver_id, p_complaints => 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_driver_stats_complaints
+    AFTER INSERT OR UPDATE OF driver_id OR DELETE ON driver_complaints
+    FOR EACH ROW EXECUTE FUNCTION fn_driver_stats_complaints();
+
+-- Recount every driver from trips and driver_complaints; returns rows written
+CREATE OR REPLACE FUNCTION fn_driver_stats_rebuild()
+RETURNS INTEGER AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    INSERT INTO driver_stats (driver_id, total_trips, completed_trips, cancelled_trips, total_complaints)
+    SELECT d.id,
+           COALESCE(t.total, 0), COALESCE(t.delivered, 0), COALESCE(t.cancelled, 0),
+           COALESCE(c.cnt, 0)
+    FROM drivers d
+    LEFT JOIN (
+        SELECT driver_id,
+               COUNT(*)                                       AS total,
+               COUNT(*) FILTER (WHERE status = 'delivered')   AS delivered,
+               COUNT(*) FILTER (WHERE status = 'cancelled')   AS cancelled
+        FROM trips GROUP BY driver_id
+    ) t ON t.driver_id = d.id
+    LEFT JOIN (
+        SELECT driver_id, COUNT(*) AS cnt
+        FROM driver_complaints GROUP BY driver_id
+    ) c ON c.driver_id = d.id
+    ON CONFLICT (driver_id) DO UPDATE SET
+        total_trips      = EXCLUDED.total_trips,
+        completed_trips  = EXCLUDED.completed_trips,
+        cancelled_trips  = EXCLUDED.cancelled_trips,
+        total_complaints = EXCLUDED.total_complaints;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT fn_driver_stats_rebuild();
+
+DROP VIEW IF EXISTS vw_driver_performance;
+
+CREATE VIEW vw_driver_performance AS
+SELECT
+    d.id                    AS driver_id,
+    u.first_name || ' ' || u.last_name AS driver_name,
+    d.license_number,
+    d.license_expiry,
+    d.license_expiry < CURRENT_DATE     AS license_expired,
+    d.safety_score,
+    d.duty_status,
+    d.duty_status NOT IN ('on_duty', 'suspended') AS is_available,
+    s.total_trips,
+    s.completed_trips,
+    s.cancelled_trips,
+    s.completion_rate,
+    s.total_complaints
+FROM drivers d
+JOIN users u ON u.id = d.user_id
+JOIN driver_stats s ON s.driver_id = d.id;
+
+COMMIT;
+
+ANALYZE driver_stats;
@@ -0,0 +1,208 @@
+-- ============================================================
+-- Migration 005: predicted maintenance due dates
+-- ============================================================
+-- Creates service_intervals (with the default intervals), maintenance_due,
+-- the refresh function and its triggers (same definitions as schema.sql),
+-- then computes every vehicle. Creating the triggers locks fuel_logs,
+-- maintenance_logs and vehicles against writes until COMMIT, so no change
+-- lands between the backfill and the first trigger.
+
+BEGIN;
+
+CREATE TABLE service_intervals (
+    service_type        service_type    PRIMARY KEY,
+    interval_km         DECIMAL(10,2)   CHECK (interval_km > 0),
+    interval_days       INTEGER         CHECK (interval_days > 0),
+
+    CONSTRAINT chk_interval_set CHECK (interval_km IS NOT NULL OR interval_days IS NOT NULL)
+);
+
+-- Repairs (engine_repair, electrical, body_work, other) are not scheduled
+INSERT INTO service_intervals (service_type, interval_km, interval_days) VALUES
+    ('oil_change',          10000,  180),
+    ('tire_replacement',    50000,  730),
+    ('brake_service',       30000,  365),
+    ('general_inspection',  NULL,   365);
+
+CREATE TABLE maintenance_due (
+    vehicle_id          INTEGER         NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
+    service_type        service_type    NOT NULL,
+    last_service_date   DATE,
+    last_service_km     DECIMAL(12,2)   NOT NULL,
+    current_km          DECIMAL(12,2)   NOT NULL,
+    km_per_day          DECIMAL(10,2),
+    due_km              DECIMAL(12,2),
+    km_remaining        DECIMAL(12,2)   GENERATED ALWAYS AS (due_km - current_km) STORED,
+    due_date            DATE,
+    refreshed_at        TIMESTAMPTZ     NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (vehicle_id, service_type)
+);
+
+CREATE INDEX idx_maintenance_due_date ON maintenance_due(due_date);
+CREATE INDEX idx_maintenance_due_km   ON maintenance_due(km_remaining);
+-- Usage rate and last-service odometer lookups
+CREATE INDEX idx_fuel_vehicle_date    ON fuel_logs(vehicle_id, fuel_date);
+
+CREATE OR REPLACE FUNCTION fn_maintenance_due_refresh(p_vehicle_ids INTEGER[] DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    v_ids  INTEGER[] := COALESCE(p_vehicle_ids, ARRAY(SELECT id FROM vehicles));
+    v_rows INTEGER;
+BEGIN
+    DELETE FROM maintenance_due WHERE vehicle_id = ANY(v_ids);
+
+    INSERT INTO maintenance_due (vehicle_id, service_type, last_service_date, last_service_km,
+                                 current_km, km_per_day, due_km, due_date)
+    WITH usage AS (
+        SELECT vehicle_id,
+               MAX(odometer_at_fill) AS last_km,
+               CASE WHEN MAX(fuel_date) > MIN(fuel_date)
+                    THEN (MAX(odometer_at_fill) - MIN(odometer_at_fill)) / (MAX(fuel_date) - MIN(fuel_date))
+               END AS km_per_day
+        FROM fuel_logs
+        WHERE fuel_date >= CURRENT_DATE - 90 AND vehicle_id = ANY(v_ids)
+        GROUP BY vehicle_id
+    ),
+    last_service AS (
+        SELECT DISTINCT ON (vehicle_id, service_type) vehicle_id, service_type, completion_date
+        FROM maintenance_logs
+        WHERE status = 'completed' AND completion_date IS NOT NULL AND vehicle_id = ANY(v_ids)
+        ORDER BY vehicle_id, service_type, completion_date DESC
+    ),
+    state AS (
+        SELECT v.id AS vehicle_id, si.service_type, si.interval_km, si.interval_days,
+               ls.completion_date AS last_service_date,
+               CASE WHEN ls.completion_date IS NULL THEN 0
+                    ELSE COALESCE(odo.km, odo_after.km, v.current_odometer_km)
+               END AS last_service_km,
+               GREATEST(v.current_odometer_km, COALESCE(u.last_km, 0)) AS current_km,
+               u.km_per_day
+        FROM vehicles v
+        CROSS JOIN service_intervals si
+        LEFT JOIN usage u ON u.vehicle_id = v.id
+        LEFT JOIN last_service ls ON ls.vehicle_id = v.id AND ls.service_type = si.service_type
+        -- Baseline: last fill on or before the service, else the first fill
+        -- after it, else (no fills yet) the current odometer
+        LEFT JOIN LATERAL (
+            SELECT f.odometer_at_fill AS km
+            FROM fuel_logs f
+            WHERE f.vehicle_id = v.id AND f.fuel_date <= ls.completion_date
+            ORDER BY f.fuel_date DESC, f.odometer_at_fill DESC
+            LIMIT 1
+        ) odo ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT f.odometer_at_fill AS km
+            FROM fuel_logs f
+            WHERE odo.km IS NULL AND f.vehicle_id = v.id AND f.fuel_date > ls.completion_date
+            ORDER BY f.fuel_date, f.odometer_at_fill
+            LIMIT 1
+        ) odo_after ON TRUE
+        WHERE v.id = ANY(v_ids) AND v.status <> 'retired'
+    )
+    SELECT s.vehicle_id, s.service_type, s.last_service_date, s.last_service_km,
+           s.current_km, ROUND(s.km_per_day, 2), d.due_km,
+           LEAST(  -- NULLs ignored
+               CASE WHEN s.interval_days IS NOT NULL
+                    THEN COALESCE(s.last_service_date + s.interval_days, CURRENT_DATE) END,
+               CASE WHEN d.due_km <= s.current_km THEN CURRENT_DATE
+                    WHEN s.km_per_day > 0
+                    THEN CURRENT_DATE + LEAST(CEIL((d.due_km - s.current_km) / s.km_per_day), 36500)::INTEGER
+               END
+           )
+    FROM state s
+    CROSS JOIN LATERAL (SELECT s.last_service_km + s.interval_km AS due_km) d;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Once per statement, after the row triggers (odometer sync) have run
+-- A trigger with transition tables handles one event, so inserts, updates
+-- and deletes each get their own; each branch reads only the tables its
+-- event provides.
+CREATE OR REPLACE FUNCTION fn_maintenance_due_fuel_logs()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM fn_maintenance_due_refresh(ARRAY(SELECT DISTINCT vehicle_id FROM new_fuel_logs));
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Old and new vehicle of every fill whose vehicle, date or odometer changed
+        PERFORM fn_maintenance_due_refresh(ARRAY(
+            SELECT DISTINCT unnest(ARRAY[o.vehicle_id, n.vehicle_id])
+            FROM old_fuel_logs o
+            JOIN new_fuel_logs n ON n.id = o.id
+            WHERE (o.vehicle_id, o.fuel_date, o.odometer_at_fill)
+                  IS DISTINCT FROM (n.vehicle_id, n.fuel_date, n.odometer_at_fill)
+        ));
+    ELSE
+        PERFORM fn_maintenance_due_refresh(ARRAY(SELECT DISTINCT vehicle_id FROM old_fuel_logs));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_maintenance_due_fuel_logs
+    AFTER INSERT ON fuel_logs
+    REFERENCING NEW TABLE AS new_fuel_logs
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_maintenance_due_fuel_logs();
+
+CREATE TRIGGER trg_maintenance_due_fuel_logs_update
+    AFTER UPDATE ON fuel_logs
+    REFERENCING OLD TABLE AS old_fuel_logs NEW TABLE AS new_fuel_logs
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_maintenance_due_fuel_logs();
+
+CREATE TRIGGER trg_maintenance_due_fuel_logs_delete
+    AFTER DELETE ON fuel_logs
+    REFERENCING OLD TABLE AS old_fuel_logs
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_maintenance_due_fuel_logs();
+
+CREATE OR REPLACE FUNCTION fn_maintenance_due_logs()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF (TG_OP <> 'DELETE' AND NEW.status = 'completed')
+       OR (TG_OP <> 'INSERT' AND OLD.status = 'completed') THEN
+        -- Both vehicles when a log is moved; NULL entries match nothing
+        PERFORM fn_maintenance_due_refresh(ARRAY[OLD.vehicle_id, NEW.vehicle_id]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_maintenance_due_logs
+    AFTER INSERT OR UPDATE OF status, completion_date, service_type, vehicle_id OR DELETE
+    ON maintenance_logs
+    FOR EACH ROW EXECUTE FUNCTION fn_maintenance_due_logs();
+
+CREATE OR REPLACE FUNCTION fn_maintenance_due_vehicles()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' OR (OLD.status = 'retired') <> (NEW.status = 'retired') THEN
+        PERFORM fn_maintenance_due_refresh(ARRAY[NEW.id]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_maintenance_due_vehicles
+    AFTER INSERT OR UPDATE OF status ON vehicles
+    FOR EACH ROW EXECUTE FUNCTION fn_maintenance_due_vehicles();
+
+CREATE OR REPLACE FUNCTION fn_maintenance_due_intervals()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM fn_maintenance_due_refresh();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_maintenance_due_intervals
+    AFTER INSERT OR UPDATE OR DELETE ON service_intervals
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_maintenance_due_intervals();
+
+SELECT fn_maintenance_due_refresh();
+
+COMMIT;
+
+ANALYZE maintenance_due;
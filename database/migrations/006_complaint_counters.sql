@@ -0,0 +1,168 @@
+-- ============================================================
+-- Migration 006: per-severity complaint counters in driver_stats
+-- ============================================================
+-- Adds open_complaints and complaints_<severity> to driver_stats, moves
+-- them in the complaint trigger (now also on severity and status changes),
+-- recounts every driver and appends the columns to vw_driver_performance.
+-- Replacing the trigger locks driver_complaints against writes until
+-- COMMIT, so the recount cannot miss a change. Requires migration 004.
+
+BEGIN;
+
+ALTER TABLE driver_stats
+    ADD COLUMN open_complaints     INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN complaints_low      INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN complaints_medium   INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN complaints_high     INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN complaints_critical INTEGER NOT NULL DEFAULT 0;
+
+-- The signature grows; drop the old one so calls do not become ambiguous
+DROP FUNCTION fn_driver_stats_apply(INTEGER, INTEGER, INTEGER, INTEGER, INTEGER);
+DROP TRIGGER trg_driver_stats_complaints ON driver_complaints;
+
+CREATE OR REPLACE FUNCTION fn_driver_stats_apply(
+    p_driver_id  INTEGER,
+    p_total      INTEGER DEFAULT 0,
+    p_completed  INTEGER DEFAULT 0,
+    p_cancelled  INTEGER DEFAULT 0,
+    p_complaints INTEGER DEFAULT 0,
+    p_open       INTEGER DEFAULT 0,
+    p_low        INTEGER DEFAULT 0,
+    p_medium     INTEGER DEFAULT 0,
+    p_high       INTEGER DEFAULT 0,
+    p_critical   INTEGER DEFAULT 0
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO driver_stats AS s (driver_id, total_trips, completed_trips, cancelled_trips, total_complaints,
+                                   open_complaints, complaints_low, complaints_medium, complaints_high,
+                                   complaints_critical)
+    VALUES (p_driver_id, p_total, p_completed, p_cancelled, p_complaints,
+            p_open, p_low, p_medium, p_high, p_critical)
+    ON CONFLICT (driver_id) DO UPDATE SET
+        total_trips         = s.total_trips         + EXCLUDED.total_trips,
+        completed_trips     = s.completed_trips     + EXCLUDED.completed_trips,
+        cancelled_trips     = s.cancelled_trips     + EXCLUDED.cancelled_trips,
+        total_complaints    = s.total_complaints    + EXCLUDED.total_complaints,
+        open_complaints     = s.open_complaints     + EXCLUDED.open_complaints,
+        complaints_low      = s.complaints_low      + EXCLUDED.complaints_low,
+        complaints_medium   = s.complaints_medium   + EXCLUDED.complaints_medium,
+        complaints_high     = s.complaints_high     + EXCLUDED.complaints_high,
+        complaints_critical = s.complaints_critical + EXCLUDED.complaints_critical;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Add (p_sign = 1) or remove (-1) one complaint's contribution
+CREATE OR REPLACE FUNCTION fn_driver_stats_apply_complaint(c driver_complaints, p_sign INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    v_counted INTEGER := p_sign * (c.status <> 'dismissed')::INTEGER;
+BEGIN
+    PERFORM fn_driver_stats_apply(c.driver_id,
+        p_complaints => p_sign,
+        p_open       => p_sign * (c.status IN ('open', 'investigating'))::INTEGER,
+        p_low        => v_counted * (c.severity = 'low')::INTEGER,
+        p_medium     => v_counted * (c.severity = 'medium')::INTEGER,
+        p_high       => v_counted * (c.severity = 'high')::INTEGER,
+        p_critical   => v_counted * (c.severity = 'critical')::INTEGER);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_driver_stats_complaints()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.driver_id = NEW.driver_id
+       AND OLD.severity = NEW.severity AND OLD.status = NEW.status THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM fn_driver_stats_apply_complaint(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM fn_driver_stats_apply_complaint(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_driver_stats_complaints
+    AFTER INSERT OR UPDATE OF driver_id, severity, status OR DELETE ON driver_complaints
+    FOR EACH ROW EXECUTE FUNCTION fn_driver_stats_complaints();
+
+CREATE OR REPLACE FUNCTION fn_driver_stats_rebuild()
+RETURNS INTEGER AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    INSERT INTO driver_stats (driver_id, total_trips, completed_trips, cancelled_trips, total_complaints,
+                              open_complaints, complaints_low, complaints_medium, complaints_high,
+                              complaints_critical)
+    SELECT d.id,
+           COALESCE(t.total, 0), COALESCE(t.delivered, 0), COALESCE(t.cancelled, 0),
+           COALESCE(c.cnt, 0), COALESCE(c.open, 0),
+           COALESCE(c.low, 0), COALESCE(c.medium, 0), COALESCE(c.high, 0), COALESCE(c.critical, 0)
+    FROM drivers d
+    LEFT JOIN (
+        SELECT driver_id,
+               COUNT(*)                                       AS total,
+               COUNT(*) FILTER (WHERE status = 'delivered')   AS delivered,
+               COUNT(*) FILTER (WHERE status = 'cancelled')   AS cancelled
+        FROM trips GROUP BY driver_id
+    ) t ON t.driver_id = d.id
+    LEFT JOIN (
+        SELECT driver_id,
+               COUNT(*)                                                             AS cnt,
+               COUNT(*) FILTER (WHERE status IN ('open', 'investigating'))          AS open,
+               COUNT(*) FILTER (WHERE status <> 'dismissed' AND severity = 'low')      AS low,
+               COUNT(*) FILTER (WHERE status <> 'dismissed' AND severity = 'medium')   AS medium,
+               COUNT(*) FILTER (WHERE status <> 'dismissed' AND severity = 'high')     AS high,
+               COUNT(*) FILTER (WHERE status <> 'dismissed' AND severity = 'critical') AS critical
+        FROM driver_complaints GROUP BY driver_id
+    ) c ON c.driver_id = d.id
+    ON CONFLICT (driver_id) DO UPDATE SET
+        total_trips         = EXCLUDED.total_trips,
+        completed_trips     = EXCLUDED.completed_trips,
+        cancelled_trips     = EXCLUDED.cancelled_trips,
+        total_complaints    = EXCLUDED.total_complaints,
+        open_complaints     = EXCLUDED.open_complaints,
+        complaints_low      = EXCLUDED.complaints_low,
+        complaints_medium   = EXCLUDED.complaints_medium,
+        complaints_high     = EXCLUDED.complaints_high,
+        complaints_critical = EXCLUDED.complaints_critical;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT fn_driver_stats_rebuild();
+
+-- New columns are appended, so the view can be replaced in place
+CREATE OR REPLACE VIEW vw_driver_performance AS
+SELECT
+    d.id                    AS driver_id,
+    u.first_name || ' ' || u.last_name AS driver_name,
+    d.license_number,
+    d.license_expiry,
+    d.license_expiry < CURRENT_DATE     AS license_expired,
+    d.safety_score,
+    d.duty_status,
+    d.duty_status NOT IN ('on_duty', 'suspended') AS is_available,
+    s.total_trips,
+    s.completed_trips,
+    s.cancelled_trips,
+    s.completion_rate,
+    s.total_complaints,
+    s.open_complaints,
+    s.complaints_low,
+    s.complaints_medium,
+    s.complaints_high,
+    s.complaints_critical
+FROM drivers d
+JOIN users u ON u.id = d.user_id
+JOIN driver_stats s ON s.driver_id = d.id;
+
+COMMIT;
+
+ANALYZE driver_stats;
@@ -0,0 +1,226 @@
+-- ============================================================
+-- Migration 007: search and fuel anomaly functions
+-- ============================================================
+-- For databases created before the search functions were added to
+-- schema.sql. Enables pg_trgm, builds the trigram GIN indexes and creates
+-- fn_like_pattern, the fn_search_* functions and fn_fuel_anomalies (same
+-- definitions as schema.sql). Until this runs the API falls back to
+-- PostgREST ILIKE filters and computes anomalies in Python.
+--
+-- Run with:  psql "$DATABASE_URL" -f database/migrations/007_search_functions.sql
+-- Building the indexes locks each table against writes until COMMIT.
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_trips_origin_trgm       ON trips    USING GIN (origin gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_trips_destination_trgm  ON trips    USING GIN (destination gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_vehicles_plate_trgm     ON vehicles USING GIN (license_plate gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_vehicles_make_trgm      ON vehicles USING GIN (make gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_vehicles_model_trgm     ON vehicles USING GIN (model gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_expenses_desc_trgm      ON expenses USING GIN (description gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_full_name_trgm    ON users    USING GIN ((first_name || ' ' || last_name) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_email_trgm        ON users    USING GIN (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_drivers_license_trgm    ON drivers  USING GIN (license_number gin_trgm_ops);
+
+-- Escape LIKE metacharacters so user input is matched literally
+CREATE OR REPLACE FUNCTION fn_like_pattern(p_term TEXT)
+RETURNS TEXT AS $$
+    SELECT '%' || replace(replace(replace(p_term, '\', '\\'), '%', '\%'), '_', '\_') || '%';
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION fn_search_trips(
+    p_query      TEXT,
+    p_status     trip_status DEFAULT NULL,
+    p_vehicle_id INTEGER     DEFAULT NULL,
+    p_driver_id  INTEGER     DEFAULT NULL,
+    p_limit      INTEGER     DEFAULT 50,
+    p_offset     INTEGER     DEFAULT 0
+)
+RETURNS TABLE (
+    id INTEGER, vehicle_id INTEGER, driver_id INTEGER, cargo_weight_kg DECIMAL,
+    origin VARCHAR, destination VARCHAR, distance_km DECIMAL, revenue DECIMAL,
+    status trip_status, scheduled_departure TIMESTAMPTZ, actual_arrival TIMESTAMPTZ,
+    rank REAL, total_count BIGINT
+) AS $$
+    SELECT t.id, t.vehicle_id, t.driver_id, t.cargo_weight_kg,
+           t.origin, t.destination, t.distance_km, t.revenue,
+           t.status, t.scheduled_departure, t.actual_arrival,
+           GREATEST(similarity(t.origin, p_query), similarity(t.destination, p_query)) AS rank,
+           COUNT(*) OVER () AS total_count
+    FROM trips t
+    WHERE (t.origin ILIKE fn_like_pattern(p_query)
+           OR t.destination ILIKE fn_like_pattern(p_query)
+           OR t.origin % p_query
+           OR t.destination % p_query)
+      AND (p_status IS NULL OR t.status = p_status)
+      AND (p_vehicle_id IS NULL OR t.vehicle_id = p_vehicle_id)
+      AND (p_driver_id IS NULL OR t.driver_id = p_driver_id)
+    ORDER BY rank DESC, t.scheduled_departure DESC
+    LIMIT p_limit OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION fn_search_vehicles(
+    p_query        TEXT,
+    p_status       vehicle_status DEFAULT NULL,
+    p_vehicle_type vehicle_type   DEFAULT NULL,
+    p_limit        INTEGER        DEFAULT 50,
+    p_offset       INTEGER        DEFAULT 0
+)
+RETURNS TABLE (
+    id INTEGER, license_plate VARCHAR, make VARCHAR, model VARCHAR, year SMALLINT,
+    vehicle_type vehicle_type, fuel_type fuel_type, max_load_capacity_kg DECIMAL,
+    current_odometer_km DECIMAL, status vehicle_status,
+    rank REAL, total_count BIGINT
+) AS $$
+    SELECT v.id, v.license_plate, v.make, v.model, v.year,
+           v.vehicle_type, v.fuel_type, v.max_load_capacity_kg,
+           v.current_odometer_km, v.status,
+           GREATEST(similarity(v.license_plate, p_query) * 1.5,   -- plate hits rank first
+                    similarity(v.make, p_query),
+                    similarity(v.model, p_query))::REAL AS rank,
+           COUNT(*) OVER () AS total_count
+    FROM vehicles v
+    WHERE (v.license_plate ILIKE fn_like_pattern(p_query)
+           OR v.make ILIKE fn_like_pattern(p_query)
+           OR v.model ILIKE fn_like_pattern(p_query)
+           OR v.license_plate % p_query)
+      AND (CASE WHEN p_status IS NULL THEN v.status != 'retired' ELSE v.status = p_status END)
+      AND (p_vehicle_type IS NULL OR v.vehicle_type = p_vehicle_type)
+    ORDER BY rank DESC, v.id DESC
+    LIMIT p_limit OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION fn_search_expenses(
+    p_query        TEXT,
+    p_expense_type expense_type DEFAULT NULL,
+    p_vehicle_id   INTEGER      DEFAULT NULL,
+    p_trip_id      INTEGER      DEFAULT NULL,
+    p_date_from    DATE         DEFAULT NULL,
+    p_date_to      DATE         DEFAULT NULL,
+    p_limit        INTEGER      DEFAULT 50,
+    p_offset       INTEGER      DEFAULT 0
+)
+RETURNS TABLE (
+    id INTEGER, trip_id INTEGER, vehicle_id INTEGER, expense_type expense_type,
+    amount DECIMAL, description VARCHAR, expense_date DATE,
+    rank REAL, total_count BIGINT
+) AS $$
+    SELECT e.id, e.trip_id, e.vehicle_id, e.expense_type,
+           e.amount, e.description, e.expense_date,
+           similarity(e.description, p_query) AS rank,
+           COUNT(*) OVER () AS total_count
+    FROM expenses e
+    WHERE (e.description ILIKE fn_like_pattern(p_query) OR e.description % p_query)
+      AND (p_expense_type IS NULL OR e.expense_type = p_expense_type)
+      AND (p_vehicle_id IS NULL OR e.vehicle_id = p_vehicle_id)
+      AND (p_trip_id IS NULL OR e.trip_id = p_trip_id)
+      AND (p_date_from IS NULL OR e.expense_date >= p_date_from)
+      AND (p_date_to IS NULL OR e.expense_date <= p_date_to)
+    ORDER BY rank DESC, e.expense_date DESC
+    LIMIT p_limit OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION fn_search_drivers(
+    p_query       TEXT,
+    p_duty_status duty_status DEFAULT NULL,
+    p_limit       INTEGER     DEFAULT 50,
+    p_offset      INTEGER     DEFAULT 0
+)
+RETURNS TABLE (
+    id INTEGER, user_id INTEGER, license_number VARCHAR, license_expiry DATE,
+    safety_score DECIMAL, duty_status duty_status,
+    first_name VARCHAR, last_name VARCHAR, email VARCHAR,
+    rank REAL, total_count BIGINT
+) AS $$
+    SELECT d.id, d.user_id, d.license_number, d.license_expiry,
+           d.safety_score, d.duty_status,
+           u.first_name, u.last_name, u.email,
+           GREATEST(similarity(u.first_name || ' ' || u.last_name, p_query),
+                    similarity(u.email, p_query),
+                    similarity(d.license_number, p_query) * 1.5)::REAL AS rank,
+           COUNT(*) OVER () AS total_count
+    FROM drivers d
+    JOIN users u ON u.id = d.user_id
+    WHERE ((u.first_name || ' ' || u.last_name) ILIKE fn_like_pattern(p_query)
+           OR u.email ILIKE fn_like_pattern(p_query)
+           OR d.license_number ILIKE fn_like_pattern(p_query)
+           OR (u.first_name || ' ' || u.last_name) % p_query)
+      AND (p_duty_status IS NULL OR d.duty_status = p_duty_status)
+    ORDER BY rank DESC, d.id DESC
+    LIMIT p_limit OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION fn_fuel_anomalies(
+    p_date_from  DATE    DEFAULT NULL,
+    p_date_to    DATE    DEFAULT NULL,
+    p_vehicle_id INTEGER DEFAULT NULL,
+    p_k          NUMERIC DEFAULT 3.5
+)
+RETURNS TABLE (
+    id INTEGER, vehicle_id INTEGER, fuel_date DATE, liters DECIMAL, odometer_at_fill DECIMAL,
+    distance_km DECIMAL, km_per_liter NUMERIC, median_km_per_liter NUMERIC, mad NUMERIC,
+    anomaly TEXT
+) AS $$
+    WITH fills AS (
+        SELECT f.id, f.vehicle_id, f.fuel_date, f.liters, f.odometer_at_fill,
+               f.odometer_at_fill - LAG(f.odometer_at_fill) OVER (
+                   PARTITION BY f.vehicle_id ORDER BY f.fuel_date, f.id
+               ) AS distance_km
+        FROM fuel_logs f
+        WHERE (p_vehicle_id IS NULL OR f.vehicle_id = p_vehicle_id)
+          AND (p_date_to IS NULL OR f.fuel_date <= p_date_to)
+    ),
+    economy AS (
+        SELECT fills.*,
+               CASE WHEN distance_km >= 0 THEN distance_km / liters END AS kpl
+        FROM fills
+        WHERE distance_km IS NOT NULL
+    ),
+    centers AS (
+        SELECT e.vehicle_id, COUNT(*) AS n,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY e.kpl)::NUMERIC AS center
+        FROM economy e WHERE e.kpl IS NOT NULL
+        GROUP BY e.vehicle_id
+    ),
+    spreads AS (
+        SELECT e.vehicle_id,
+               (percentile_cont(0.5) WITHIN GROUP (ORDER BY ABS(e.kpl - c.center)))::NUMERIC * 1.4826 AS mad
+        FROM economy e JOIN centers c ON c.vehicle_id = e.vehicle_id
+        WHERE e.kpl IS NOT NULL
+        GROUP BY e.vehicle_id
+    ),
+    flagged AS (
+        SELECT e.id, e.vehicle_id, e.fuel_date, e.liters, e.odometer_at_fill, e.distance_km,
+               ROUND(e.kpl, 3) AS km_per_liter,
+               ROUND(c.center, 3) AS median_km_per_liter,
+               ROUND(s.mad, 3) AS mad,
+               CASE
+                   WHEN e.distance_km < 0 THEN 'odometer_rollback'
+                   WHEN c.n < 5 THEN NULL
+                   WHEN e.kpl < c.center - p_k * GREATEST(s.mad, c.center * 0.05) THEN 'possible_theft'
+                   WHEN e.kpl > c.center + p_k * GREATEST(s.mad, c.center * 0.05) THEN 'outlier_high'
+               END AS anomaly
+        FROM economy e
+        LEFT JOIN centers c ON c.vehicle_id = e.vehicle_id
+        LEFT JOIN spreads s ON s.vehicle_id = e.vehicle_id
+    )
+    SELECT flagged.id, flagged.vehicle_id, flagged.fuel_date, flagged.liters, flagged.odometer_at_fill,
+           flagged.distance_km, flagged.km_per_liter,
+           CASE WHEN flagged.anomaly = 'odometer_rollback' THEN NULL ELSE flagged.median_km_per_liter END,
+           CASE WHEN flagged.anomaly = 'odometer_rollback' THEN NULL ELSE flagged.mad END,
+           flagged.anomaly
+    FROM flagged
+    WHERE flagged.anomaly IS NOT NULL
+      AND (p_date_from IS NULL OR flagged.fuel_date >= p_date_from)
+    ORDER BY flagged.fuel_date DESC, flagged.id DESC;
+$$ LANGUAGE sql STABLE;
+
+COMMIT;
+
+ANALYZE trips;
+ANALYZE vehicles;
+ANALYZE expenses;
+ANALYZE users;
+ANALYZE drivers;
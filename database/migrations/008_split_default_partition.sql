@@ -0,0 +1,192 @@
+-- ============================================================
+-- Migration 008: partition functions, privileges and parked rows
+-- ============================================================
+-- For databases partitioned by schema.sql or migration 001.
+-- fn_ensure_monthly_partitions (called by the API over RPC) now runs as
+-- SECURITY DEFINER, so the API role can create partitions without owning
+-- the tables. fn_split_default_partitions() moves rows that landed in
+-- expenses_default / fuel_logs_default (e.g. after a gap in partition
+-- maintenance) into their own months. It is kept away from the API roles
+-- because it locks and copies the tables. This migration moves every
+-- parked month, then tops up the rolling window.
+--
+-- Run as the table owner (postgres on Supabase), so it owns the functions:
+--   psql "$DATABASE_URL" -f database/migrations/008_split_default_partition.sql
+-- Moving a month locks the table against reads and writes until COMMIT.
+
+BEGIN;
+
+-- Move rows parked in the DEFAULT partition into their own monthly
+-- partition: detach the default, copy its rows into the new month and a
+-- fresh default (neither attached yet, so no row trigger re-fires), then
+-- attach both. Returns the number of rows moved. Holds an ACCESS EXCLUSIVE
+-- lock on the table and copies the whole default partition, so it is not
+-- callable by the API roles.
+CREATE OR REPLACE FUNCTION fn_split_default_partition(p_table TEXT, p_month DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    v_key     TEXT;
+    v_start   DATE := DATE_TRUNC('month', p_month)::DATE;
+    v_end     DATE := (DATE_TRUNC('month', p_month) + INTERVAL '1 month')::DATE;
+    v_name    TEXT := format('%s_y%sm%s', p_table, to_char(v_start, 'YYYY'), to_char(v_start, 'MM'));
+    v_default TEXT := p_table || '_default';
+    v_parked  TEXT := p_table || '_default_parked';
+    v_columns TEXT;
+    v_moved   INTEGER;
+BEGIN
+    v_key := CASE p_table
+        WHEN 'expenses'  THEN 'expense_date'
+        WHEN 'fuel_logs' THEN 'fuel_date'
+    END;
+    IF v_key IS NULL THEN
+        RAISE EXCEPTION 'Table "%" is not partitioned by month', p_table;
+    END IF;
+
+    IF to_regclass(v_name) IS NOT NULL THEN
+        RETURN 0;
+    END IF;
+
+    -- Generated columns (fuel_logs.total_cost) are recomputed on insert
+    SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO v_columns
+    FROM pg_attribute
+    WHERE attrelid = p_table::regclass AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+
+    EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', p_table, v_default);
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', v_default, v_parked);
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)',
+                   v_name, p_table);
+    EXECUTE format('INSERT INTO %I (%s) SELECT %s FROM %I WHERE %I >= %L AND %I < %L',
+                   v_name, v_columns, v_columns, v_parked, v_key, v_start, v_key, v_end);
+    GET DIAGNOSTICS v_moved = ROW_COUNT;
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)',
+                   v_default, p_table);
+    EXECUTE format('INSERT INTO %I (%s) SELECT %s FROM %I WHERE %I < %L OR %I >= %L',
+                   v_default, v_columns, v_columns, v_parked, v_key, v_start, v_key, v_end);
+    EXECUTE format('DROP TABLE %I', v_parked);
+
+    -- Attaching builds the parent's indexes and foreign keys on both tables
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   p_table, v_name, v_start, v_end);
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I DEFAULT', p_table, v_default);
+    RETURN v_moved;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Move every month parked in either DEFAULT partition into its own
+-- partition. Returns the number of rows moved.
+CREATE OR REPLACE FUNCTION fn_split_default_partitions()
+RETURNS INTEGER AS $$
+DECLARE
+    v_months DATE[];
+    v_month  DATE;
+    v_moved  INTEGER := 0;
+BEGIN
+    SELECT COALESCE(array_agg(DISTINCT DATE_TRUNC('month', expense_date)::DATE), '{}')
+        INTO v_months FROM expenses_default;
+    FOREACH v_month IN ARRAY v_months LOOP
+        v_moved := v_moved + fn_split_default_partition('expenses', v_month);
+    END LOOP;
+
+    SELECT COALESCE(array_agg(DISTINCT DATE_TRUNC('month', fuel_date)::DATE), '{}')
+        INTO v_months FROM fuel_logs_default;
+    FOREACH v_month IN ARRAY v_months LOOP
+        v_moved := v_moved + fn_split_default_partition('fuel_logs', v_month);
+    END LOOP;
+    RETURN v_moved;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Create one monthly partition; returns FALSE if it already exists. A
+-- month with rows parked in the DEFAULT partition is skipped (attaching it
+-- would fail) and left for fn_split_default_partitions().
+CREATE OR REPLACE FUNCTION fn_create_monthly_partition(p_table TEXT, p_month DATE)
+RETURNS BOOLEAN AS $$
+DECLARE
+    v_key   TEXT;
+    v_start DATE := DATE_TRUNC('month', p_month)::DATE;
+    v_end   DATE := (DATE_TRUNC('month', p_month) + INTERVAL '1 month')::DATE;
+    v_name  TEXT := format('%s_y%sm%s', p_table, to_char(v_start, 'YYYY'), to_char(v_start, 'MM'));
+    v_parked BOOLEAN;
+BEGIN
+    v_key := CASE p_table
+        WHEN 'expenses'  THEN 'expense_date'
+        WHEN 'fuel_logs' THEN 'fuel_date'
+    END;
+    IF v_key IS NULL THEN
+        RAISE EXCEPTION 'Table "%" is not partitioned by month', p_table;
+    END IF;
+
+    IF to_regclass(v_name) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+
+    EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE %I >= %L AND %I < %L)',
+                   p_table || '_default', v_key, v_start, v_key, v_end)
+        INTO v_parked;
+    IF v_parked THEN
+        RAISE WARNING '% has rows for % in its default partition; run fn_split_default_partitions()',
+            p_table, v_start;
+        RETURN FALSE;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                   v_name, p_table, v_start, v_end);
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Ensure partitions exist from p_months_back before to p_months_ahead after
+-- the current month. Returns the number of partitions created. Runs as the
+-- function owner (the table owner), so the API role can call it over RPC.
+CREATE OR REPLACE FUNCTION fn_ensure_monthly_partitions(
+    p_months_back  INTEGER DEFAULT 1,
+    p_months_ahead INTEGER DEFAULT 3
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_table   TEXT;
+    v_offset  INTEGER;
+    v_created INTEGER := 0;
+BEGIN
+    FOREACH v_table IN ARRAY ARRAY['expenses', 'fuel_logs'] LOOP
+        FOR v_offset IN -p_months_back .. p_months_ahead LOOP
+            IF fn_create_monthly_partition(
+                   v_table, (DATE_TRUNC('month', CURRENT_DATE) + v_offset * INTERVAL '1 month')::DATE)
+            THEN
+                v_created := v_created + 1;
+            END IF;
+        END LOOP;
+    END LOOP;
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Only fn_ensure_monthly_partitions is exposed to the API (service_role).
+-- The Supabase roles exist only on Supabase; plain Postgres skips them.
+REVOKE EXECUTE ON FUNCTION
+    fn_split_default_partition(TEXT, DATE),
+    fn_split_default_partitions(),
+    fn_create_monthly_partition(TEXT, DATE),
+    fn_ensure_monthly_partitions(INTEGER, INTEGER)
+FROM PUBLIC;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+        REVOKE EXECUTE ON FUNCTION
+            fn_split_default_partition(TEXT, DATE),
+            fn_split_default_partitions(),
+            fn_create_monthly_partition(TEXT, DATE),
+            fn_ensure_monthly_partitions(INTEGER, INTEGER)
+        FROM anon, authenticated, service_role;
+        GRANT EXECUTE ON FUNCTION fn_ensure_monthly_partitions(INTEGER, INTEGER) TO service_role;
+    END IF;
+END;
+$$;
+
+SELECT fn_split_default_partitions();
+SELECT fn_ensure_monthly_partitions(12, 3);
+
+COMMIT;
@@ -0,0 +1,45 @@
+-- ============================================================
+-- Migration 009: conditional batch insert for auto-assign
+-- ============================================================
+-- POST /trips/auto-assign plans from a snapshot of idle vehicles and
+-- available drivers. fn_insert_dispatch_trips inserts the plan under an
+-- advisory lock and skips rows whose vehicle or driver was given a
+-- scheduled trip in the meantime, so concurrent batches cannot double-book.
+--
+-- Run with:  psql "$DATABASE_URL" -f database/migrations/009_dispatch_insert.sql
+
+BEGIN;
+
+-- Insert planned trips, skipping any whose vehicle or driver already holds
+-- a scheduled trip. The advisory lock serializes concurrent auto-assign
+-- batches, so two planners working from the same pool cannot both claim
+-- one vehicle or driver. Returns the rows inserted.
+CREATE OR REPLACE FUNCTION fn_insert_dispatch_trips(p_trips JSONB)
+RETURNS SETOF trips AS $$
+DECLARE
+    r JSONB;
+    v_trip trips;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('fn_insert_dispatch_trips'));
+
+    FOR r IN SELECT * FROM jsonb_array_elements(p_trips) LOOP
+        CONTINUE WHEN EXISTS (
+            SELECT 1 FROM trips
+            WHERE status = 'scheduled'
+              AND (vehicle_id = (r->>'vehicle_id')::INTEGER
+                   OR driver_id = (r->>'driver_id')::INTEGER)
+        );
+
+        INSERT INTO trips (vehicle_id, driver_id, cargo_weight_kg, origin, destination,
+                           distance_km, revenue, scheduled_departure)
+        SELECT t.vehicle_id, t.driver_id, t.cargo_weight_kg, t.origin, t.destination,
+               t.distance_km, t.revenue, t.scheduled_departure
+        FROM jsonb_populate_record(NULL::trips, r) t
+        RETURNING * INTO v_trip;
+
+        RETURN NEXT v_trip;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,616 @@
+"""
+plan_check.py — Query-plan regression check for FleetFlow's hot queries.
+
+Builds a scratch database from schema.sql, seeds it with a synthetic fleet
+(hundreds of thousands of trips / fuel logs / expenses), then runs
+EXPLAIN (ANALYZE, BUFFERS) on every query shape the API generates: list
+filters, summaries, views, the RPC functions (inlined, so their bodies are
+planned) and the lookups the triggers perform.
+
+A query fails when:
+  * it sequentially scans a table its budget marks as index-only,
+  * it exceeds its execution-time or shared-buffer budget,
+  * it touches more partitions than allowed (pruning regression), or
+  * a relation that used an index in the recorded baseline now seq-scans.
+
+It also reports filter shapes (equality columns + range column) with no
+matching composite index and prints the CREATE INDEX to add.
+
+Usage (needs a local Postgres you can create databases on):
+    pip install "psycopg[binary]"
+    python database/plan_check.py --dsn postgresql://postgres@localhost/postgres
+    python database/plan_check.py --dsn ... --write-baseline   # accept current plans
+
+The same checks run under pytest (one test per query shape) when
+PLAN_CHECK_DSN is set; see test_plan_check.py.
+
+Budgets live in plan_budgets.json, the accepted plan shapes in
+plan_baseline.json (both next to this file). Exit status is 1 on failure.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from string import Template
+
+HERE = Path(__file__).resolve().parent
+SCHEMA_FILE = HERE / "schema.sql"
+BUDGETS_FILE = HERE / "plan_budgets.json"
+BASELINE_FILE = HERE / "plan_baseline.json"
+SCRATCH_DB = "fleetflow_plancheck"
+
+INDEXED_SCANS = {"Index Scan", "Index Only Scan", "Bitmap Heap Scan", "Bitmap Index Scan"}
+
+
+# ---------------------------------------------------------------------------
+# Synthetic dataset
+# ---------------------------------------------------------------------------
+# Triggers (and the FK triggers) are disabled while seeding: ids are
+# generated consistently and the business-rule triggers would reject bulk
+# history (e.g. trips on non-idle vehicles). The daily rollup, driver stats
+# and maintenance due dates are rebuilt afterwards in one pass each.
+
+SEED_SQL = """
+SET session_replication_role = replica;
+
+SELECT fn_create_monthly_partition(t, (DATE_TRUNC('month', CURRENT_DATE) - g * INTERVAL '1 month')::DATE)
+FROM unnest(ARRAY['expenses', 'fuel_logs']) t, generate_series(0, 24) g;
+
+INSERT INTO users (email, password_hash, role, first_name, last_name)
+SELECT 'user' || g || '@seed.local', 'x',
+       (ARRAY['manager', 'dispatcher', 'driver', 'viewer'])[1 + g % 4]::user_role,
+       (ARRAY['Ravi', 'Asha', 'Imran', 'Meera', 'Karan', 'Sara'])[1 + g % 6] || g,
+       (ARRAY['Patel', 'Shah', 'Khan', 'Iyer', 'Singh'])[1 + g % 5]
+FROM generate_series(1, ${drivers} + 50) g;
+
+INSERT INTO vehicles (license_plate, make, model, year, vehicle_type, fuel_type,
+                      max_load_capacity_kg, current_odometer_km, status)
+SELECT 'GJ' || lpad((g % 40)::TEXT, 2, '0') || 'AB' || lpad(g::TEXT, 5, '0'),
+       (ARRAY['Tata', 'Ashok Leyland', 'Eicher', 'Mahindra', 'BharatBenz'])[1 + g % 5],
+       'Model ' || (g % 30),
+       2010 + g % 15,
+       (ARRAY['truck', 'trailer', 'van', 'mini', 'tanker'])[1 + g % 5]::vehicle_type,
+       'diesel',
+       1000 + (g % 40) * 500,
+       (random() * 300000)::NUMERIC(12,2),
+       CASE WHEN g % 50 = 0 THEN 'retired'
+            WHEN g % 10 = 0 THEN 'in_shop'
+            WHEN g % 3 = 0  THEN 'on_trip'
+            ELSE 'idle' END::vehicle_status
+FROM generate_series(1, ${vehicles}) g;
+
+INSERT INTO drivers (user_id, license_number, license_expiry, safety_score, duty_status)
+SELECT g, 'DL-' || lpad(g::TEXT, 8, '0'),
+       CURRENT_DATE + ((g % 900) - 60),
+       60 + (g % 40),
+       (ARRAY['on_duty', 'off_duty', 'on_break', 'suspended'])[1 + g % 4]::duty_status
+FROM generate_series(1, ${drivers}) g;
+
+INSERT INTO trips (vehicle_id, driver_id, cargo_weight_kg, origin, destination, distance_km,
+                   revenue, status, scheduled_departure, actual_arrival)
+SELECT 1 + g % ${vehicles}, 1 + g % ${drivers},
+       500 + g % 900,
+       (ARRAY['Ahmedabad', 'Mumbai', 'Pune', 'Surat', 'Jaipur', 'Delhi'])[1 + g % 6] || ' Depot ' || (g % 17),
+       (ARRAY['Vadodara', 'Nashik', 'Indore', 'Udaipur', 'Rajkot', 'Bhopal'])[1 + g % 6] || ' Hub ' || (g % 13),
+       50 + g % 900,
+       5000 + (g % 200) * 100,
+       s.status,
+       d.departure,
+       CASE WHEN s.status = 'delivered' THEN d.departure + (g % 72) * INTERVAL '1 hour' END
+FROM generate_series(1, ${trips}) g
+CROSS JOIN LATERAL (
+    SELECT (CASE WHEN g % 20 = 0 THEN 'scheduled'
+                 WHEN g % 20 = 1 THEN 'in_transit'
+                 WHEN g % 20 = 2 THEN 'cancelled'
+                 ELSE 'delivered' END)::trip_status AS status
+) s
+CROSS JOIN LATERAL (
+    SELECT NOW() - (g % 730) * INTERVAL '1 day' AS departure
+) d;
+
+INSERT INTO maintenance_logs (vehicle_id, service_type, description, start_date,
+                              completion_date, cost, status)
+SELECT 1 + g % ${vehicles},
+       (ARRAY['oil_change', 'tire_replacement', 'engine_repair', 'brake_service'])[1 + g % 4]::service_type,
+       'Service #' || g,
+       CURRENT_DATE - (g % 730),
+       CASE WHEN g % 10 < 8 THEN CURRENT_DATE - (g % 730) + 2 END,
+       500 + g % 20000,
+       (CASE WHEN g % 10 < 8 THEN 'completed' WHEN g % 10 = 8 THEN 'in_progress' ELSE 'new' END)::maintenance_status
+FROM generate_series(1, ${maintenance}) g;
+
+INSERT INTO fuel_logs (vehicle_id, driver_id, trip_id, liters, cost_per_liter, odometer_at_fill, fuel_date)
+SELECT 1 + g % ${vehicles}, 1 + g % ${drivers},
+       CASE WHEN g % 3 > 0 THEN 1 + g % ${trips} END,
+       20 + g % 180, 90 + g % 15,
+       (g / ${vehicles}) * 350 + g % 300,
+       CURRENT_DATE - (g % 730)
+FROM generate_series(1, ${fuel_logs}) g;
+
+INSERT INTO expenses (trip_id, vehicle_id, expense_type, amount, description, expense_date)
+SELECT CASE WHEN g % 4 > 0 THEN 1 + g % ${trips} END,
+       1 + g % ${vehicles},
+       (ARRAY['fuel', 'toll', 'parking', 'maintenance', 'fine', 'misc'])[1 + g % 6]::expense_type,
+       100 + g % 5000,
+       'Expense ' || (ARRAY['toll plaza', 'parking lot', 'loading bay', 'fine'])[1 + g % 4] || ' ' || g,
+       CURRENT_DATE - (g % 730)
+FROM generate_series(1, ${expenses}) g;
+
+INSERT INTO driver_complaints (driver_id, trip_id, complaint_type, description, severity, status)
+SELECT 1 + g % ${drivers}, 1 + g % ${trips},
+       (ARRAY['late_delivery', 'reckless_driving', 'cargo_damage'])[1 + g % 3]::complaint_type,
+       'Complaint ' || g,
+       (ARRAY['low', 'medium', 'high', 'critical'])[1 + g % 4]::severity_level,
+       (ARRAY['open', 'investigating', 'resolved'])[1 + g % 3]::complaint_status
+FROM generate_series(1, ${complaints}) g;
+
+INSERT INTO vehicle_documents (vehicle_id, document_type, document_number, issue_date, expiry_date)
+SELECT v, d, 'DOC-' || v || '-' || d, CURRENT_DATE - 365, CURRENT_DATE + (v % 400) - 30
+FROM generate_series(1, ${vehicles}) v,
+     unnest(ARRAY['insurance', 'registration', 'permit']::document_type[]) d;
+
+SET session_replication_role = DEFAULT;
+
+SELECT fn_rollup_rebuild();
+SELECT fn_driver_stats_rebuild();
+SELECT fn_maintenance_due_refresh();
+"""
+
+BASE_SIZES = {
+    "vehicles": 2_000,
+    "drivers": 3_000,
+    "trips": 200_000,
+    "maintenance": 20_000,
+    "fuel_logs": 150_000,
+    "expenses": 150_000,
+    "complaints": 5_000,
+}
+
+
+# ---------------------------------------------------------------------------
+# Query shapes — SQL equivalents of what the routers send through PostgREST
+# ---------------------------------------------------------------------------
+# `filter` describes the predicate shape for the index advisor:
+# (table, equality columns, range/order column). ${vehicle_id}, ${driver_id}
+# and ${trip_id} are filled in from the seeded sizes (see probe_ids), so
+# every lookup hits an existing row at any --scale.
+
+QUERIES = [
+    # Vehicles
+    {"name": "vehicles.list_by_status",
+     "sql": "SELECT * FROM vehicles WHERE status = 'idle' ORDER BY id DESC LIMIT 50"},
+    {"name": "vehicles.options",
+     "sql": "SELECT id, license_plate, make, model, max_load_capacity_kg FROM vehicles "
+            "WHERE status = 'idle' ORDER BY license_plate"},
+    {"name": "vehicles.get",
+     "sql": "SELECT * FROM vehicles WHERE id = ${vehicle_id}"},
+    {"name": "vehicles.search_plate",
+     "sql": "SELECT id FROM vehicles WHERE license_plate ILIKE '%AB0123%' OR make ILIKE '%AB0123%' "
+            "OR model ILIKE '%AB0123%'"},
+
+    # Drivers
+    {"name": "drivers.list_by_duty",
+     "sql": "SELECT d.*, u.first_name, u.last_name, u.email FROM drivers d "
+            "JOIN users u ON u.id = d.user_id WHERE d.duty_status = 'off_duty' "
+            "ORDER BY d.id DESC LIMIT 50"},
+    {"name": "drivers.options",
+     "sql": "SELECT d.id, d.license_number, u.first_name, u.last_name FROM drivers d "
+            "JOIN users u ON u.id = d.user_id WHERE d.duty_status <> 'suspended' "
+            "AND d.license_expiry >= CURRENT_DATE"},
+    {"name": "drivers.search_name",
+     "sql": "SELECT d.id FROM drivers d JOIN users u ON u.id = d.user_id "
+            "WHERE (u.first_name || ' ' || u.last_name) ILIKE '%meera12%' "
+            "OR d.license_number ILIKE '%meera12%'"},
+
+    # Trips
+    {"name": "trips.list_by_status",
+     "sql": "SELECT * FROM trips WHERE status = 'scheduled' ORDER BY scheduled_departure DESC LIMIT 50",
+     "filter": ("trips", ["status"], "scheduled_departure")},
+    {"name": "trips.list_by_vehicle",
+     "sql": "SELECT * FROM trips WHERE vehicle_id = ${vehicle_id} ORDER BY scheduled_departure DESC LIMIT 50",
+     "filter": ("trips", ["vehicle_id"], "scheduled_departure")},
+    {"name": "trips.list_by_driver",
+     "sql": "SELECT * FROM trips WHERE driver_id = ${driver_id} ORDER BY scheduled_departure DESC LIMIT 50",
+     "filter": ("trips", ["driver_id"], "scheduled_departure")},
+    {"name": "trips.delivered_in_range",
+     "sql": "SELECT vehicle_id, revenue, actual_arrival FROM trips WHERE status = 'delivered' "
+            "AND actual_arrival >= NOW() - INTERVAL '6 months' AND actual_arrival <= NOW()",
+     "filter": ("trips", ["status"], "actual_arrival")},
+    {"name": "trips.search_route",
+     "sql": "SELECT id FROM trips WHERE origin ILIKE '%Pune Depot 1%' OR destination ILIKE '%Pune Depot 1%' "
+            "LIMIT 50"},
+
+    # Maintenance
+    {"name": "maintenance.list_by_vehicle",
+     "sql": "SELECT * FROM maintenance_logs WHERE vehicle_id = ${vehicle_id} ORDER BY id DESC"},
+    {"name": "maintenance.open",
+     "sql": "SELECT * FROM maintenance_logs WHERE status IN ('new', 'in_progress') ORDER BY id DESC LIMIT 50"},
+    {"name": "maintenance.completed_in_range",
+     "sql": "SELECT cost, completion_date FROM maintenance_logs WHERE status = 'completed' "
+            "AND completion_date >= CURRENT_DATE - 186",
+     "filter": ("maintenance_logs", ["status"], "completion_date")},
+
+    # Expenses (partitioned)
+    {"name": "expenses.list_in_range",
+     "sql": "SELECT * FROM expenses WHERE expense_date >= CURRENT_DATE - 30 "
+            "AND expense_date <= CURRENT_DATE ORDER BY expense_date DESC LIMIT 50"},
+    {"name": "expenses.list_by_vehicle_in_range",
+     "sql": "SELECT * FROM expenses WHERE vehicle_id = ${vehicle_id} AND expense_date >= CURRENT_DATE - 90 "
+            "ORDER BY expense_date DESC LIMIT 50",
+     "filter": ("expenses", ["vehicle_id"], "expense_date")},
+    {"name": "expenses.summary_by_type",
+     "sql": "SELECT expense_type, SUM(amount) FROM expenses WHERE expense_date >= DATE_TRUNC('month', CURRENT_DATE) "
+            "AND expense_date < DATE_TRUNC('month', CURRENT_DATE) + INTERVAL '1 month' GROUP BY expense_type"},
+    {"name": "expenses.by_trip",
+     "sql": "SELECT * FROM expenses WHERE trip_id = ${trip_id}"},
+
+    # Fuel logs (partitioned)
+    {"name": "fuel_logs.list_by_vehicle_in_range",
+     "sql": "SELECT * FROM fuel_logs WHERE vehicle_id = ${vehicle_id} AND fuel_date >= CURRENT_DATE - 90 "
+            "ORDER BY fuel_date DESC LIMIT 50",
+     "filter": ("fuel_logs", ["vehicle_id"], "fuel_date")},
+    {"name": "fuel_logs.summary_by_vehicle",
+     "sql": "SELECT vehicle_id, SUM(liters), SUM(total_cost) FROM fuel_logs "
+            "WHERE fuel_date >= CURRENT_DATE - 30 AND fuel_date <= CURRENT_DATE GROUP BY vehicle_id"},
+    {"name": "fuel_logs.by_trip",
+     "sql": "SELECT * FROM fuel_logs WHERE trip_id = ${trip_id}"},
+
+    # Daily rollup
+    {"name": "rollup.vehicle_year",
+     "sql": "SELECT * FROM vehicle_daily_rollup WHERE vehicle_id = ${vehicle_id} "
+            "AND day >= CURRENT_DATE - 365 AND day <= CURRENT_DATE ORDER BY day"},
+    {"name": "rollup.fleet_month",
+     "sql": "SELECT day, SUM(revenue), SUM(fuel_cost), SUM(maintenance_cost) FROM vehicle_daily_rollup "
+            "WHERE day >= DATE_TRUNC('month', CURRENT_DATE) GROUP BY day"},
+
+    # Driver complaints
+    {"name": "complaints.list_by_status",
+     "sql": "SELECT * FROM driver_complaints WHERE status = 'open' AND severity = 'critical' "
+            "ORDER BY id DESC LIMIT 50"},
+    {"name": "complaints.by_driver",
+     "sql": "SELECT * FROM driver_complaints WHERE driver_id = ${driver_id} ORDER BY id DESC"},
+
+    # Vehicle documents
+    {"name": "documents.expiring",
+     "sql": "SELECT d.* FROM vehicle_documents d JOIN vehicles v ON v.id = d.vehicle_id "
+            "WHERE d.expiry_date <= CURRENT_DATE + 30 AND v.status <> 'retired' "
+            "ORDER BY d.expiry_date, d.id LIMIT 50"},
+    {"name": "documents.digest_bucket",
+     "sql": "SELECT COUNT(*) FROM vehicle_documents d "
+            "JOIN vehicles v ON v.id = d.vehicle_id "
+            "WHERE d.expiry_date >= CURRENT_DATE AND d.expiry_date <= CURRENT_DATE + 7 "
+            "AND v.status <> 'retired'"},
+
+    # Maintenance due
+    {"name": "maintenance_due.upcoming",
+     "sql": "SELECT * FROM maintenance_due WHERE due_date <= CURRENT_DATE + 30 ORDER BY due_date LIMIT 50"},
+    {"name": "maintenance_due.by_vehicle",
+     "sql": "SELECT * FROM maintenance_due WHERE vehicle_id = ${vehicle_id}"},
+    {"name": "maintenance_due.refresh_vehicle",
+     "sql": "SELECT fn_maintenance_due_refresh(ARRAY[${vehicle_id}])"},
+    {"name": "maintenance_due.refresh_fleet",
+     "sql": "SELECT fn_maintenance_due_refresh()"},
+
+    # Database functions. Called in FROM, LANGUAGE sql functions are inlined,
+    # so the plan shows their body's scans (a Function Scan means it was not)
+    {"name": "fn.search_trips",
+     "sql": "SELECT * FROM fn_search_trips('Pune Depot 1', p_limit => 50)"},
+    {"name": "fn.search_vehicles",
+     "sql": "SELECT * FROM fn_search_vehicles('AB0123', p_limit => 50)"},
+    {"name": "fn.search_expenses",
+     "sql": "SELECT * FROM fn_search_expenses('loading bay 4242', p_limit => 50)"},
+    {"name": "fn.search_drivers",
+     "sql": "SELECT * FROM fn_search_drivers('meera12', p_limit => 50)"},
+    {"name": "fn.fuel_anomalies_vehicle",
+     "sql": "SELECT * FROM fn_fuel_anomalies(p_vehicle_id => ${vehicle_id})"},
+    {"name": "fn.fuel_anomalies_fleet_month",
+     "sql": "SELECT * FROM fn_fuel_anomalies(CURRENT_DATE - 30, CURRENT_DATE)"},
+    {"name": "fn.rollup_series_fleet_days",
+     "sql": "SELECT * FROM fn_rollup_series(CURRENT_DATE - 29, CURRENT_DATE)"},
+    {"name": "fn.rollup_series_vehicle_months",
+     "sql": "SELECT * FROM fn_rollup_series(CURRENT_DATE - 365, CURRENT_DATE, ${vehicle_id}, 'month')"},
+
+    # Views
+    {"name": "view.dashboard_kpis", "sql": "SELECT * FROM vw_dashboard_kpis"},
+    {"name": "view.vehicle_cost_summary", "sql": "SELECT * FROM vw_vehicle_cost_summary"},
+    {"name": "view.driver_performance", "sql": "SELECT * FROM vw_driver_performance"},
+    {"name": "view.driver_performance_by_score",
+     "sql": "SELECT * FROM vw_driver_performance ORDER BY safety_score DESC LIMIT 50"},
+    {"name": "view.driver_performance_by_completion",
+     "sql": "SELECT * FROM vw_driver_performance ORDER BY completion_rate DESC LIMIT 50"},
+    {"name": "view.monthly_financial_summary", "sql": "SELECT * FROM vw_monthly_financial_summary LIMIT 6"},
+
+    # Trigger lookups (run inside a rolled-back transaction)
+    {"name": "trigger.cargo_capacity",
+     "sql": "SELECT max_load_capacity_kg FROM vehicles WHERE id = ${vehicle_id}"},
+    {"name": "trigger.driver_eligibility",
+     "sql": "SELECT license_expiry, duty_status FROM drivers WHERE id = ${driver_id}"},
+    {"name": "trigger.sync_odometer",
+     "sql": "UPDATE vehicles SET current_odometer_km = GREATEST(current_odometer_km, 1) WHERE id = ${vehicle_id}"},
+    {"name": "trigger.complaint_counters",
+     "sql": "SELECT fn_driver_stats_apply(${driver_id}, p_complaints => 1, p_open => 1, p_high => 1)"},
+    {"name": "trigger.trip_status_sync",
+     "sql": "UPDATE drivers SET duty_status = 'on_duty' WHERE id = ${driver_id}"},
+]
+
+
+# ---------------------------------------------------------------------------
+# Plan inspection
+# ---------------------------------------------------------------------------
+
+def walk(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk(child)
+
+
+def summarize(explain: dict) -> dict:
+    plan = explain["Plan"]
+    scans, functions = [], []
+    for node in walk(plan):
+        if node["Node Type"] == "Function Scan":
+            functions.append(node.get("Function Name"))
+        relation = node.get("Relation Name")
+        if relation:
+            scans.append({
+                "node": node["Node Type"],
+                "relation": relation,
+                "index": node.get("Index Name"),
+                "rows": node.get("Actual Rows", 0),
+                "rows_removed": node.get("Rows Removed by Filter", 0),
+            })
+    return {
+        "execution_ms": round(explain.get("Execution Time", 0.0), 3),
+        "planning_ms": round(explain.get("Planning Time", 0.0), 3),
+        "shared_buffers": plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0),
+        "scans": scans,
+        "function_scans": functions,
+    }
+
+
+def parent_table(relation: str, partitioned: set[str]) -> str:
+    """Map a partition (fuel_logs_y2026m10, fuel_logs_default) to its parent."""
+    for parent in partitioned:
+        if relation.startswith(parent + "_"):
+            return parent
+    return relation
+
+
+def shape(summary: dict, partitioned: set[str]) -> dict[str, str]:
+    """Per table, the weakest access path used (seq scan beats index scan)."""
+    result: dict[str, str] = {}
+    for scan in summary["scans"]:
+        if not scan["node"].endswith("Scan"):
+            continue  # ModifyTable etc. carry a relation but are not access paths
+        table = parent_table(scan["relation"], partitioned)
+        if (table != scan["relation"] and scan["node"] == "Seq Scan"
+                and not scan["rows"] and not scan["rows_removed"]):
+            continue  # empty partition (future months, default): seq scan is free
+        kind = "index" if scan["node"] in INDEXED_SCANS else scan["node"]
+        if result.get(table) != "Seq Scan":
+            result[table] = kind
+    return result
+
+
+def check(name: str, summary: dict, budget: dict, baseline: dict | None,
+          partitioned: set[str]) -> list[str]:
+    failures = []
+    if summary["execution_ms"] > budget.get("max_ms", float("inf")):
+        failures.append(f"execution {summary['execution_ms']} ms > budget {budget['max_ms']} ms")
+    if summary["shared_buffers"] > budget.get("max_buffers", float("inf")):
+        failures.append(f"{summary['shared_buffers']} buffers > budget {budget['max_buffers']}")
+
+    for function in summary["function_scans"]:
+        if function and function.startswith("fn_"):
+            failures.append(f"{function} not inlined; its plan is hidden behind a Function Scan")
+
+    current = shape(summary, partitioned)
+    for table in budget.get("no_seq_scan", []):
+        if current.get(table) == "Seq Scan":
+            failures.append(f"sequential scan on {table}")
+
+    for table, limit in budget.get("max_partitions", {}).items():
+        touched = {s["relation"] for s in summary["scans"] if s["relation"].startswith(table + "_")}
+        if len(touched) > limit:
+            failures.append(f"{len(touched)} {table} partitions scanned (max {limit}) — pruning lost")
+
+    if baseline:
+        for table, kind in baseline.items():
+            if kind == "index" and current.get(table) == "Seq Scan":
+                failures.append(f"{table}: index access in baseline, now Seq Scan")
+    return failures
+
+
+# ---------------------------------------------------------------------------
+# Index advisor
+# ---------------------------------------------------------------------------
+
+INDEX_SQL = """
+SELECT c.relname AS table_name,
+       i.relname AS index_name,
+       ARRAY(SELECT a.attname FROM unnest(x.indkey) WITH ORDINALITY k(attnum, ord)
+             JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k.attnum
+             ORDER BY k.ord) AS columns,
+       pg_get_expr(x.indpred, x.indrelid) AS predicate
+FROM pg_index x
+JOIN pg_class c ON c.oid = x.indrelid
+JOIN pg_class i ON i.oid = x.indexrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = 'public'
+"""
+
+
+def covering_index(indexes: list[dict], table: str, equality: list[str], range_col: str) -> str | None:
+    """An index whose leading columns are the equality columns then the range column,
+    or a partial index on the range column whose predicate fixes the equality columns."""
+    wanted = len(equality) + 1
+    for index in indexes:
+        if index["table_name"] != table:
+            continue
+        columns = list(index["columns"])
+        if set(columns[:len(equality)]) == set(equality) and columns[len(equality):wanted] == [range_col]:
+            return index["index_name"]
+        predicate = index["predicate"] or ""
+        if columns[:1] == [range_col] and all(col in predicate for col in equality):
+            return index["index_name"]
+    return None
+
+
+def recommend(indexes: list[dict]) -> list[dict]:
+    recommendations = []
+    for query in QUERIES:
+        if "filter" not in query:
+            continue
+        table, equality, range_col = query["filter"]
+        if covering_index(indexes, table, equality, range_col):
+            continue
+        columns = equality + [range_col]
+        recommendations.append({
+            "query": query["name"],
+            "ddl": f"CREATE INDEX idx_{table}_{'_'.join(columns)} ON {table}({', '.join(columns)});",
+        })
+    return recommendations
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def scratch_conninfo(dsn: str) -> str:
+    from psycopg.conninfo import make_conninfo
+    return make_conninfo(dsn, dbname=SCRATCH_DB)
+
+
+def seed_sizes(scale: float) -> dict[str, int]:
+    return {key: max(int(value * scale), 10) for key, value in BASE_SIZES.items()}
+
+
+def probe_ids(sizes: dict[str, int]) -> dict[str, int]:
+    """Ids the query shapes look up: mid-table rows that exist at any scale.
+    (Vehicle ids divisible by 10 are seeded in_shop or retired; avoid them.)"""
+    return {
+        "vehicle_id": sizes["vehicles"] // 2 + 1,
+        "driver_id": sizes["drivers"] // 2 + 1,
+        "trip_id": sizes["trips"] // 2 + 1,
+    }
+
+
+def build_database(psycopg, dsn: str, sizes: dict[str, int]) -> str:
+    """(Re)create the scratch database, load schema.sql and seed it. Returns its DSN."""
+    with psycopg.connect(dsn, autocommit=True) as admin:
+        admin.execute(f"DROP DATABASE IF EXISTS {SCRATCH_DB}")
+        admin.execute(f"CREATE DATABASE {SCRATCH_DB}")
+
+    scratch_dsn = scratch_conninfo(dsn)
+
+    started = time.perf_counter()
+    with psycopg.connect(scratch_dsn, autocommit=True) as conn:
+        conn.execute(SCHEMA_FILE.read_text())
+        conn.execute(Template(SEED_SQL).substitute(sizes))
+        conn.execute("VACUUM ANALYZE")
+    print(f"Seeded {SCRATCH_DB} {sizes} in {time.perf_counter() - started:.1f}s")
+    return scratch_dsn
+
+
+def partitioned_tables(conn) -> set[str]:
+    rows = conn.execute(
+        "SELECT c.relname FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid"
+    ).fetchall()
+    return {row[0] for row in rows}
+
+
+def explain(conn, sql: str, repeats: int) -> dict:
+    result = None
+    for _ in range(repeats):  # first run warms the cache; keep the last
+        with conn.transaction(force_rollback=True):
+            row = conn.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}").fetchone()
+        result = row[0][0]
+    return result
+
+
+def load_json(path: Path) -> dict:
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def evaluate(conn, query: dict, ids: dict[str, int], budgets: dict, baseline: dict,
+             partitioned: set[str], repeats: int) -> dict:
+    """EXPLAIN one query shape and check it; the summary plus its shape and failures."""
+    name = query["name"]
+    summary = summarize(explain(conn, Template(query["sql"]).substitute(ids), repeats))
+    budget = {**budgets.get("_default", {}), **budgets.get(name, {})}
+    failures = check(name, summary, budget, baseline.get(name), partitioned)
+    return {**summary, "shape": shape(summary, partitioned), "failures": failures}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dsn", required=True, help="Postgres DSN with CREATE DATABASE rights")
+    parser.add_argument("--scale", type=float, default=1.0, help="dataset size multiplier")
+    parser.add_argument("--skip-seed", action="store_true",
+                        help="reuse the existing scratch database (seeded with the same --scale)")
+    parser.add_argument("--repeats", type=int, default=3, help="EXPLAIN runs per query")
+    parser.add_argument("--only", help="run only queries whose name starts with this prefix")
+    parser.add_argument("--write-baseline", action="store_true", help="record current plan shapes")
+    parser.add_argument("--report", type=Path, help="write the full JSON report here")
+    args = parser.parse_args(argv)
+
+    try:
+        import psycopg
+    except ImportError:
+        print('plan_check needs psycopg 3: pip install "psycopg[binary]"', file=sys.stderr)
+        return 2
+
+    sizes = seed_sizes(args.scale)
+    if args.skip_seed:
+        scratch_dsn = scratch_conninfo(args.dsn)
+    else:
+        scratch_dsn = build_database(psycopg, args.dsn, sizes)
+    ids = probe_ids(sizes)
+
+    budgets = load_json(BUDGETS_FILE)
+    baseline = load_json(BASELINE_FILE)
+
+    report = {"queries": {}, "recommendations": []}
+    failed = 0
+    with psycopg.connect(scratch_dsn) as conn:
+        partitioned = partitioned_tables(conn)
+        for query in QUERIES:
+            name = query["name"]
+            if args.only and not name.startswith(args.only):
+                continue
+            result = evaluate(conn, query, ids, budgets, baseline, partitioned, args.repeats)
+            report["queries"][name] = result
+
+            status = "FAIL" if result["failures"] else "ok"
+            print(f"{status:4}  {name:40} {result['execution_ms']:9.2f} ms {result['shared_buffers']:8} buf")
+            for failure in result["failures"]:
+                print(f"      - {failure}")
+            failed += bool(result["failures"])
+
+        indexes = [
+            dict(zip(("table_name", "index_name", "columns", "predicate"), row))
+            for row in conn.execute(INDEX_SQL).fetchall()
+        ]
+        report["recommendations"] = recommend(indexes)
+
+    if report["recommendations"]:
+        print("\nMissing composite indexes:")
+        for rec in report["recommendations"]:
+            print(f"  {rec['ddl']:75} -- {rec['query']}")
+
+    if args.write_baseline:
+        BASELINE_FILE.write_text(json.dumps(
+            {name: q["shape"] for name, q in sorted(report["queries"].items())}, indent=2
+        ) + "\n")
+        print(f"\nBaseline written to {BASELINE_FILE.name}")
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2))
+
+    print(f"\n{len(report['queries']) - failed} passed, {failed} failed")
+    return 1 if failed and not args.write_baseline else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
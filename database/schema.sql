@@ -4,6 +4,13 @@
 -- Version: 3.0
 -- ============================================================
 
+-- ============================================================
+-- EXTENSIONS
+-- ============================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;     -- trigram indexes for substring search
+
+
 -- ============================================================
 -- ENUM TYPES (13)
 -- ============================================================
@@ -100,6 +107,8 @@ CREATE INDEX idx_trips_vehicle   ON trips(vehicle_id);
 CREATE INDEX idx_trips_driver    ON trips(driver_id);
 CREATE INDEX idx_trips_status    ON trips(status);
 CREATE INDEX idx_trips_departure ON trips(scheduled_departure);
+-- Monthly financial summary reads delivered trips by arrival date
+CREATE INDEX idx_trips_delivered_arrival ON trips(actual_arrival) WHERE status = 'delivered';
 
 
 -- ============================================================
@@ -123,33 +132,38 @@ CREATE TABLE maintenance_logs (
 
 CREATE INDEX idx_maintenance_vehicle ON maintenance_logs(vehicle_id);
 CREATE INDEX idx_maintenance_status  ON maintenance_logs(status);
+-- Monthly financial summary reads completed work by completion date
+CREATE INDEX idx_maintenance_completed ON maintenance_logs(completion_date) WHERE status = 'completed';
 
 
 -- ============================================================
--- 6. EXPENSES
+-- 6. EXPENSES  (range-partitioned by month on expense_date)
 -- ============================================================
 
 CREATE TABLE expenses (
-    id                  SERIAL PRIMARY KEY,
+    id                  SERIAL,
     trip_id             INTEGER         REFERENCES trips(id) ON DELETE SET NULL,
     vehicle_id          INTEGER         NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
     expense_type        expense_type    NOT NULL,
     amount              DECIMAL(12,2)   NOT NULL CHECK (amount > 0),
     description         VARCHAR(500),
-    expense_date        DATE            NOT NULL DEFAULT CURRENT_DATE
-);
+    expense_date        DATE            NOT NULL DEFAULT CURRENT_DATE,
+
+    PRIMARY KEY (id, expense_date)      -- partition key must be part of the PK
+) PARTITION BY RANGE (expense_date);
 
 CREATE INDEX idx_expenses_trip    ON expenses(trip_id);
 CREATE INDEX idx_expenses_vehicle ON expenses(vehicle_id);
 CREATE INDEX idx_expenses_type    ON expenses(expense_type);
+CREATE INDEX idx_expenses_date    ON expenses(expense_date);
 
 
 -- ============================================================
--- 7. FUEL_LOGS
+-- 7. FUEL_LOGS  (range-partitioned by month on fuel_date)
 -- ============================================================
 
 CREATE TABLE fuel_logs (
-    id                  SERIAL PRIMARY KEY,
+    id                  SERIAL,
     vehicle_id          INTEGER         NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
     driver_id           INTEGER         REFERENCES drivers(id) ON DELETE SET NULL,
     trip_id             INTEGER         REFERENCES trips(id) ON DELETE SET NULL,
@@ -157,11 +171,14 @@ CREATE TABLE fuel_logs (
     cost_per_liter      DECIMAL(8,2)    NOT NULL CHECK (cost_per_liter > 0),
     total_cost          DECIMAL(12,2)   NOT NULL GENERATED ALWAYS AS (liters * cost_per_liter) STORED,
     odometer_at_fill    DECIMAL(12,2)   NOT NULL CHECK (odometer_at_fill >= 0),
-    fuel_date           DATE            NOT NULL DEFAULT CURRENT_DATE
-);
+    fuel_date           DATE            NOT NULL DEFAULT CURRENT_DATE,
+
+    PRIMARY KEY (id, fuel_date)
+) PARTITION BY RANGE (fuel_date);
 
 CREATE INDEX idx_fuel_vehicle ON fuel_logs(vehicle_id);
 CREATE INDEX idx_fuel_trip    ON fuel_logs(trip_id);
+CREATE INDEX idx_fuel_date    ON fuel_logs(fuel_date);
 
 
 -- ============================================================
@@ -204,6 +221,388 @@ CREATE INDEX idx_vdocs_vehicle ON vehicle_documents(vehicle_id);
 CREATE INDEX idx_vdocs_expiry  ON vehicle_documents(expiry_date);
 
 
+-- ============================================================
+-- PARTITIONING  (monthly partitions for expenses & fuel_logs)
+-- ============================================================
+-- Date-range filters on expense_date / fuel_date only touch the matching
+-- monthly partitions (partition pruning). Partitions are named
+-- <table>_yYYYYmMM; a DEFAULT partition catches rows outside the created
+-- range so inserts never fail. fn_ensure_monthly_partitions() is run at API
+-- startup and daily by the API process; it is also safe to schedule with
+-- pg_cron when the API is not always running:
+--   SELECT cron.schedule('fleetflow-partitions', '0 3 1 * *',
+--                        'SELECT fn_ensure_monthly_partitions()');
+-- It only creates partitions. A month whose rows are already parked in the
+-- DEFAULT partition is skipped; fn_split_default_partitions() moves them,
+-- run by the table owner (psql or pg_cron) in a quiet window.
+--
+-- trips is intentionally NOT partitioned: expenses, fuel_logs and
+-- driver_complaints reference trips(id), and a foreign key to a partitioned
+-- table must include its partition key. actual_arrival is also NULL until
+-- delivery. The partial index idx_trips_delivered_arrival serves the
+-- date-range reads instead.
+
+CREATE TABLE expenses_default  PARTITION OF expenses  DEFAULT;
+CREATE TABLE fuel_logs_default PARTITION OF fuel_logs DEFAULT;
+
+-- Move rows parked in the DEFAULT partition into their own monthly
+-- partition: detach the default, copy its rows into the new month and a
+-- fresh default (neither attached yet, so no row trigger re-fires), then
+-- attach both. Returns the number of rows moved. Holds an ACCESS EXCLUSIVE
+-- lock on the table and copies the whole default partition, so it is not
+-- callable by the API roles.
+CREATE OR REPLACE FUNCTION fn_split_default_partition(p_table TEXT, p_month DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    v_key     TEXT;
+    v_start   DATE := DATE_TRUNC('month', p_month)::DATE;
+    v_end     DATE := (DATE_TRUNC('month', p_month) + INTERVAL '1 month')::DATE;
+    v_name    TEXT := format('%s_y%sm%s', p_table, to_char(v_start, 'YYYY'), to_char(v_start, 'MM'));
+    v_default TEXT := p_table || '_default';
+    v_parked  TEXT := p_table || '_default_parked';
+    v_columns TEXT;
+    v_moved   INTEGER;
+BEGIN
+    v_key := CASE p_table
+        WHEN 'expenses'  THEN 'expense_date'
+        WHEN 'fuel_logs' THEN 'fuel_date'
+    END;
+    IF v_key IS NULL THEN
+        RAISE EXCEPTION 'Table "%" is not partitioned by month', p_table;
+    END IF;
+
+    IF to_regclass(v_name) IS NOT NULL THEN
+        RETURN 0;
+    END IF;
+
+    -- Generated columns (fuel_logs.total_cost) are recomputed on insert
+    SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO v_columns
+    FROM pg_attribute
+    WHERE attrelid = p_table::regclass AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+
+    EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', p_table, v_default);
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', v_default, v_parked);
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)',
+                   v_name, p_table);
+    EXECUTE format('INSERT INTO %I (%s) SELECT %s FROM %I WHERE %I >= %L AND %I < %L',
+                   v_name, v_columns, v_columns, v_parked, v_key, v_start, v_key, v_end);
+    GET DIAGNOSTICS v_moved = ROW_COUNT;
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)',
+                   v_default, p_table);
+    EXECUTE format('INSERT INTO %I (%s) SELECT %s FROM %I WHERE %I < %L OR %I >= %L',
+                   v_default, v_columns, v_columns, v_parked, v_key, v_start, v_key, v_end);
+    EXECUTE format('DROP TABLE %I', v_parked);
+
+    -- Attaching builds the parent's indexes and foreign keys on both tables
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   p_table, v_name, v_start, v_end);
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I DEFAULT', p_table, v_default);
+    RETURN v_moved;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Move every month parked in either DEFAULT partition into its own
+-- partition. Returns the number of rows moved.
+CREATE OR REPLACE FUNCTION fn_split_default_partitions()
+RETURNS INTEGER AS $$
+DECLARE
+    v_months DATE[];
+    v_month  DATE;
+    v_moved  INTEGER := 0;
+BEGIN
+    SELECT COALESCE(array_agg(DISTINCT DATE_TRUNC('month', expense_date)::DATE), '{}')
+        INTO v_months FROM expenses_default;
+    FOREACH v_month IN ARRAY v_months LOOP
+        v_moved := v_moved + fn_split_default_partition('expenses', v_month);
+    END LOOP;
+
+    SELECT COALESCE(array_agg(DISTINCT DATE_TRUNC('month', fuel_date)::DATE), '{}')
+        INTO v_months FROM fuel_logs_default;
+    FOREACH v_month IN ARRAY v_months LOOP
+        v_moved := v_moved + fn_split_default_partition('fuel_logs', v_month);
+    END LOOP;
+    RETURN v_moved;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Create one monthly partition; returns FALSE if it already exists. A
+-- month with rows parked in the DEFAULT partition is skipped (attaching it
+-- would fail) and left for fn_split_default_partitions().
+CREATE OR REPLACE FUNCTION fn_create_monthly_partition(p_table TEXT, p_month DATE)
+RETURNS BOOLEAN AS $$
+DECLARE
+    v_key   TEXT;
+    v_start DATE := DATE_TRUNC('month', p_month)::DATE;
+    v_end   DATE := (DATE_TRUNC('month', p_month) + INTERVAL '1 month')::DATE;
+    v_name  TEXT := format('%s_y%sm%s', p_table, to_char(v_start, 'YYYY'), to_char(v_start, 'MM'));
+    v_parked BOOLEAN;
+BEGIN
+    v_key := CASE p_table
+        WHEN 'expenses'  THEN 'expense_date'
+        WHEN 'fuel_logs' THEN 'fuel_date'
+    END;
+    IF v_key IS NULL THEN
+        RAISE EXCEPTION 'Table "%" is not partitioned by month', p_table;
+    END IF;
+
+    IF to_regclass(v_name) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+
+    EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE %I >= %L AND %I < %L)',
+                   p_table || '_default', v_key, v_start, v_key, v_end)
+        INTO v_parked;
+    IF v_parked THEN
+        RAISE WARNING '% has rows for % in its default partition; run fn_split_default_partitions()',
+            p_table, v_start;
+        RETURN FALSE;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                   v_name, p_table, v_start, v_end);
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Ensure partitions exist from p_months_back before to p_months_ahead after
+-- the current month. Returns the number of partitions created. Runs as the
+-- function owner (the table owner), so the API role can call it over RPC.
+CREATE OR REPLACE FUNCTION fn_ensure_monthly_partitions(
+    p_months_back  INTEGER DEFAULT 1,
+    p_months_ahead INTEGER DEFAULT 3
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_table   TEXT;
+    v_offset  INTEGER;
+    v_created INTEGER := 0;
+BEGIN
+    FOREACH v_table IN ARRAY ARRAY['expenses', 'fuel_logs'] LOOP
+        FOR v_offset IN -p_months_back .. p_months_ahead LOOP
+            IF fn_create_monthly_partition(
+                   v_table, (DATE_TRUNC('month', CURRENT_DATE) + v_offset * INTERVAL '1 month')::DATE)
+            THEN
+                v_created := v_created + 1;
+            END IF;
+        END LOOP;
+    END LOOP;
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Only fn_ensure_monthly_partitions is exposed to the API (service_role).
+-- The Supabase roles exist only on Supabase; plain Postgres skips them.
+REVOKE EXECUTE ON FUNCTION
+    fn_split_default_partition(TEXT, DATE),
+    fn_split_default_partitions(),
+    fn_create_monthly_partition(TEXT, DATE),
+    fn_ensure_monthly_partitions(INTEGER, INTEGER)
+FROM PUBLIC;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+        REVOKE EXECUTE ON FUNCTION
+            fn_split_default_partition(TEXT, DATE),
+            fn_split_default_partitions(),
+            fn_create_monthly_partition(TEXT, DATE),
+            fn_ensure_monthly_partitions(INTEGER, INTEGER)
+        FROM anon, authenticated, service_role;
+        GRANT EXECUTE ON FUNCTION fn_ensure_monthly_partitions(INTEGER, INTEGER) TO service_role;
+    END IF;
+END;
+$$;
+
+SELECT fn_ensure_monthly_partitions(12, 3);
+
+
+-- ============================================================
+-- SEARCH  (pg_trgm GIN indexes + ranked search functions)
+-- ============================================================
+-- Substring search (ILIKE '%term%') cannot use btree indexes; trigram GIN
+-- indexes serve both ILIKE and the similarity operator (%). The search
+-- functions take the term as a parameter (never interpolated into SQL or a
+-- PostgREST filter), escape LIKE wildcards, rank by similarity and return
+-- the total match count alongside each page.
+
+CREATE INDEX idx_trips_origin_trgm       ON trips    USING GIN (origin gin_trgm_ops);
+CREATE INDEX idx_trips_destination_trgm  ON trips    USING GIN (destination gin_trgm_ops);
+CREATE INDEX idx_vehicles_plate_trgm     ON vehicles USING GIN (license_plate gin_trgm_ops);
+CREATE INDEX idx_vehicles_make_trgm      ON vehicles USING GIN (make gin_trgm_ops);
+CREATE INDEX idx_vehicles_model_trgm     ON vehicles USING GIN (model gin_trgm_ops);
+CREATE INDEX idx_expenses_desc_trgm      ON expenses USING GIN (description gin_trgm_ops);
+CREATE INDEX idx_users_full_name_trgm    ON users    USING GIN ((first_name || ' ' || last_name) gin_trgm_ops);
+CREATE INDEX idx_users_email_trgm        ON users    USING GIN (email gin_trgm_ops);
+CREATE INDEX idx_drivers_license_trgm    ON drivers  USING GIN (license_number gin_trgm_ops);
+
+-- Escape LIKE metacharacters so user input is matched literally
+CREATE OR REPLACE FUNCTION fn_like_pattern(p_term TEXT)
+RETURNS TEXT AS $$
+    SELECT '%' || replace(replace(replace(p_term, '\', '\\'), '%', '\%'), '_', '\_') || '%';
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION fn_search_trips(
+    p_query      TEXT,
+    p_status     trip_status DEFAULT NULL,
+    p_vehicle_id INTEGER     DEFAULT NULL,
+    p_driver_id  INTEGER     DEFAULT NULL,
+    p_limit      INTEGER     DEFAULT 50,
+    p_offset     INTEGER     DEFAULT 0
+)
+RETURNS TABLE (
+    id INTEGER, vehicle_id INTEGER, driver_id INTEGER, cargo_weight_kg DECIMAL,
+    origin VARCHAR, destination VARCHAR, distance_km DECIMAL, revenue DECIMAL,
+    status trip_status, scheduled_departure TIMESTAMPTZ, actual_arrival TIMESTAMPTZ,
+    rank REAL, total_count BIGINT
+) AS $$
+    SELECT t.id, t.vehicle_id, t.driver_id, t.cargo_weight_kg,
+           t.origin, t.destination, t.distance_km, t.revenue,
+           t.status, t.scheduled_departure, t.actual_arrival,
+           GREATEST(similarity(t.origin, p_query), similarity(t.destination, p_query)) AS rank,
+           COUNT(*) OVER () AS total_count
+    FROM trips t
+    WHERE (t.origin ILIKE fn_like_pattern(p_query)
+           OR t.destination ILIKE fn_like_pattern(p_query)
+           OR t.origin % p_query
+           OR t.destination % p_query)
+      AND (p_status IS NULL OR t.status = p_status)
+      AND (p_vehicle_id IS NULL OR t.vehicle_id = p_vehicle_id)
+      AND (p_driver_id IS NULL OR t.driver_id = p_driver_id)
+    ORDER BY rank DESC, t.scheduled_departure DESC
+    LIMIT p_limit OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION fn_search_vehicles(
+    p_query        TEXT,
+    p_status       vehicle_status DEFAULT NULL,
+    p_vehicle_type vehicle_type   DEFAULT NULL,
+    p_limit        INTEGER        DEFAULT 50,
+    p_offset       INTEGER        DEFAULT 0
+)
+RETURNS TABLE (
+    id INTEGER, license_plate VARCHAR, make VARCHAR, model VARCHAR, year SMALLINT,
+    vehicle_type vehicle_type, fuel_type fuel_type, max_load_capacity_kg DECIMAL,
+    current_odometer_km DECIMAL, status vehicle_status,
+    rank REAL, total_count BIGINT
+) AS $$
+    SELECT v.id, v.license_plate, v.make, v.model, v.year,
+           v.vehicle_type, v.fuel_type, v.max_load_capacity_kg,
+           v.current_odometer_km, v.status,
+           GREATEST(similarity(v.license_plate, p_query) * 1.5,   -- plate hits rank first
+                    similarity(v.make, p_query),
+                    similarity(v.model, p_query))::REAL AS rank,
+           COUNT(*) OVER () AS total_count
+    FROM vehicles v
+    WHERE (v.license_plate ILIKE fn_like_pattern(p_query)
+           OR v.make ILIKE fn_like_pattern(p_query)
+           OR v.model ILIKE fn_like_pattern(p_query)
+           OR v.license_plate % p_query)
+      AND (CASE WHEN p_status IS NULL THEN v.status != 'retired' ELSE v.status = p_status END)
+      AND (p_vehicle_type IS NULL OR v.vehicle_type = p_vehicle_type)
+    ORDER BY rank DESC, v.id DESC
+    LIMIT p_limit OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION fn_search_expenses(
+    p_query        TEXT,
+    p_expense_type expense_type DEFAULT NULL,
+    p_vehicle_id   INTEGER      DEFAULT NULL,
+    p_trip_id      INTEGER      DEFAULT NULL,
+    p_date_from    DATE         DEFAULT NULL,
+    p_date_to      DATE         DEFAULT NULL,
+    p_limit        INTEGER      DEFAULT 50,
+    p_offset       INTEGER      DEFAULT 0
+)
+RETURNS TABLE (
+    id INTEGER, trip_id INTEGER, vehicle_id INTEGER, expense_type expense_type,
+    amount DECIMAL, description VARCHAR, expense_date DATE,
+    rank REAL, total_count BIGINT
+) AS $$
+    SELECT e.id, e.trip_id, e.vehicle_id, e.expense_type,
+           e.amount, e.description, e.expense_date,
+           similarity(e.description, p_query) AS rank,
+           COUNT(*) OVER () AS total_count
+    FROM expenses e
+    WHERE (e.description ILIKE fn_like_pattern(p_query) OR e.description % p_query)
+      AND (p_expense_type IS NULL OR e.expense_type = p_expense_type)
+      AND (p_vehicle_id IS NULL OR e.vehicle_id = p_vehicle_id)
+      AND (p_trip_id IS NULL OR e.trip_id = p_trip_id)
+      AND (p_date_from IS NULL OR e.expense_date >= p_date_from)
+      AND (p_date_to IS NULL OR e.expense_date <= p_date_to)
+    ORDER BY rank DESC, e.expense_date DESC
+    LIMIT p_limit OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION fn_search_drivers(
+    p_query       TEXT,
+    p_duty_status duty_status DEFAULT NULL,
+    p_limit       INTEGER     DEFAULT 50,
+    p_offset      INTEGER     DEFAULT 0
+)
+RETURNS TABLE (
+    id INTEGER, user_id INTEGER, license_number VARCHAR, license_expiry DATE,
+    safety_score DECIMAL, duty_status duty_status,
+    first_name VARCHAR, last_name VARCHAR, email VARCHAR,
+    rank REAL, total_count BIGINT
+) AS $$
+    SELECT d.id, d.user_id, d.license_number, d.license_expiry,
+           d.safety_score, d.duty_status,
+           u.first_name, u.last_name, u.email,
+           GREATEST(similarity(u.first_name || ' ' || u.last_name, p_query),
+                    similarity(u.email, p_query),
+                    similarity(d.license_number, p_query) * 1.5)::REAL AS rank,
+           COUNT(*) OVER () AS total_count
+    FROM drivers d
+    JOIN users u ON u.id = d.user_id
+    WHERE ((u.first_name || ' ' || u.last_name) ILIKE fn_like_pattern(p_query)
+           OR u.email ILIKE fn_like_pattern(p_query)
+           OR d.license_number ILIKE fn_like_pattern(p_query)
+           OR (u.first_name || ' ' || u.last_name) % p_query)
+      AND (p_duty_status IS NULL OR d.duty_status = p_duty_status)
+    ORDER BY rank DESC, d.id DESC
+    LIMIT p_limit OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
+
+
+-- ============================================================
+-- DISPATCH  (batch insert for POST /trips/auto-assign)
+-- ============================================================
+
+-- Insert planned trips, skipping any whose vehicle or driver already holds
+-- a scheduled trip. The advisory lock serializes concurrent auto-assign
+-- batches, so two planners working from the same pool cannot both claim
+-- one vehicle or driver. Returns the rows inserted.
+CREATE OR REPLACE FUNCTION fn_insert_dispatch_trips(p_trips JSONB)
+RETURNS SETOF trips AS $$
+DECLARE
+    r JSONB;
+    v_trip trips;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('fn_insert_dispatch_trips'));
+
+    FOR r IN SELECT * FROM jsonb_array_elements(p_trips) LOOP
+        CONTINUE WHEN EXISTS (
+            SELECT 1 FROM trips
+            WHERE status = 'scheduled'
+              AND (vehicle_id = (r->>'vehicle_id')::INTEGER
+                   OR driver_id = (r->>'driver_id')::INTEGER)
+        );
+
+        INSERT INTO trips (vehicle_id, driver_id, cargo_weight_kg, origin, destination,
+                           distance_km, revenue, scheduled_departure)
+        SELECT t.vehicle_id, t.driver_id, t.cargo_weight_kg, t.origin, t.destination,
+               t.distance_km, t.revenue, t.scheduled_departure
+        FROM jsonb_populate_record(NULL::trips, r) t
+        RETURNING * INTO v_trip;
+
+        RETURN NEXT v_trip;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+
 -- ============================================================
 -- TRIGGERS & FUNCTIONS  (5 functions, 5 triggers)
 -- ============================================================
@@ -341,11 +740,672 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Defined on the partitioned parent: cloned onto every partition
 CREATE TRIGGER trg_sync_odometer
     AFTER INSERT ON fuel_logs
     FOR EACH ROW EXECUTE FUNCTION fn_sync_odometer();
 
 
+-- ============================================================
+-- DAILY ROLLUP  (per vehicle per day, maintained by triggers)
+-- ============================================================
+-- Time-series analytics read one row per vehicle per day instead of every
+-- raw event. Each source table's trigger subtracts the OLD row's
+-- contribution and adds the NEW one, so inserts, edits, status changes and
+-- deletes all keep the rollup exact. fn_rollup_rebuild() recomputes a
+-- date range from the raw tables (backfill / repair).
+--
+--   trips             delivered trips, on actual_arrival::DATE
+--   fuel_logs         every fill, on fuel_date
+--   maintenance_logs  completed work, on completion_date
+--   expenses          every expense, on expense_date, split by type
+
+CREATE TABLE vehicle_daily_rollup (
+    vehicle_id                  INTEGER         NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
+    day                         DATE            NOT NULL,
+    trips_delivered             INTEGER         NOT NULL DEFAULT 0,
+    distance_km                 DECIMAL(14,2)   NOT NULL DEFAULT 0,
+    revenue                     DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    fuel_liters                 DECIMAL(14,2)   NOT NULL DEFAULT 0,
+    fuel_cost                   DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    maintenance_cost            DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    expense_fuel                DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    expense_toll                DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    expense_parking             DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    expense_maintenance         DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    expense_fine                DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    expense_loading_unloading   DECIMAL(16,2)   NOT NULL DEFAULT 0,
+    expense_misc                DECIMAL(16,2)   NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (vehicle_id, day)
+);
+
+CREATE INDEX idx_rollup_day ON vehicle_daily_rollup(day);
+
+-- Add (or with negative values, remove) one event's contribution
+CREATE OR REPLACE FUNCTION fn_rollup_apply(
+    p_vehicle_id    INTEGER,
+    p_day           DATE,
+    p_trips         INTEGER      DEFAULT 0,
+    p_distance      NUMERIC      DEFAULT 0,
+    p_revenue       NUMERIC      DEFAULT 0,
+    p_fuel_liters   NUMERIC      DEFAULT 0,
+    p_fuel_cost     NUMERIC      DEFAULT 0,
+    p_maintenance   NUMERIC      DEFAULT 0,
+    p_expense_type  expense_type DEFAULT NULL,
+    p_expense       NUMERIC      DEFAULT 0
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO vehicle_daily_rollup AS r (
+        vehicle_id, day, trips_delivered, distance_km, revenue, fuel_liters, fuel_cost,
+        maintenance_cost, expense_fuel, expense_toll, expense_parking, expense_maintenance,
+        expense_fine, expense_loading_unloading, expense_misc
+    )
+    VALUES (
+        p_vehicle_id, p_day, p_trips, p_distance, p_revenue, p_fuel_liters, p_fuel_cost,
+        p_maintenance,
+        CASE WHEN p_expense_type = 'fuel'              THEN p_expense ELSE 0 END,
+        CASE WHEN p_expense_type = 'toll'              THEN p_expense ELSE 0 END,
+        CASE WHEN p_expense_type = 'parking'           THEN p_expense ELSE 0 END,
+        CASE WHEN p_expense_type = 'maintenance'       THEN p_expense ELSE 0 END,
+        CASE WHEN p_expense_type = 'fine'              THEN p_expense ELSE 0 END,
+        CASE WHEN p_expense_type = 'loading_unloading' THEN p_expense ELSE 0 END,
+        CASE WHEN p_expense_type = 'misc'              THEN p_expense ELSE 0 END
+    )
+    ON CONFLICT (vehicle_id, day) DO UPDATE SET
+        trips_delivered           = r.trips_delivered           + EXCLUDED.trips_delivered,
+        distance_km               = r.distance_km               + EXCLUDED.distance_km,
+        revenue                   = r.revenue                   + EXCLUDED.revenue,
+        fuel_liters               = r.fuel_liters               + EXCLUDED.fuel_liters,
+        fuel_cost                 = r.fuel_cost                 + EXCLUDED.fuel_cost,
+        maintenance_cost          = r.maintenance_cost          + EXCLUDED.maintenance_cost,
+        expense_fuel              = r.expense_fuel              + EXCLUDED.expense_fuel,
+        expense_toll              = r.expense_toll              + EXCLUDED.expense_toll,
+        expense_parking           = r.expense_parking           + EXCLUDED.expense_parking,
+        expense_maintenance       = r.expense_maintenance       + EXCLUDED.expense_maintenance,
+        expense_fine              = r.expense_fine              + EXCLUDED.expense_fine,
+        expense_loading_unloading = r.expense_loading_unloading + EXCLUDED.expense_loading_unloading,
+        expense_misc              = r.expense_misc              + EXCLUDED.expense_misc;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_rollup_trips()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Most trip updates (route edits, start) do not touch the rollup
+    IF TG_OP = 'UPDATE'
+       AND (OLD.status, OLD.vehicle_id, OLD.actual_arrival, OLD.scheduled_departure,
+            OLD.distance_km, OLD.revenue)
+           IS NOT DISTINCT FROM
+           (NEW.status, NEW.vehicle_id, NEW.actual_arrival, NEW.scheduled_departure,
+            NEW.distance_km, NEW.revenue)
+    THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'delivered' THEN
+        PERFORM fn_rollup_apply(OLD.vehicle_id,
+            COALESCE(OLD.actual_arrival, OLD.scheduled_departure)::DATE,
+            p_trips => -1, p_distance => -COALESCE(OLD.distance_km, 0), p_revenue => -OLD.revenue);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'delivered' THEN
+        PERFORM fn_rollup_apply(NEW.vehicle_id,
+            COALESCE(NEW.actual_arrival, NEW.scheduled_departure)::DATE,
+            p_trips => 1, p_distance => COALESCE(NEW.distance_km, 0), p_revenue => NEW.revenue);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_rollup_trips
+    AFTER INSERT OR UPDATE OR DELETE ON trips
+    FOR EACH ROW EXECUTE FUNCTION fn_rollup_trips();
+
+CREATE OR REPLACE FUNCTION fn_rollup_fuel_logs()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM fn_rollup_apply(OLD.vehicle_id, OLD.fuel_date,
+            p_fuel_liters => -OLD.liters, p_fuel_cost => -OLD.total_cost);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM fn_rollup_apply(NEW.vehicle_id, NEW.fuel_date,
+            p_fuel_liters => NEW.liters, p_fuel_cost => NEW.total_cost);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_rollup_fuel_logs
+    AFTER INSERT OR UPDATE OR DELETE ON fuel_logs
+    FOR EACH ROW EXECUTE FUNCTION fn_rollup_fuel_logs();
+
+CREATE OR REPLACE FUNCTION fn_rollup_maintenance()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'completed' AND OLD.completion_date IS NOT NULL THEN
+        PERFORM fn_rollup_apply(OLD.vehicle_id, OLD.completion_date, p_maintenance => -OLD.cost);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'completed' AND NEW.completion_date IS NOT NULL THEN
+        PERFORM fn_rollup_apply(NEW.vehicle_id, NEW.completion_date, p_maintenance => NEW.cost);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_rollup_maintenance
+    AFTER INSERT OR UPDATE OR DELETE ON maintenance_logs
+    FOR EACH ROW EXECUTE FUNCTION fn_rollup_maintenance();
+
+CREATE OR REPLACE FUNCTION fn_rollup_expenses()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM fn_rollup_apply(OLD.vehicle_id, OLD.expense_date,
+            p_expense_type => OLD.expense_type, p_expense => -OLD.amount);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM fn_rollup_apply(NEW.vehicle_id, NEW.expense_date,
+            p_expense_type => NEW.expense_type, p_expense => NEW.amount);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_rollup_expenses
+    AFTER INSERT OR UPDATE OR DELETE ON expenses
+    FOR EACH ROW EXECUTE FUNCTION fn_rollup_expenses();
+
+-- Recompute [p_from, p_to] from the raw tables; NULL bounds = all time.
+-- Returns the number of rollup rows written.
+CREATE OR REPLACE FUNCTION fn_rollup_rebuild(p_from DATE DEFAULT NULL, p_to DATE DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    DELETE FROM vehicle_daily_rollup
+    WHERE (p_from IS NULL OR day >= p_from) AND (p_to IS NULL OR day <= p_to);
+
+    INSERT INTO vehicle_daily_rollup (
+        vehicle_id, day, trips_delivered, distance_km, revenue, fuel_liters, fuel_cost,
+        maintenance_cost, expense_fuel, expense_toll, expense_parking, expense_maintenance,
+        expense_fine, expense_loading_unloading, expense_misc
+    )
+    SELECT vehicle_id, day,
+           SUM(trips), SUM(distance), SUM(revenue), SUM(liters), SUM(fuel_cost), SUM(maintenance),
+           COALESCE(SUM(expense) FILTER (WHERE expense_type = 'fuel'), 0),
+           COALESCE(SUM(expense) FILTER (WHERE expense_type = 'toll'), 0),
+           COALESCE(SUM(expense) FILTER (WHERE expense_type = 'parking'), 0),
+           COALESCE(SUM(expense) FILTER (WHERE expense_type = 'maintenance'), 0),
+           COALESCE(SUM(expense) FILTER (WHERE expense_type = 'fine'), 0),
+           COALESCE(SUM(expense) FILTER (WHERE expense_type = 'loading_unloading'), 0),
+           COALESCE(SUM(expense) FILTER (WHERE expense_type = 'misc'), 0)
+    FROM (
+        SELECT vehicle_id, COALESCE(actual_arrival, scheduled_departure)::DATE AS day,
+               1 AS trips, COALESCE(distance_km, 0) AS distance, revenue,
+               0 AS liters, 0 AS fuel_cost, 0 AS maintenance,
+               NULL::expense_type AS expense_type, 0 AS expense
+        FROM trips WHERE status = 'delivered'
+        UNION ALL
+        -- Bounds repeated per source so partitions outside the range are pruned
+        SELECT vehicle_id, fuel_date, 0, 0, 0, liters, total_cost, 0, NULL, 0
+        FROM fuel_logs
+        WHERE (p_from IS NULL OR fuel_date >= p_from) AND (p_to IS NULL OR fuel_date <= p_to)
+        UNION ALL
+        SELECT vehicle_id, completion_date, 0, 0, 0, 0, 0, cost, NULL, 0
+        FROM maintenance_logs WHERE status = 'completed' AND completion_date IS NOT NULL
+        UNION ALL
+        SELECT vehicle_id, expense_date, 0, 0, 0, 0, 0, 0, expense_type, amount
+        FROM expenses
+        WHERE (p_from IS NULL OR expense_date >= p_from) AND (p_to IS NULL OR expense_date <= p_to)
+    ) events
+    WHERE (p_from IS NULL OR day >= p_from) AND (p_to IS NULL OR day <= p_to)
+    GROUP BY vehicle_id, day;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Bucketed series for charts: p_bucket is 'day', 'week' or 'month'
+CREATE OR REPLACE FUNCTION fn_rollup_series(
+    p_from       DATE,
+    p_to         DATE,
+    p_vehicle_id INTEGER DEFAULT NULL,
+    p_bucket     TEXT    DEFAULT 'day'
+)
+RETURNS TABLE (
+    period DATE, trips_delivered BIGINT, distance_km NUMERIC, revenue NUMERIC,
+    fuel_liters NUMERIC, fuel_cost NUMERIC, maintenance_cost NUMERIC,
+    expense_fuel NUMERIC, expense_toll NUMERIC, expense_parking NUMERIC,
+    expense_maintenance NUMERIC, expense_fine NUMERIC,
+    expense_loading_unloading NUMERIC, expense_misc NUMERIC
+) AS $$
+    SELECT DATE_TRUNC(p_bucket, r.day)::DATE,
+           SUM(r.trips_delivered), SUM(r.distance_km), SUM(r.revenue),
+           SUM(r.fuel_liters), SUM(r.fuel_cost), SUM(r.maintenance_cost),
+           SUM(r.expense_fuel), SUM(r.expense_toll), SUM(r.expense_parking),
+           SUM(r.expense_maintenance), SUM(r.expense_fine),
+           SUM(r.expense_loading_unloading), SUM(r.expense_misc)
+    FROM vehicle_daily_rollup r
+    WHERE r.day >= p_from AND r.day <= p_to
+      AND (p_vehicle_id IS NULL OR r.vehicle_id = p_vehicle_id)
+    GROUP BY 1
+    ORDER BY 1;
+$$ LANGUAGE sql STABLE;
+
+
+-- ============================================================
+-- DRIVER STATS  (per-driver counters maintained by triggers)
+-- ============================================================
+-- vw_driver_performance reads these counters instead of re-counting every
+-- trip and complaint per request. Triggers move the counters on trip
+-- insert / status or driver change / delete and on complaint insert /
+-- reassignment / severity or status change / delete, in the same way
+-- fn_trip_status_sync keeps vehicle and driver status in step.
+-- fn_driver_stats_rebuild() recounts from the raw tables.
+--
+-- Complaint counters: total_complaints counts every complaint;
+-- open_complaints those still open or investigating; complaints_<severity>
+-- those not dismissed.
+
+CREATE TABLE driver_stats (
+    driver_id           INTEGER         PRIMARY KEY REFERENCES drivers(id) ON DELETE CASCADE,
+    total_trips         INTEGER         NOT NULL DEFAULT 0,
+    completed_trips     INTEGER         NOT NULL DEFAULT 0,
+    cancelled_trips     INTEGER         NOT NULL DEFAULT 0,
+    total_complaints    INTEGER         NOT NULL DEFAULT 0,
+    open_complaints     INTEGER         NOT NULL DEFAULT 0,
+    complaints_low      INTEGER         NOT NULL DEFAULT 0,
+    complaints_medium   INTEGER         NOT NULL DEFAULT 0,
+    complaints_high     INTEGER         NOT NULL DEFAULT 0,
+    complaints_critical INTEGER         NOT NULL DEFAULT 0,
+    completion_rate     DECIMAL(5,2)    NOT NULL GENERATED ALWAYS AS (
+        CASE WHEN total_trips > 0
+             THEN ROUND(completed_trips * 100.0 / total_trips, 2)
+             ELSE 100 END
+    ) STORED
+);
+
+CREATE INDEX idx_driver_stats_completion ON driver_stats(completion_rate DESC);
+CREATE INDEX idx_drivers_safety_score    ON drivers(safety_score DESC);
+
+CREATE OR REPLACE FUNCTION fn_driver_stats_apply(
+    p_driver_id  INTEGER,
+    p_total      INTEGER DEFAULT 0,
+    p_completed  INTEGER DEFAULT 0,
+    p_cancelled  INTEGER DEFAULT 0,
+    p_complaints INTEGER DEFAULT 0,
+    p_open       INTEGER DEFAULT 0,
+    p_low        INTEGER DEFAULT 0,
+    p_medium     INTEGER DEFAULT 0,
+    p_high       INTEGER DEFAULT 0,
+    p_critical   INTEGER DEFAULT 0
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO driver_stats AS s (driver_id, total_trips, completed_trips, cancelled_trips, total_complaints,
+                                   open_complaints, complaints_low, complaints_medium, complaints_high,
+                                   complaints_critical)
+    VALUES (p_driver_id, p_total, p_completed, p_cancelled, p_complaints,
+            p_open, p_low, p_medium, p_high, p_critical)
+    ON CONFLICT (driver_id) DO UPDATE SET
+        total_trips         = s.total_trips         + EXCLUDED.total_trips,
+        completed_trips     = s.completed_trips     + EXCLUDED.completed_trips,
+        cancelled_trips     = s.cancelled_trips     + EXCLUDED.cancelled_trips,
+        total_complaints    = s.total_complaints    + EXCLUDED.total_complaints,
+        open_complaints     = s.open_complaints     + EXCLUDED.open_complaints,
+        complaints_low      = s.complaints_low      + EXCLUDED.complaints_low,
+        complaints_medium   = s.complaints_medium   + EXCLUDED.complaints_medium,
+        complaints_high     = s.complaints_high     + EXCLUDED.complaints_high,
+        complaints_critical = s.complaints_critical + EXCLUDED.complaints_critical;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Add (p_sign = 1) or remove (-1) one complaint's contribution
+CREATE OR REPLACE FUNCTION fn_driver_stats_apply_complaint(c driver_complaints, p_sign INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    v_counted INTEGER := p_sign * (c.status <> 'dismissed')::INTEGER;
+BEGIN
+    PERFORM fn_driver_stats_apply(c.driver_id,
+        p_complaints => p_sign,
+        p_open       => p_sign * (c.status IN ('open', 'investigating'))::INTEGER,
+        p_low        => v_counted * (c.severity = 'low')::INTEGER,
+        p_medium     => v_counted * (c.severity = 'medium')::INTEGER,
+        p_high       => v_counted * (c.severity = 'high')::INTEGER,
+        p_critical   => v_counted * (c.severity = 'critical')::INTEGER);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Every driver gets a zeroed row, so the view never needs COALESCE-heavy joins
+CREATE OR REPLACE FUNCTION fn_driver_stats_init()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO driver_stats (driver_id) VALUES (NEW.id) ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_driver_stats_init
+    AFTER INSERT ON drivers
+    FOR EACH ROW EXECUTE FUNCTION fn_driver_stats_init();
+
+CREATE OR REPLACE FUNCTION fn_driver_stats_trips()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.status = NEW.status AND OLD.driver_id = NEW.driver_id THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM fn_driver_stats_apply(OLD.driver_id,
+            p_total     => -1,
+            p_completed => -(OLD.status = 'delivered')::INTEGER,
+            p_cancelled => -(OLD.status = 'cancelled')::INTEGER);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM fn_driver_stats_apply(NEW.driver_id,
+            p_total     => 1,
+            p_completed => (NEW.status = 'delivered')::INTEGER,
+            p_cancelled => (NEW.status = 'cancelled')::INTEGER);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_driver_stats_trips
+    AFTER INSERT OR UPDATE OF status, driver_id OR DELETE ON trips
+    FOR EACH ROW EXECUTE FUNCTION fn_driver_stats_trips();
+
+CREATE OR REPLACE FUNCTION fn_driver_stats_complaints()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.driver_id = NEW.driver_id
+       AND OLD.severity = NEW.severity AND OLD.status = NEW.status THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM fn_driver_stats_apply_complaint(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM fn_driver_stats_apply_complaint(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_driver_stats_complaints
+    AFTER INSERT OR UPDATE OF driver_id, severity, status OR DELETE ON driver_complaints
+    FOR EACH ROW EXECUTE FUNCTION fn_driver_stats_complaints();
+
+-- Recount every driver from trips and driver_complaints; returns rows written
+CREATE OR REPLACE FUNCTION fn_driver_stats_rebuild()
+RETURNS INTEGER AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    INSERT INTO driver_stats (driver_id, total_trips, completed_trips, cancelled_trips, total_complaints,
+                              open_complaints, complaints_low, complaints_medium, complaints_high,
+                              complaints_critical)
+    SELECT d.id,
+           COALESCE(t.total, 0), COALESCE(t.delivered, 0), COALESCE(t.cancelled, 0),
+           COALESCE(c.cnt, 0), COALESCE(c.open, 0),
+           COALESCE(c.low, 0), COALESCE(c.medium, 0), COALESCE(c.high, 0), COALESCE(c.critical, 0)
+    FROM drivers d
+    LEFT JOIN (
+        SELECT driver_id,
+               COUNT(*)                                       AS total,
+               COUNT(*) FILTER (WHERE status = 'delivered')   AS delivered,
+               COUNT(*) FILTER (WHERE status = 'cancelled')   AS cancelled
+        FROM trips GROUP BY driver_id
+    ) t ON t.driver_id = d.id
+    LEFT JOIN (
+        SELECT driver_id,
+               COUNT(*)                                                             AS cnt,
+               COUNT(*) FILTER (WHERE status IN ('open', 'investigating'))          AS open,
+               COUNT(*) FILTER (WHERE status <> 'dismissed' AND severity = 'low')      AS low,
+               COUNT(*) FILTER (WHERE status <> 'dismissed' AND severity = 'medium')   AS medium,
+               COUNT(*) FILTER (WHERE status <> 'dismissed' AND severity = 'high')     AS high,
+               COUNT(*) FILTER (WHERE status <> 'dismissed' AND severity = 'critical') AS critical
+        FROM driver_complaints GROUP BY driver_id
+    ) c ON c.driver_id = d.id
+    ON CONFLICT (driver_id) DO UPDATE SET
+        total_trips         = EXCLUDED.total_trips,
+        completed_trips     = EXCLUDED.completed_trips,
+        cancelled_trips     = EXCLUDED.cancelled_trips,
+        total_complaints    = EXCLUDED.total_complaints,
+        open_complaints     = EXCLUDED.open_complaints,
+        complaints_low      = EXCLUDED.complaints_low,
+        complaints_medium   = EXCLUDED.complaints_medium,
+        complaints_high     = EXCLUDED.complaints_high,
+        complaints_critical = EXCLUDED.complaints_critical;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- ============================================================
+-- MAINTENANCE DUE  (next service per vehicle and service type)
+-- ============================================================
+-- service_intervals says how often each scheduled service type is due, by
+-- distance, by time or both (whichever comes first). maintenance_due holds
+-- one row per active vehicle and scheduled service type:
+--
+--   last service   latest completed log of that type. Logs do not record
+--                  an odometer, so the last fill on or before the
+--                  completion date stands in for it (else the first fill
+--                  after it, else the current odometer). No service on
+--                  record: odometer 0 and the time interval is due now.
+--   usage rate     km/day between the first and last fill of the past
+--                  90 days (only the recent fuel_logs partitions are read)
+--   due_km         last service odometer + interval_km
+--   due_date       the earlier of last service + interval_days and the day
+--                  the usage rate reaches due_km
+--
+-- fn_maintenance_due_refresh(ids) recomputes a set of vehicles in one
+-- set-based statement; NULL recomputes the whole fleet. Triggers refresh the
+-- vehicles of new fuel logs, of maintenance logs entering or leaving
+-- 'completed', of vehicles added or retired, and everything when the
+-- intervals change. Mirrors services/maintenance_due.py.
+
+CREATE TABLE service_intervals (
+    service_type        service_type    PRIMARY KEY,
+    interval_km         DECIMAL(10,2)   CHECK (interval_km > 0),
+    interval_days       INTEGER         CHECK (interval_days > 0),
+
+    CONSTRAINT chk_interval_set CHECK (interval_km IS NOT NULL OR interval_days IS NOT NULL)
+);
+
+-- Repairs (engine_repair, electrical, body_work, other) are not scheduled
+INSERT INTO service_intervals (service_type, interval_km, interval_days) VALUES
+    ('oil_change',          10000,  180),
+    ('tire_replacement',    50000,  730),
+    ('brake_service',       30000,  365),
+    ('general_inspection',  NULL,   365);
+
+CREATE TABLE maintenance_due (
+    vehicle_id          INTEGER         NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
+    service_type        service_type    NOT NULL,
+    last_service_date   DATE,
+    last_service_km     DECIMAL(12,2)   NOT NULL,
+    current_km          DECIMAL(12,2)   NOT NULL,
+    km_per_day          DECIMAL(10,2),
+    due_km              DECIMAL(12,2),
+    km_remaining        DECIMAL(12,2)   GENERATED ALWAYS AS (due_km - current_km) STORED,
+    due_date            DATE,
+    refreshed_at        TIMESTAMPTZ     NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (vehicle_id, service_type)
+);
+
+CREATE INDEX idx_maintenance_due_date ON maintenance_due(due_date);
+CREATE INDEX idx_maintenance_due_km   ON maintenance_due(km_remaining);
+-- Usage rate and last-service odometer lookups
+CREATE INDEX idx_fuel_vehicle_date    ON fuel_logs(vehicle_id, fuel_date);
+
+CREATE OR REPLACE FUNCTION fn_maintenance_due_refresh(p_vehicle_ids INTEGER[] DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    v_ids  INTEGER[] := COALESCE(p_vehicle_ids, ARRAY(SELECT id FROM vehicles));
+    v_rows INTEGER;
+BEGIN
+    DELETE FROM maintenance_due WHERE vehicle_id = ANY(v_ids);
+
+    INSERT INTO maintenance_due (vehicle_id, service_type, last_service_date, last_service_km,
+                                 current_km, km_per_day, due_km, due_date)
+    WITH usage AS (
+        SELECT vehicle_id,
+               MAX(odometer_at_fill) AS last_km,
+               CASE WHEN MAX(fuel_date) > MIN(fuel_date)
+                    THEN (MAX(odometer_at_fill) - MIN(odometer_at_fill)) / (MAX(fuel_date) - MIN(fuel_date))
+               END AS km_per_day
+        FROM fuel_logs
+        WHERE fuel_date >= CURRENT_DATE - 90 AND vehicle_id = ANY(v_ids)
+        GROUP BY vehicle_id
+    ),
+    last_service AS (
+        SELECT DISTINCT ON (vehicle_id, service_type) vehicle_id, service_type, completion_date
+        FROM maintenance_logs
+        WHERE status = 'completed' AND completion_date IS NOT NULL AND vehicle_id = ANY(v_ids)
+        ORDER BY vehicle_id, service_type, completion_date DESC
+    ),
+    state AS (
+        SELECT v.id AS vehicle_id, si.service_type, si.interval_km, si.interval_days,
+               ls.completion_date AS last_service_date,
+               CASE WHEN ls.completion_date IS NULL THEN 0
+                    ELSE COALESCE(odo.km, odo_after.km, v.current_odometer_km)
+               END AS last_service_km,
+               GREATEST(v.current_odometer_km, COALESCE(u.last_km, 0)) AS current_km,
+               u.km_per_day
+        FROM vehicles v
+        CROSS JOIN service_intervals si
+        LEFT JOIN usage u ON u.vehicle_id = v.id
+        LEFT JOIN last_service ls ON ls.vehicle_id = v.id AND ls.service_type = si.service_type
+        -- Baseline: last fill on or before the service, else the first fill
+        -- after it, else (no fills yet) the current odometer
+        LEFT JOIN LATERAL (
+            SELECT f.odometer_at_fill AS km
+            FROM fuel_logs f
+            WHERE f.vehicle_id = v.id AND f.fuel_date <= ls.completion_date
+            ORDER BY f.fuel_date DESC, f.odometer_at_fill DESC
+            LIMIT 1
+        ) odo ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT f.odometer_at_fill AS km
+            FROM fuel_logs f
+            WHERE odo.km IS NULL AND f.vehicle_id = v.id AND f.fuel_date > ls.completion_date
+            ORDER BY f.fuel_date, f.odometer_at_fill
+            LIMIT 1
+        ) odo_after ON TRUE
+        WHERE v.id = ANY(v_ids) AND v.status <> 'retired'
+    )
+    SELECT s.vehicle_id, s.service_type, s.last_service_date, s.last_service_km,
+           s.current_km, ROUND(s.km_per_day, 2), d.due_km,
+           LEAST(  -- NULLs ignored
+               CASE WHEN s.interval_days IS NOT NULL
+                    THEN COALESCE(s.last_service_date + s.interval_days, CURRENT_DATE) END,
+               CASE WHEN d.due_km <= s.current_km THEN CURRENT_DATE
+                    WHEN s.km_per_day > 0
+                    THEN CURRENT_DATE + LEAST(CEIL((d.due_km - s.current_km) / s.km_per_day), 36500)::INTEGER
+               END
+           )
+    FROM state s
+    CROSS JOIN LATERAL (SELECT s.last_service_km + s.interval_km AS due_km) d;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Once per statement, after the row triggers (odometer sync) have run
+-- A trigger with transition tables handles one event, so inserts, updates
+-- and deletes each get their own; each branch reads only the tables its
+-- event provides.
+CREATE OR REPLACE FUNCTION fn_maintenance_due_fuel_logs()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM fn_maintenance_due_refresh(ARRAY(SELECT DISTINCT vehicle_id FROM new_fuel_logs));
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Old and new vehicle of every fill whose vehicle, date or odometer changed
+        PERFORM fn_maintenance_due_refresh(ARRAY(
+            SELECT DISTINCT unnest(ARRAY[o.vehicle_id, n.vehicle_id])
+            FROM old_fuel_logs o
+            JOIN new_fuel_logs n ON n.id = o.id
+            WHERE (o.vehicle_id, o.fuel_date, o.odometer_at_fill)
+                  IS DISTINCT FROM (n.vehicle_id, n.fuel_date, n.odometer_at_fill)
+        ));
+    ELSE
+        PERFORM fn_maintenance_due_refresh(ARRAY(SELECT DISTINCT vehicle_id FROM old_fuel_logs));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_maintenance_due_fuel_logs
+    AFTER INSERT ON fuel_logs
+    REFERENCING NEW TABLE AS new_fuel_logs
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_maintenance_due_fuel_logs();
+
+CREATE TRIGGER trg_maintenance_due_fuel_logs_update
+    AFTER UPDATE ON fuel_logs
+    REFERENCING OLD TABLE AS old_fuel_logs NEW TABLE AS new_fuel_logs
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_maintenance_due_fuel_logs();
+
+CREATE TRIGGER trg_maintenance_due_fuel_logs_delete
+    AFTER DELETE ON fuel_logs
+    REFERENCING OLD TABLE AS old_fuel_logs
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_maintenance_due_fuel_logs();
+
+CREATE OR REPLACE FUNCTION fn_maintenance_due_logs()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF (TG_OP <> 'DELETE' AND NEW.status = 'completed')
+       OR (TG_OP <> 'INSERT' AND OLD.status = 'completed') THEN
+        -- Both vehicles when a log is moved; NULL entries match nothing
+        PERFORM fn_maintenance_due_refresh(ARRAY[OLD.vehicle_id, NEW.vehicle_id]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_maintenance_due_logs
+    AFTER INSERT OR UPDATE OF status, completion_date, service_type, vehicle_id OR DELETE
+    ON maintenance_logs
+    FOR EACH ROW EXECUTE FUNCTION fn_maintenance_due_logs();
+
+CREATE OR REPLACE FUNCTION fn_maintenance_due_vehicles()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' OR (OLD.status = 'retired') <> (NEW.status = 'retired') THEN
+        PERFORM fn_maintenance_due_refresh(ARRAY[NEW.id]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_maintenance_due_vehicles
+    AFTER INSERT OR UPDATE OF status ON vehicles
+    FOR EACH ROW EXECUTE FUNCTION fn_maintenance_due_vehicles();
+
+CREATE OR REPLACE FUNCTION fn_maintenance_due_intervals()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM fn_maintenance_due_refresh();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_maintenance_due_intervals
+    AFTER INSERT OR UPDATE OR DELETE ON service_intervals
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_maintenance_due_intervals();
+
+
 -- ============================================================
 -- VIEWS  (Dashboard & Analytics)
 -- ============================================================
@@ -404,7 +1464,7 @@ LEFT JOIN (
 WHERE v.status != 'retired';
 
 
--- Driver performance (all derived stats computed here) ----
+-- Driver performance (counters from driver_stats) ---------
 
 CREATE VIEW vw_driver_performance AS
 SELECT
@@ -416,26 +1476,19 @@ SELECT
     d.safety_score,
     d.duty_status,
     d.duty_status NOT IN ('on_duty', 'suspended') AS is_available,
-    COALESCE(t.total, 0)               AS total_trips,
-    COALESCE(t.delivered, 0)            AS completed_trips,
-    COALESCE(t.cancelled, 0)            AS cancelled_trips,
-    CASE WHEN COALESCE(t.total, 0) > 0
-         THEN ROUND(t.delivered * 100.0 / t.total, 2)
-         ELSE 100 END                   AS completion_rate,
-    COALESCE(c.cnt, 0)                  AS total_complaints
+    s.total_trips,
+    s.completed_trips,
+    s.cancelled_trips,
+    s.completion_rate,
+    s.total_complaints,
+    s.open_complaints,
+    s.complaints_low,
+    s.complaints_medium,
+    s.complaints_high,
+    s.complaints_critical
 FROM drivers d
 JOIN users u ON u.id = d.user_id
-LEFT JOIN (
-    SELECT driver_id,
-           COUNT(*)                                       AS total,
-           COUNT(*) FILTER (WHERE status = 'delivered')   AS delivered,
-           COUNT(*) FILTER (WHERE status = 'cancelled')   AS cancelled
-    FROM trips GROUP BY driver_id
-) t ON t.driver_id = d.id
-LEFT JOIN (
-    SELECT driver_id, COUNT(*) AS cnt
-    FROM driver_complaints GROUP BY driver_id
-) c ON c.driver_id = d.id;
+JOIN driver_stats s ON s.driver_id = d.id;
 
 
 -- Monthly financial summary -------------------------------
@@ -466,6 +1519,78 @@ GROUP BY DATE_TRUNC('month', t.actual_arrival)
 ORDER BY month DESC;
 
 
+-- Fuel economy anomalies ----------------------------------
+-- Per-fill km/L = odometer delta since the vehicle's previous fill / liters.
+-- Flags rollbacks and fills beyond k·MAD (scaled 1.4826) of the vehicle's
+-- median; vehicles with fewer than 5 valid fills only get rollback flags.
+-- Mirrors services/fuel_economy.py.
+
+CREATE OR REPLACE FUNCTION fn_fuel_anomalies(
+    p_date_from  DATE    DEFAULT NULL,
+    p_date_to    DATE    DEFAULT NULL,
+    p_vehicle_id INTEGER DEFAULT NULL,
+    p_k          NUMERIC DEFAULT 3.5
+)
+RETURNS TABLE (
+    id INTEGER, vehicle_id INTEGER, fuel_date DATE, liters DECIMAL, odometer_at_fill DECIMAL,
+    distance_km DECIMAL, km_per_liter NUMERIC, median_km_per_liter NUMERIC, mad NUMERIC,
+    anomaly TEXT
+) AS $$
+    WITH fills AS (
+        SELECT f.id, f.vehicle_id, f.fuel_date, f.liters, f.odometer_at_fill,
+               f.odometer_at_fill - LAG(f.odometer_at_fill) OVER (
+                   PARTITION BY f.vehicle_id ORDER BY f.fuel_date, f.id
+               ) AS distance_km
+        FROM fuel_logs f
+        WHERE (p_vehicle_id IS NULL OR f.vehicle_id = p_vehicle_id)
+          AND (p_date_to IS NULL OR f.fuel_date <= p_date_to)
+    ),
+    economy AS (
+        SELECT fills.*,
+               CASE WHEN distance_km >= 0 THEN distance_km / liters END AS kpl
+        FROM fills
+        WHERE distance_km IS NOT NULL
+    ),
+    centers AS (
+        SELECT e.vehicle_id, COUNT(*) AS n,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY e.kpl)::NUMERIC AS center
+        FROM economy e WHERE e.kpl IS NOT NULL
+        GROUP BY e.vehicle_id
+    ),
+    spreads AS (
+        SELECT e.vehicle_id,
+               (percentile_cont(0.5) WITHIN GROUP (ORDER BY ABS(e.kpl - c.center)))::NUMERIC * 1.4826 AS mad
+        FROM economy e JOIN centers c ON c.vehicle_id = e.vehicle_id
+        WHERE e.kpl IS NOT NULL
+        GROUP BY e.vehicle_id
+    ),
+    flagged AS (
+        SELECT e.id, e.vehicle_id, e.fuel_date, e.liters, e.odometer_at_fill, e.distance_km,
+               ROUND(e.kpl, 3) AS km_per_liter,
+               ROUND(c.center, 3) AS median_km_per_liter,
+               ROUND(s.mad, 3) AS mad,
+               CASE
+                   WHEN e.distance_km < 0 THEN 'odometer_rollback'
+                   WHEN c.n < 5 THEN NULL
+                   WHEN e.kpl < c.center - p_k * GREATEST(s.mad, c.center * 0.05) THEN 'possible_theft'
+                   WHEN e.kpl > c.center + p_k * GREATEST(s.mad, c.center * 0.05) THEN 'outlier_high'
+               END AS anomaly
+        FROM economy e
+        LEFT JOIN centers c ON c.vehicle_id = e.vehicle_id
+        LEFT JOIN spreads s ON s.vehicle_id = e.vehicle_id
+    )
+    SELECT flagged.id, flagged.vehicle_id, flagged.fuel_date, flagged.liters, flagged.odometer_at_fill,
+           flagged.distance_km, flagged.km_per_liter,
+           CASE WHEN flagged.anomaly = 'odometer_rollback' THEN NULL ELSE flagged.median_km_per_liter END,
+           CASE WHEN flagged.anomaly = 'odometer_rollback' THEN NULL ELSE flagged.mad END,
+           flagged.anomaly
+    FROM flagged
+    WHERE flagged.anomaly IS NOT NULL
+      AND (p_date_from IS NULL OR flagged.fuel_date >= p_date_from)
+    ORDER BY flagged.fuel_date DESC, flagged.id DESC;
+$$ LANGUAGE sql STABLE;
+
+
 -- ============================================================
 -- SEED DATA
 -- ============================================================
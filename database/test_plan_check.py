@@ -0,0 +1,44 @@
+"""
+test_plan_check.py — plan_check's query-plan budgets as a pytest suite.
+
+One test per query shape, against a freshly seeded scratch database.
+Skipped unless PLAN_CHECK_DSN names a Postgres the test may create
+databases on; PLAN_CHECK_SCALE sets the dataset size (default 1.0, the
+size the budgets and baseline were recorded at):
+
+    PLAN_CHECK_DSN=postgresql://postgres@localhost/postgres python -m pytest database
+"""
+
+import os
+
+import pytest
+
+import plan_check
+
+DSN = os.environ.get("PLAN_CHECK_DSN")
+
+pytestmark = pytest.mark.skipif(not DSN, reason="PLAN_CHECK_DSN not set")
+
+
+@pytest.fixture(scope="module")
+def scratch():
+    psycopg = pytest.importorskip("psycopg")
+    sizes = plan_check.seed_sizes(float(os.environ.get("PLAN_CHECK_SCALE", "1.0")))
+    scratch_dsn = plan_check.build_database(psycopg, DSN, sizes)
+    with psycopg.connect(scratch_dsn) as conn:
+        yield {
+            "conn": conn,
+            "ids": plan_check.probe_ids(sizes),
+            "partitioned": plan_check.partitioned_tables(conn),
+            "budgets": plan_check.load_json(plan_check.BUDGETS_FILE),
+            "baseline": plan_check.load_json(plan_check.BASELINE_FILE),
+        }
+
+
+@pytest.mark.parametrize("query", plan_check.QUERIES, ids=[q["name"] for q in plan_check.QUERIES])
+def test_query_plan(scratch, query):
+    result = plan_check.evaluate(
+        scratch["conn"], query, scratch["ids"], scratch["budgets"], scratch["baseline"],
+        scratch["partitioned"], repeats=3,
+    )
+    assert not result["failures"], f"{query['name']}: " + "; ".join(result["failures"])